@@ -5,6 +5,7 @@ from models import db, Project, ProjectProduct, User, Product, SKU
 from datetime import datetime, timezone, date
 
 from endpoints.api.auth.utils import current_user, role_required, _json, _user_by_credentials
+from endpoints.api.projects.services.sku_price_cache import sku_price_cache
 
 from integrations.workguru.wg_endpoints import wg_get
 
@@ -44,6 +45,8 @@ def run_sql():
     try:
         result = db.session.execute(text(sql))
         db.session.commit()
+        # Raw SQL may have changed SKU prices without touching updated_at
+        sku_price_cache.invalidate()
 
         # Try to fetch result rows (e.g., for SELECT)
         try:
@@ -140,6 +143,7 @@ def get_skus_by_codes():
         except Exception as e:
             db.session.rollback()
             return jsonify({"error": f"Failed to persist SKUs: {e}"}), 500
+        sku_price_cache.invalidate()
 
     response_payload = [existing_map[c].to_dict() for c in norm_skus if c in existing_map]
     return jsonify({
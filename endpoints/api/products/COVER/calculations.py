@@ -1,6 +1,8 @@
 """COVER project calculations."""
 import copy
-from typing import Dict
+from typing import Dict, List
+
+from endpoints.api.projects.shared.fabric import DEFAULT_FABRIC_WIDTH, UNSPECIFIED_FABRIC, fabric_of
 
 
 def _num(v):
@@ -10,6 +12,70 @@ def _num(v):
         return None
 
 
+def fabric_key(fabric_type: str, fabric_width: int) -> str:
+    """Key of a fabric partition in project_attributes["nest"]."""
+    return f"{fabric_type}@{int(fabric_width)}"
+
+
+def nest_partitions(nest) -> Dict[str, Dict]:
+    """Per-fabric nest results from project_attributes["nest"].
+
+    Projects calculated before per-fabric nesting hold a single nest result;
+    that is returned as the only partition.
+    """
+    if not isinstance(nest, dict) or not nest:
+        return {}
+    if "panels" in nest or "bin_height" in nest or "error" in nest:
+        key = fabric_key(UNSPECIFIED_FABRIC, nest.get("bin_height") or DEFAULT_FABRIC_WIDTH)
+        return {key: nest}
+    return {key: part for key, part in nest.items() if isinstance(part, dict)}
+
+
+def _nest_partition(rectangles: List[Dict], fabric_width: int, roll_length: int) -> Dict:
+    """Nest one fabric's panels onto rolls (also runs as a pool worker)."""
+    from endpoints.api.projects.nest import nest_rectangles_logic
+
+    return nest_rectangles_logic(
+        rectangles=rectangles,
+        fabric_height=fabric_width,
+        allow_rotation=True,
+        fabric_roll_length=roll_length
+    )
+
+
+def _nest_partitions(partitions: Dict[str, Dict]) -> Dict[str, Dict]:
+    """Nest every partition, concurrently on the nesting pool when there are several."""
+    if len(partitions) == 1:
+        runs = {
+            key: _nest_partition(p["rectangles"], p["fabric_width"], p["fabric_roll_length"])
+            for key, p in partitions.items()
+        }
+    else:
+        from endpoints.api.projects.shared.nest_pool import submit
+
+        futures = {
+            key: submit(_nest_partition, p["rectangles"], p["fabric_width"], p["fabric_roll_length"])
+            for key, p in partitions.items()
+        }
+        runs = {}
+        for key, future in futures.items():
+            try:
+                runs[key] = future.result()
+            except Exception as e:
+                runs[key] = {"error": f"Nesting failed: {e}"}
+
+    # Copy: results may be shared with the nest cache
+    return {
+        key: dict(
+            runs[key],
+            fabric_type=p["fabric_type"],
+            fabric_width=p["fabric_width"],
+            fabric_roll_length=runs[key].get("fabric_roll_length") or p["fabric_roll_length"],
+        )
+        for key, p in partitions.items()
+    }
+
+
 def calculate(data: Dict) -> Dict:
     """Per-project COVER calculations.
 
@@ -41,7 +107,7 @@ def calculate(data: Dict) -> Dict:
         height = _num(calculated.get("height"))
         seam = _num(calculated.get("seam")) or 20
         hem = _num(calculated.get("hem"))
-        fabric_width = _num(calculated.get("fabricWidth")) or 1500
+        fabric_width = _num(calculated.get("fabricWidth")) or DEFAULT_FABRIC_WIDTH
         quantity = max(1, int(_num(calculated.get("quantity")) or 1))
 
         if length is not None and width is not None:
@@ -144,63 +210,61 @@ def calculate(data: Dict) -> Dict:
     data["project_attributes"]["all_rectangles"] = all_rectangles
     data["project_attributes"]["all_meta_map"] = all_meta_map
 
-    # Perform nesting if we have rectangles
+    # Nest each fabric separately: panels only share a roll with panels of the same fabric
     if all_rectangles:
-        max_fabric_width = max(
-            (_num(p.get("attributes", {}).get("fabricWidth")) or 1500)
-            for p in products
-        )
-        max_roll_length = max(
-            (_num(p.get("attributes", {}).get("fabricRollLength")) or 50000)
-            for p in products
-        )
-        # Convert to integers for nesting
-        max_fabric_width = int(max_fabric_width)
-        max_roll_length = int(max_roll_length) if max_roll_length else None
-        
+        partitions = {}
+        for rect in all_rectangles:
+            prod_idx = all_meta_map[rect["label"]]["productIndex"]
+            fabric_type, width, roll_length = fabric_of(products[prod_idx].get("attributes") or {})
+            part = partitions.setdefault(fabric_key(fabric_type, width), {
+                "fabric_type": fabric_type,
+                "fabric_width": width,
+                "fabric_roll_length": roll_length,
+                "rectangles": [],
+            })
+            part["fabric_roll_length"] = max(part["fabric_roll_length"], roll_length)
+            part["rectangles"].append(rect)
+
         try:
-            # Call nesting logic directly (no HTTP request)
-            from endpoints.api.projects.nest import nest_rectangles_logic
-            
-            nest_result = nest_rectangles_logic(
-                rectangles=all_rectangles,
-                fabric_height=max_fabric_width,
-                allow_rotation=True,
-                fabric_roll_length=max_roll_length
-            )
-            
+            nest_by_fabric = _nest_partitions(partitions)
+
             # Distribute nest placements back to individual products
-            for label, placement in (nest_result.get("panels") or {}).items():
-                mm = all_meta_map.get(label)
-                if not mm:
-                    continue
-                prod = products[mm["productIndex"]]
-                if not prod:
-                    continue
-                calc = prod.get("calculated") or {}
-                if not calc.get("panels"):
-                    calc["panels"] = {}
-                calc["panels"][label] = {
-                    "width": mm["width"],
-                    "height": mm["height"],
-                    "base": mm["base"],
-                    "x": placement.get("x"),
-                    "y": placement.get("y"),
-                    "rotated": bool(placement.get("rotated", False))
-                }
-                prod["calculated"] = calc
-            
-            # Store project-level nest result
-            data["project_attributes"]["nest"] = nest_result
+            for key, nest_result in nest_by_fabric.items():
+                for label, placement in (nest_result.get("panels") or {}).items():
+                    mm = all_meta_map.get(label)
+                    if not mm:
+                        continue
+                    prod = products[mm["productIndex"]]
+                    if not prod:
+                        continue
+                    calc = prod.get("calculated") or {}
+                    if not calc.get("panels"):
+                        calc["panels"] = {}
+                    calc["panels"][label] = {
+                        "width": mm["width"],
+                        "height": mm["height"],
+                        "base": mm["base"],
+                        "fabric": key,
+                        "x": placement.get("x"),
+                        "y": placement.get("y"),
+                        "rotated": bool(placement.get("rotated", False))
+                    }
+                    prod["calculated"] = calc
+
+            # Store project-level nest results, one per fabric
+            data["project_attributes"]["nest"] = nest_by_fabric
             data["project_attributes"]["nested_panels"] = all_meta_map
-            
+            errors = [f"{key}: {r['error']}" for key, r in nest_by_fabric.items() if "error" in r]
+            if errors:
+                data["project_attributes"]["nestError"] = "; ".join(errors)
+
         except Exception as e:
             print(f"[COVER] Nesting error: {e}")
             data["project_attributes"]["nestError"] = str(e)
 
     return data
 
-__all__ = ["calculate"]
+__all__ = ["calculate", "fabric_key", "nest_partitions"]
 
 
 def _split_panel_if_needed(width, height, fabric_width, min_allowance, seam):
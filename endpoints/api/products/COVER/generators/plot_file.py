@@ -1,6 +1,7 @@
 import os
 import tempfile
 from flask import send_file, after_this_request
+from endpoints.api.products.COVER.calculations import nest_partitions
 from endpoints.api.projects.shared.dxf_utils import new_doc_mm, snap as _snap, merge_intervals
 
 def get_metadata():
@@ -267,30 +268,19 @@ def generate_dxf(project, download_name: str):
     # print("[DXF] Nest panels count:", len(nest.get("panels") or {}))
     
     dims = _dims_map_from_raw(nested_panels)
-    panels = nest.get("panels") or {}
-    bin_h = float(nest.get("bin_height") or nest.get("fabric_height") or 0)
     bin_padding = 500.0  # gap between rolls/bins in the drawing
-    total_w = float(nest.get("total_width") or nest.get("required_width") or 0)
-    total_h = float(nest.get("total_height") or 0)
-
-    # Compute overall extents if not provided
-    if panels:
-        for name, pos in panels.items():
-            if name not in dims:
-                continue
-
-            w, h, _, _ = dims[name]
-            if pos.get("rotated"):
-                w, h = h, w
 
+    # One nest per fabric; each fabric's rolls are stacked below the previous fabric's
+    placements = []
+    fabric_offset_y = 0.0
+    for part in nest_partitions(nest).values():
+        bin_h = float(part.get("bin_height") or part.get("fabric_height") or 0)
+        bins = 1
+        for name, pos in (part.get("panels") or {}).items():
             bin_idx = int(pos.get("bin", 0) or 0)
-            bin_offset_y = bin_idx * (bin_h + bin_padding)
-
-            px = float(pos.get("x", 0))
-            py = float(pos.get("y", 0)) - bin_offset_y
-
-            total_w = max(total_w, px + w)
-            total_h = max(total_h, py + h)
+            bins = max(bins, bin_idx + 1)
+            placements.append((name, pos, fabric_offset_y + bin_idx * (bin_h + bin_padding)))
+        fabric_offset_y += bins * (bin_h + bin_padding)
 
     # --- Collect intervals ---
     # horizontals[y] -> list of (x1, x2)
@@ -315,7 +305,7 @@ def generate_dxf(project, download_name: str):
     # print("[DXF] panels count:", len(panels))
 
     # Panels + labels
-    for name, pos in panels.items():
+    for name, pos, offset_y in placements:
         base = _basename(str(name))
         if name not in dims:
             # print(f"[DXF] skip: name='{name}' (base='{base}') not in dims")
@@ -325,11 +315,8 @@ def generate_dxf(project, download_name: str):
         if pos.get("rotated"):
             w, h = h, w
 
-        bin_idx = int(pos.get("bin", 0) or 0)
-        bin_offset_y = bin_idx * (bin_h + bin_padding)
-
         x = float(pos.get("x", 0))
-        y = float(pos.get("y", 0)) - bin_offset_y
+        y = float(pos.get("y", 0)) - offset_y
         
         # Get this panel's product dimensions
         prod_dim = product_dims.get(prod_idx, {})
@@ -9,11 +9,30 @@ def _num(v):
         return None
 
 
+def _previous_nest(project_attrs: Dict, meta_map: Dict):
+    """Previous nest without the placements of rectangles that have been resized."""
+    previous = project_attrs.get("nest")
+    if not isinstance(previous, dict) or not previous.get("panels"):
+        return None
+    old_meta = project_attrs.get("nested_panels") or {}
+    panels = {}
+    for label, placement in previous["panels"].items():
+        old, new = old_meta.get(label), meta_map.get(label)
+        if old and new and (_num(old.get("width")), _num(old.get("height"))) != (new["width"], new["height"]):
+            continue
+        panels[label] = placement
+    return dict(previous, panels=panels)
+
+
 def calculate(data: Dict) -> Dict:
     """Per-project RECTANGLES calculations.
     
     Expects payload with 'project_attributes' containing 'rectangles' list and nesting params.
     Calls nest_rectangles_logic and returns placements in the response.
+
+    If the payload still carries the previous 'nest' (and 'nested_panels'), unchanged
+    rectangles keep their placements and only new or resized ones are placed into the
+    free space; set 'repack' to nest everything from scratch.
     """
     project_attrs = data.get("project_attributes") or {}
     rectangles = project_attrs.get("rectangles") or []
@@ -59,7 +78,9 @@ def calculate(data: Dict) -> Dict:
                 rectangles=nest_rects,
                 fabric_height=int(fabric_width),  # renamed for consistency
                 allow_rotation=allow_rotation,
-                fabric_roll_length=int(fabric_roll_length) if fabric_roll_length else None
+                fabric_roll_length=int(fabric_roll_length) if fabric_roll_length else None,
+                previous=_previous_nest(project_attrs, meta_map),
+                repack=bool(project_attrs.get("repack"))
             )
             # Distribute nest placements back to meta_map
             for label, placement in (nest_result.get("panels") or {}).items():
@@ -0,0 +1,74 @@
+import os
+import tempfile
+from flask import send_file, after_this_request
+from endpoints.api.projects.shared.dxf_utils import new_doc_mm
+from endpoints.api.projects.shared.fabric import fabric_of
+from endpoints.api.projects.shared.polygon_nest import nest_entities, nest_polygons
+from .shared import sail_outlines
+from .simple_dxf import add_entities_to_msp
+
+# Sail membranes come off 3.2m rolls unless the project says otherwise
+SAIL_FABRIC_WIDTH = 3200
+# Sails are rarely square to the roll; 30 degree steps find far tighter fits than 90
+ROTATION_STEPS = 12
+
+
+def get_metadata():
+    return {
+        "id": "membrane_nest",
+        "name": "Membrane Nest",
+        "type": "dxf"
+    }
+
+
+def generate(project, **kwargs):
+    """
+    Generates a DXF of the sail membranes nested onto fabric rolls.
+    """
+    project_name = project.get("general", {}).get("name", "Unnamed")
+    filename = f"{project_name}_membrane_nest.dxf"
+    return generate_dxf(project, filename)
+
+
+def generate_dxf(project, download_name: str):
+    doc, msp = new_doc_mm()
+    _, fabric_width, roll_length = fabric_of(project.get("project_attributes") or {}, default_width=SAIL_FABRIC_WIDTH)
+
+    try:
+        result = nest_polygons(sail_outlines(project), fabric_width, roll_length, rotation_steps=ROTATION_STEPS)
+    except ValueError as e:
+        result = {"error": str(e)}
+
+    if "error" in result:
+        msp.add_mtext(f"Membrane nest failed: {result['error']}", dxfattribs={"layer": "AD_INFO", "char_height": 200}).set_location((0, 0))
+    else:
+        summary = (
+            f"Fabric {int(fabric_width)}mm | Rolls: {result['num_rolls']} | "
+            f"Length: {result['total_width']}mm | Utilisation: {result['utilisation'] * 100:.1f}%"
+        )
+        msp.add_mtext(summary, dxfattribs={"layer": "AD_INFO", "char_height": 200}).set_location((0, fabric_width + 800))
+        add_entities_to_msp(msp, nest_entities(result))
+
+    tmp = tempfile.NamedTemporaryFile(suffix=".dxf", delete=False)
+    tmp_path = tmp.name
+    tmp.close()
+    doc.saveas(tmp_path)
+
+    @after_this_request
+    def _cleanup(response):
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return response
+
+    return send_file(
+        tmp_path,
+        mimetype="application/octet-stream",
+        as_attachment=True,
+        download_name=download_name,
+        max_age=0,
+        etag=False,
+        conditional=False,
+        last_modified=None,
+    )
@@ -5,6 +5,7 @@ Provides common drawing functions that can be used by both DXF and PDF generator
 """
 
 import math
+import numpy as np
 from endpoints.api.products.SHADE_SAIL.calculations import calculate as _calculate_project
 
 
@@ -702,3 +703,43 @@ def generate_sails_layout(project: dict) -> list:
         x_offset += advance + spacing
         
     return layout_result
+
+
+def _signed_area(points) -> float:
+    x, y = points[:, 0], points[:, 1]
+    return 0.5 * float(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)))
+
+
+def sail_outlines(project: dict) -> list:
+    """
+    Flat outlines of every sail, for membrane nesting.
+
+    Each sail's corners (x, y, height) are projected onto their best-fit plane,
+    which approximates the flat membrane better than the plan view when the
+    corners are at different heights.
+    Returns [{"label", "points": [[x, y], ...], "quantity": 1}] in mm.
+    """
+    if not isinstance(project, dict) or not project.get("products"):
+        return []
+    _calculate_project(project)
+
+    outlines = []
+    for idx, pp in enumerate(project.get("products") or []):
+        geo = extract_sail_geometry(pp)
+        corners = np.array([geo['positions'][label] for label in geo['point_order']], dtype=float)
+        if len(corners) < 3:
+            continue
+        centred = corners - corners.mean(axis=0)
+        # The two principal directions span the best-fit plane
+        _, _, axes = np.linalg.svd(centred)
+        flat = centred @ axes[:2].T
+        # Keep the plan's winding so the membrane is not cut mirrored
+        if _signed_area(flat) * _signed_area(centred[:, :2]) < 0:
+            flat[:, 1] = -flat[:, 1]
+        name = pp.get("name")
+        outlines.append({
+            "label": f"S{idx + 1} {name}" if name else f"S{idx + 1}",
+            "points": flat.tolist(),
+            "quantity": 1,
+        })
+    return outlines
@@ -1,21 +1,53 @@
 # endpoints/api/products/nest.py
+import argparse
+import contextlib
+import json
+import logging
+import os
+import re
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
 from typing import Dict, List, Tuple, Optional
 
-from flask import Blueprint, request, jsonify
+import numpy as np
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from flask_jwt_extended import jwt_required
 from rectpack import newPacker
 from sqlalchemy.orm.attributes import flag_modified
 
 from endpoints.api.auth.utils import current_user, role_required
+from endpoints.api.projects.services.nest_jobs import (
+    CANCELLED as JOB_CANCELLED,
+    DONE as JOB_DONE,
+    FAILED as JOB_FAILED,
+    NestJobQueueFull,
+    nest_jobs,
+)
+from endpoints.api.projects.shared.nest_bounds import gap_report, width_lower_bound
+from endpoints.api.projects.shared.nest_cache import make_key, nest_cache
+from endpoints.api.projects.shared.nest_improve import improve_rolls
+from endpoints.api.projects.shared.nest_incremental import insert_into_nest
+from endpoints.api.projects.shared.nest_pool import pool_size, shutdown_pool
+from endpoints.api.projects.shared.nest_portfolio import run_portfolio
+from endpoints.api.projects.shared.nest_sweep import run_sweep
+from endpoints.api.projects.shared.pattern_nest import pattern_nest
+from endpoints.api.projects.shared.rectangle_set import RectangleSet, as_rectangle_set, group_small_panels
+from endpoints.api.projects.shared.strip_pack import DEFAULT_SORT_KEYS, iter_rolls, pack_rolls, pack_strip
 
 nest_bp = Blueprint("nest_bp", __name__)
+logger = logging.getLogger(__name__)
+
+
+class NestCancelled(Exception):
+    """Raised from a progress callback to abort a nest in progress."""
 
 
 # ---------- Helpers ----------
-def prepare_rectangles(data: dict) -> List[Tuple[int, int, str]]:
+def prepare_rectangles(data: dict) -> RectangleSet:
     """
-    Build a list of (width, height, label) tuples for rectpack.
+    Build the (width, height, label) rectangle set for rectpack.
     - Enforces integers (mm).
     - Preserves original labels like "1_A", "2_B", etc.
     - Optional small-panel grouping to reduce fragmentation.
@@ -34,7 +66,9 @@ def prepare_rectangles(data: dict) -> List[Tuple[int, int, str]]:
     small_side_max = int(data.get("small_side_max", 500))   # mm
     group_row_max  = int(data.get("group_row_max", 2000))   # mm
 
-    rectangles: List[Tuple[int, int, str]] = []
+    widths: List[int] = []
+    heights: List[int] = []
+    labels: List[str] = []
 
     # Build base rectangles
     for i in range(1, quantity + 1):
@@ -47,32 +81,12 @@ def prepare_rectangles(data: dict) -> List[Tuple[int, int, str]]:
             if w <= 0 or h <= 0:
                 raise ValueError(f"Panel '{name}' width/height must be > 0")
 
-            label = f"{i}_{name}"
-            rectangles.append((w, h, label))
-
-    # Sort by larger side desc (helps packer)
-    rectangles.sort(key=lambda r: max(r[0], r[1]), reverse=True)
-
-    # Simple horizontal grouping for small panels (optional heuristic)
-    small_panels = [r for r in rectangles if r[0] < small_side_max and r[1] < small_side_max]
-    large_panels = [r for r in rectangles if r not in small_panels]
+            widths.append(w)
+            heights.append(h)
+            labels.append(f"{i}_{name}")
 
-    grouped_rectangles: List[Tuple[int, int, str]] = []
-    while small_panels:
-        row_w = 0
-        row_h = 0
-        row = []
-        # Greedy: keep adding until row width limit
-        while small_panels and row_w + small_panels[0][0] <= group_row_max:
-            w, h, lbl = small_panels.pop(0)
-            row_w += w
-            row_h = max(row_h, h)
-            row.append((w, h, lbl))
-        if row:
-            grouped_rectangles.append((row_w, row_h, f"group_{len(grouped_rectangles)}"))
-
-    grouped_rectangles.extend(large_panels)
-    return grouped_rectangles
+    # Sort by larger side desc (helps packer), then group small panels into rows
+    return group_small_panels(RectangleSet(widths, heights, labels), small_side_max, group_row_max)
 
 
 def can_fit(rectangles: List[Tuple[int, int, str]], bin_width: int, bin_height: int, allow_rotation: bool):
@@ -90,56 +104,100 @@ def run_rectpack_with_fixed_height(
     rectangles: List[Tuple[int, int, str]],
     fabric_height: int,
     allow_rotation: bool = True,
-    fabric_roll_length: int = None
+    fabric_roll_length: int = None,
+    engine: str = "strip",
+    progress=None,
+    patterns: bool = True,
 ):
     """
-    Binary search minimal width to fit all rectangles into bins of height = fabric_height.
+    Minimise the used width of a strip of height = fabric_height.
     If fabric_roll_length is provided, creates multiple bins (rolls) with max width = fabric_roll_length,
     optimizing to minimize total rolls and then minimize last roll length.
+
+    engine="strip" (default) packs once into an open-ended strip and reads the used width
+    directly. engine="rectpack" keeps the legacy binary search over bin widths, searching
+    only between the lower bound and a greedy strip pack and stopping at the lower bound.
+    Results carry "bounds": {lower_bound, gap, gap_pct, optimal} (see shared/nest_bounds.py).
+    With patterns (default), heavily repeated panels are also nested by tiling a packed
+    pattern of whole units (see shared/pattern_nest.py); that result is kept, with
+    engine="pattern" and a "pattern" block, only when it uses no more fabric than the plain
+    pack. The explicit rectpack search never uses patterns.
+    progress, if given, is called as progress(probes_done, best_width) after every packing
+    pass/probe; raising NestCancelled from it aborts the nest.
     Returns placements and bin information.
     """
     if fabric_height <= 0:
         raise ValueError("fabric_height must be a positive integer")
 
+    rects = as_rectangle_set(rectangles)
+    lower_bound = width_lower_bound(rects, fabric_height, allow_rotation)
+
+    patterned = None
+    if patterns and (engine == "strip" or fabric_roll_length):
+        patterned = _pack_patterned(rects, fabric_height, fabric_roll_length, allow_rotation)
+
     # If roll length optimization requested, pack into multiple fixed-width bins
     if fabric_roll_length and fabric_roll_length > 0:
-        return pack_into_multiple_rolls(rectangles, fabric_height, fabric_roll_length, allow_rotation)
-    
-    # Original single-bin behavior
-    min_width = max(r[0] for r in rectangles)  # at least the widest
-    max_width = sum(r[0] for r in rectangles)  # worst case: side by side
+        result = pack_into_multiple_rolls(rects, fabric_height, fabric_roll_length, allow_rotation, progress=progress)
+    elif engine == "strip":
+        result = _pack_open_strip(rects, fabric_height, allow_rotation, progress=progress)
+    else:
+        result = None
+
+    if result is not None:
+        # Tiling usually wins on repeat orders but not always; keep whichever uses less fabric
+        if patterned is not None and _fabric_used(patterned) <= _fabric_used(result):
+            result = patterned
+            if progress:
+                progress(1, result["total_width"])
+        result["bounds"] = gap_report(result["total_width"], lower_bound, fabric_roll_length=fabric_roll_length)
+        return result
+    if engine != "rectpack":
+        raise ValueError(f"Unknown nesting engine '{engine}'")
+
+    # Legacy rectpack search over bin widths, bracketed by the lower bound and a
+    # greedy strip pack (always feasible) as the upper bound
+    greedy, upper_bound, _ = pack_strip(rects, fabric_height, allow_rotation, sort_keys=("area",))
     best_packer = None
-    best_width = None
+    best_width = upper_bound
+    probes = 0
 
-    lo, hi = min_width, max_width
-    while lo <= hi:
-        mid = (lo + hi) // 2
-        fits, packer = can_fit(rectangles, mid, fabric_height, allow_rotation)
+    def probe(width):
+        nonlocal best_packer, best_width, probes
+        fits, packer = can_fit(rects, width, fabric_height, allow_rotation)
+        probes += 1
         if fits:
             best_packer = packer
-            best_width = mid
-            hi = mid - 1
-        else:
-            lo = mid + 1
+            best_width = width
+        if progress:
+            progress(probes, best_width)
+        return fits
 
-    # Safety: try final lo if we never found a fit during search
-    if best_packer is None:
-        fits, packer = can_fit(rectangles, lo, fabric_height, allow_rotation)
-        if not fits:
-            raise ValueError("Cannot fit panels in the given height.")
-        best_packer = packer
-        best_width = lo
+    # The lower bound is often achievable; if it fits, nothing shorter exists
+    if lower_bound < upper_bound and not probe(lower_bound):
+        lo, hi = lower_bound + 1, upper_bound - 1
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            if probe(mid):
+                hi = mid - 1
+            else:
+                lo = mid + 1
 
     # Extract placements
     placements: Dict[str, Dict[str, int | bool]] = {}
     total_used_w = 0
 
-    for (bin_idx, x, y, w, h, rid) in best_packer.rect_list():
-        # Determine rotation by comparing to original tuple
-        orig = next(r for r in rectangles if r[2] == rid)
-        rotated = (w != orig[0] or h != orig[1])
-        placements[rid] = {"x": x, "y": y, "rotated": rotated}
-        total_used_w = max(total_used_w, x + w)
+    if best_packer is None:
+        # rectpack never beat the greedy pack
+        for rid, p in greedy.items():
+            placements[rid] = {"x": p["x"], "y": p["y"], "rotated": p["rotated"]}
+            total_used_w = max(total_used_w, p["x"] + p["w"])
+    else:
+        for (bin_idx, x, y, w, h, rid) in best_packer.rect_list():
+            # Determine rotation by comparing to the source dimensions
+            rotated = rects.is_rotated(rid, w, h)
+            placements[rid] = {"x": x, "y": y, "rotated": rotated}
+            total_used_w = max(total_used_w, x + w)
 
     return {
         "panels": placements,
@@ -147,40 +205,132 @@ def run_rectpack_with_fixed_height(
         "required_width": int(best_width),  # minimal bin width that fits
         "bin_height": int(fabric_height),
         "rotation": bool(allow_rotation),
+        "engine": "rectpack",
+        "bounds": gap_report(total_used_w, lower_bound, upper_bound),
     }
 
 
+def _pack_open_strip(
+    rectangles: List[Tuple[int, int, str]],
+    fabric_height: int,
+    allow_rotation: bool = True,
+    sort_keys=DEFAULT_SORT_KEYS,
+    progress=None,
+):
+    """Single-pass MaxRects packing into an open-ended strip (see shared/strip_pack.py)."""
+    packed, used_width, _ = pack_strip(rectangles, fabric_height, allow_rotation, sort_keys, progress=progress)
+
+    placements: Dict[str, Dict[str, int | bool]] = {
+        rid: {"x": p["x"], "y": p["y"], "rotated": p["rotated"]}
+        for rid, p in packed.items()
+    }
+
+    return {
+        "panels": placements,
+        "total_width": int(used_width),  # actual used width
+        "required_width": int(used_width),  # open-ended strip: the used width is the bin width
+        "bin_height": int(fabric_height),
+        "rotation": bool(allow_rotation),
+        "engine": "strip",
+    }
+
+
+def _fabric_used(result) -> Tuple[int, float]:
+    """Comparable fabric use of a fixed-height result: (rolls, total length)."""
+    return int(result.get("num_rolls") or 1), float(result.get("total_width") or 0)
+
+
+def _pack_patterned(rects, fabric_height: int, fabric_roll_length: Optional[int], allow_rotation: bool):
+    """Pattern-tiled nest in the usual result shape, or None if panels do not repeat enough."""
+    nested = pattern_nest(rects, fabric_height, fabric_roll_length or None, allow_rotation)
+    if nested is None:
+        return None
+    placed, info = nested
+
+    if fabric_roll_length:
+        result = _build_rolls_result(rects, placed, fabric_height, fabric_roll_length, allow_rotation)
+    else:
+        used_width = max(x + w for _, x, _, w, _, _ in placed)
+        result = {
+            "panels": {
+                rid: {"x": x, "y": y, "rotated": rects.is_rotated(rid, w, h)}
+                for _, x, y, w, h, rid in placed
+            },
+            "total_width": int(used_width),
+            "required_width": int(used_width),
+            "bin_height": int(fabric_height),
+            "rotation": bool(allow_rotation),
+        }
+    result["engine"] = "pattern"
+    result["pattern"] = info
+    return result
+
+
+# rectpack sort functions addressable by name (see nest_portfolio strategies)
+RECTPACK_SORTS = {
+    "area": "SORT_AREA",
+    "long_side": "SORT_LSIDE",
+    "perimeter": "SORT_PERI",
+    "short_side": "SORT_SSIDE",
+    "ratio": "SORT_RATIO",
+}
+
+
 def pack_into_multiple_rolls(
     rectangles: List[Tuple[int, int, str]],
     fabric_height: int,
     fabric_roll_length: int,
-    allow_rotation: bool = True
+    allow_rotation: bool = True,
+    pack_algo: str = "MaxRectsBssf",
+    sort_key: str = "area",
+    progress=None,
 ):
     """
     Pack rectangles into multiple bins (rolls), each with max width = fabric_roll_length.
     Uses rectpack to automatically distribute across bins (rolls).
+    pack_algo names a rectpack algorithm class (e.g. "MaxRectsBssf", "SkylineBlWm",
+    "GuillotineBssfSas") or "strip" for the native first-fit strip packer.
     Returns bins with their placements.
     """
     import rectpack
     
-    #print(f"[DEBUG] pack_into_multiple_rolls called with:")
-    print(f"  fabric_height (bin height): {fabric_height}")
-    print(f"  fabric_roll_length (bin width): {fabric_roll_length}")
-    print(f"  allow_rotation: {allow_rotation}")
-    print(f"  num rectangles: {len(rectangles)}")
+    # Hot path: runs per portfolio strategy, improve pass and stream
+    logger.debug(
+        "pack_into_multiple_rolls: fabric_height=%s fabric_roll_length=%s allow_rotation=%s rectangles=%d",
+        fabric_height, fabric_roll_length, allow_rotation, len(rectangles),
+    )
+
+    rects = as_rectangle_set(rectangles)
+
+    if pack_algo == "strip":
+        roll_placements = pack_rolls(rects, fabric_height, fabric_roll_length, allow_rotation, sort_key)
+        placed = [
+            (bin_idx, p["x"], p["y"], p["w"], p["h"], rid)
+            for bin_idx, roll in enumerate(roll_placements)
+            for rid, p in roll.items()
+        ]
+        result = _build_rolls_result(rects, placed, fabric_height, fabric_roll_length, allow_rotation)
+        if progress:
+            progress(1, result["total_width"])
+        return result
+
+    algo_cls = getattr(rectpack, pack_algo, None)
+    sort_algo = getattr(rectpack, RECTPACK_SORTS.get(sort_key, ""), None)
+    if algo_cls is None or sort_algo is None:
+        raise ValueError(f"Unknown packing strategy '{pack_algo}/{sort_key}'")
     
     # Sort rectangles by area (largest first) for better packing
-    sorted_rects = sorted(rectangles, key=lambda r: r[0] * r[1], reverse=True)
+    sorted_rects = rects.take(np.argsort(-rects.areas, kind="stable"))
     
     # Estimate number of bins needed (generous overestimate)
-    total_area = sum(r[0] * r[1] for r in sorted_rects)
+    total_area = rects.total_area()
     bin_area = fabric_roll_length * fabric_height
     estimated_bins = max(3, int((total_area / bin_area) * 1.5) + 2)
     
     #print(f"[DEBUG] Creating packer with {estimated_bins} bins")
     
     # Create single packer with multiple bins
-    packer = rectpack.newPacker(rotation=allow_rotation, pack_algo=rectpack.MaxRectsBssf)
+    packer = rectpack.newPacker(rotation=allow_rotation, pack_algo=algo_cls, sort_algo=sort_algo)
     
     # Add multiple bins (rolls)
     for i in range(estimated_bins):
@@ -194,19 +344,34 @@ def pack_into_multiple_rolls(
     # Pack!
     #print(f"[DEBUG] Packing rectangles...")
     packer.pack()
-    
+
+    result = _build_rolls_result(rects, packer.rect_list(), fabric_height, fabric_roll_length, allow_rotation)
+    if progress:
+        progress(1, result["total_width"])
+    return result
+
+
+def _build_rolls_result(
+    rectangles: List[Tuple[int, int, str]],
+    placed,
+    fabric_height: int,
+    fabric_roll_length: int,
+    allow_rotation: bool,
+):
+    """Turn (bin_idx, x, y, w, h, rid) placements into the multi-roll result shape."""
+    rects = as_rectangle_set(rectangles)
+
     # Extract placements per bin
     all_placements = {}
     rolls = []
     bins_used = {}
     
     #print(f"[DEBUG] Extracting placements...")
-    for bin_idx, x, y, w, h, rid in packer.rect_list():
+    for bin_idx, x, y, w, h, rid in placed:
         #print(f"[DEBUG] Panel {rid} placed in bin {bin_idx} at ({x}, {y}) size {w}x{h}")
         
         # Determine rotation
-        orig = next(r for r in rectangles if r[2] == rid)
-        rotated = (w != orig[0] or h != orig[1])
+        rotated = rects.is_rotated(rid, w, h)
         
         if bin_idx not in bins_used:
             bins_used[bin_idx] = {
@@ -265,8 +430,41 @@ def pack_into_multiple_rolls(
     return result
 
 
+def iter_multiple_rolls(
+    rectangles: List[Tuple[int, int, str]],
+    fabric_height: int,
+    fabric_roll_length: int,
+    allow_rotation: bool = True,
+    sort_key: str = "area",
+):
+    """
+    Streaming counterpart of pack_into_multiple_rolls(pack_algo="strip").
+
+    Rolls are packed one at a time and each is yielded as soon as it is closed,
+    in the same shape as the entries of result["rolls"]. Only the open roll's
+    free space is held, so very long runs can be written out roll by roll.
+    """
+    rects = as_rectangle_set(rectangles)
+    total = len(rects)
+    placed_count = 0
+
+    for bin_idx, roll in enumerate(iter_rolls(rects, fabric_height, fabric_roll_length, allow_rotation, sort_key)):
+        placed_count += len(roll)
+        yield {
+            "roll_number": bin_idx + 1,
+            "width": max(p["x"] + p["w"] for p in roll.values()),
+            "max_width": fabric_roll_length,
+            "height": fabric_height,
+            "panels": {
+                rid: {"x": p["x"], "y": p["y"], "rotated": rects.is_rotated(rid, p["w"], p["h"]), "bin": bin_idx}
+                for rid, p in roll.items()
+            },
+            "is_last": placed_count == total,
+        }
+
+
 # ---------- Generic helpers ----------
-def prepare_arbitrary_rectangles(data: dict) -> List[Tuple[int, int, str]]:
+def prepare_arbitrary_rectangles(data: dict) -> RectangleSet:
     """
     Accepts an object like:
     {
@@ -279,14 +477,16 @@ def prepare_arbitrary_rectangles(data: dict) -> List[Tuple[int, int, str]]:
       "group_row_max": 2000            # optional if grouping
     }
 
-    Returns a list of (w, h, label) tuples. If grouping is enabled, small panels are grouped heuristically
+    Returns a RectangleSet of (w, h, label). If grouping is enabled, small panels are grouped heuristically
     into rows similar to prepare_rectangles.
     """
     rects = data.get("rectangles")
     if not isinstance(rects, list) or not rects:
         raise ValueError("rectangles must be a non-empty array")
 
-    tuples: List[Tuple[int, int, str]] = []
+    widths: List[int] = []
+    heights: List[int] = []
+    labels: List[str] = []
     auto_index = 1
     for item in rects:
         if not isinstance(item, dict):
@@ -303,33 +503,20 @@ def prepare_arbitrary_rectangles(data: dict) -> List[Tuple[int, int, str]]:
             raise ValueError("quantity must be positive")
         label_base = str(item.get("label") or f"R{auto_index}")
         for i in range(1, qty + 1):
-            label = label_base if qty == 1 else f"{label_base}_{i}"
-            tuples.append((w, h, label))
+            widths.append(w)
+            heights.append(h)
+            labels.append(label_base if qty == 1 else f"{label_base}_{i}")
         auto_index += 1
 
+    rect_set = RectangleSet(widths, heights, labels)
+
     # Optional heuristic grouping, if requested
     if bool(data.get("group_small", False)):
         small_side_max = int(data.get("small_side_max", 500))
         group_row_max = int(data.get("group_row_max", 2000))
-        tuples.sort(key=lambda r: max(r[0], r[1]), reverse=True)
-        small_panels = [r for r in tuples if r[0] < small_side_max and r[1] < small_side_max]
-        large_panels = [r for r in tuples if r not in small_panels]
-        grouped: List[Tuple[int, int, str]] = []
-        while small_panels:
-            row_w = 0
-            row_h = 0
-            row = []
-            while small_panels and row_w + small_panels[0][0] <= group_row_max:
-                w, h, lbl = small_panels.pop(0)
-                row_w += w
-                row_h = max(row_h, h)
-                row.append((w, h, lbl))
-            if row:
-                grouped.append((row_w, row_h, f"group_{len(grouped)}"))
-        grouped.extend(large_panels)
-        return grouped
-
-    return tuples
+        return group_small_panels(rect_set, small_side_max, group_row_max)
+
+    return rect_set
 
 
 def pack_into_fixed_bin(
@@ -345,7 +532,8 @@ def pack_into_fixed_bin(
     if bin_width <= 0 or bin_height <= 0:
         raise ValueError("bin_width and bin_height must be positive integers")
 
-    fits, packer = can_fit(rectangles, bin_width, bin_height, allow_rotation)
+    rects = as_rectangle_set(rectangles)
+    fits, packer = can_fit(rects, bin_width, bin_height, allow_rotation)
     if not fits:
         raise ValueError("Cannot fit rectangles into the fixed bin size")
 
@@ -353,7 +541,7 @@ def pack_into_fixed_bin(
     used_w = 0
     used_h = 0
     for (bin_idx, x, y, w, h, rid) in packer.rect_list():
-        placements[rid] = {"x": x, "y": y, "rotated": (w, h) != next(r[:2] for r in rectangles if r[2] == rid)}
+        placements[rid] = {"x": x, "y": y, "rotated": rects.is_rotated(rid, w, h)}
         used_w = max(used_w, x + w)
         used_h = max(used_h, y + h)
 
@@ -432,10 +620,21 @@ def nest_rectangles():
          "allowRotation": true,       # optional
          "group_small": false,        # optional
          "small_side_max": 500,
-         "group_row_max": 2000
+         "group_row_max": 2000,
+         "fabricRollLength": 50000,   # optional, split into rolls of this length
+         "time_budget_ms": 500,       # optional, race the packer portfolio for this long
+         "improve_ms": 500,           # optional, with rolls: then try to shorten the last roll
+         "previous": { ... },         # optional, last result: only place new rectangles into it
+         "repack": false,             # optional, ignore "previous" and nest from scratch
+         "fabricHeights": [1370, 1500, 2000],  # optional sweep: nest per width (and per
+         "fabricRollLengths": [50000]          #   roll length), ranked under "sweep"
        }
 
        Returns { panels, total_width, required_width, bin_height, rotation }
+       (+ rolls/num_rolls with fabricRollLength, + portfolio with time_budget_ms,
+        + improvement with improve_ms; with fabricHeights the best option's result
+        plus sweep: {options: [{fabric_height, fabric_roll_length, rank, total_width,
+        num_rolls, last_roll_length, fabric_area_m2, waste_m2, utilisation}]})
 
     2) Fixed-size bin:
        {
@@ -455,15 +654,7 @@ def nest_rectangles():
     except Exception:
         return jsonify({"error": "Invalid JSON"}), 400
 
-    result = nest_rectangles_logic(
-        rectangles=data.get("rectangles"),
-        fabric_height=data.get("fabricHeight") or data.get("fabric_height") or data.get("bin_height"),
-        allow_rotation=data.get("allowRotation", True),
-        bin_obj=data.get("bin"),
-        group_small=data.get("group_small", False),
-        small_side_max=data.get("small_side_max", 500),
-        group_row_max=data.get("group_row_max", 2000)
-    )
+    result = nest_rectangles_logic(**_nest_params_from_body(data))
     
     if "error" in result:
         return jsonify(result), 400 if "not found" not in result["error"].lower() else 500
@@ -471,6 +662,247 @@ def nest_rectangles():
     return jsonify(result), 200
 
 
+def _nest_params_from_body(data: dict) -> dict:
+    """Map a /nest_rectangles request body onto nest_rectangles_logic kwargs."""
+    return {
+        "rectangles": data.get("rectangles"),
+        "fabric_height": data.get("fabricHeight") or data.get("fabric_height") or data.get("bin_height"),
+        "allow_rotation": data.get("allowRotation", True),
+        "bin_obj": data.get("bin"),
+        "group_small": data.get("group_small", False),
+        "small_side_max": data.get("small_side_max", 500),
+        "group_row_max": data.get("group_row_max", 2000),
+        "fabric_roll_length": data.get("fabricRollLength") or data.get("fabric_roll_length"),
+        "time_budget_ms": data.get("time_budget_ms") or data.get("timeBudgetMs"),
+        "improve_ms": data.get("improve_ms") or data.get("improveMs"),
+        "previous": data.get("previous"),
+        "repack": bool(data.get("repack", False)),
+        "fabric_heights": data.get("fabricHeights") or data.get("fabric_heights"),
+        "fabric_roll_lengths": data.get("fabricRollLengths") or data.get("fabric_roll_lengths"),
+    }
+
+
+@nest_bp.route("/nest_rectangles/stream", methods=["POST"])
+@role_required("estimator", "designer", "client")
+def nest_rectangles_stream():
+    """
+    Multi-roll nesting streamed as NDJSON, one roll per line as it is packed.
+
+    Body as /nest_rectangles mode 1; fabricRollLength is required. Each line is
+    a roll ({roll_number, width, max_width, height, panels, is_last}); the last
+    line is a summary {done, num_rolls, total_width, last_roll_length, bin_height,
+    fabric_roll_length, rotation}, or {error} if packing fails part-way.
+    """
+    try:
+        data = request.get_json(force=True) or {}
+    except Exception:
+        return jsonify({"error": "Invalid JSON"}), 400
+
+    params = _nest_params_from_body(data)
+    if not params["fabric_height"] or not params["fabric_roll_length"]:
+        return jsonify({"error": "fabricHeight and fabricRollLength are required"}), 400
+    try:
+        rects = prepare_arbitrary_rectangles(params)
+        fabric_height = int(round(float(params["fabric_height"])))
+        roll_length = int(round(float(params["fabric_roll_length"])))
+        if fabric_height <= 0 or roll_length <= 0:
+            raise ValueError("fabricHeight and fabricRollLength must be positive")
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid request: {e}"}), 400
+    allow_rotation = bool(params["allow_rotation"])
+
+    def generate():
+        num_rolls = 0
+        total_width = 0
+        last_width = 0
+        try:
+            for roll in iter_multiple_rolls(rects, fabric_height, roll_length, allow_rotation):
+                num_rolls += 1
+                total_width += roll["width"]
+                last_width = roll["width"]
+                yield json.dumps(roll) + "\n"
+        except ValueError as ve:
+            yield json.dumps({"error": str(ve)}) + "\n"
+            return
+        yield json.dumps({
+            "done": True,
+            "num_rolls": num_rolls,
+            "total_width": total_width,
+            "last_roll_length": last_width,
+            "bin_height": fabric_height,
+            "fabric_roll_length": roll_length,
+            "rotation": allow_rotation,
+        }) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+@nest_bp.route("/nest_polygons", methods=["POST"])
+@role_required("estimator", "designer", "client")
+def nest_polygons_route():
+    """
+    Polygon nesting (shade sail membranes and other non-rectangular panels).
+
+    Body:
+    {
+      "polygons": [ {"label": "S1", "points": [[0, 0], [4000, 0], [1500, 2800]], "quantity": 1}, ... ],
+      "fabricHeight": 3200,        # required, fabric width across the roll
+      "fabricRollLength": 50000,   # optional, split into rolls of this length
+      "rotationSteps": 4,          # optional, evenly spaced rotations to try (1 = none, at most 36)
+      "resolution": 16,            # optional, collision grid cell in mm
+      "gap": 20                    # optional, clearance between outlines in mm
+    }
+
+    Returns { panels: {label: {x, y, bin, rotation, tx, ty, points}}, total_width,
+    required_width, bin_height, rotation, rotation_steps, resolution, gap, utilisation,
+    engine: "polygon" } (+ rolls/num_rolls with fabricRollLength).
+    400 when the job exceeds the polygon nest limits (count, cells across, total raster work).
+    """
+    from endpoints.api.projects.shared.polygon_nest import DEFAULT_GAP, DEFAULT_ROTATION_STEPS, nest_polygons
+
+    user = current_user(required=True)
+    if not user:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    try:
+        data = request.get_json(force=True) or {}
+    except Exception:
+        return jsonify({"error": "Invalid JSON"}), 400
+
+    fabric_height = data.get("fabricHeight") or data.get("fabric_height")
+    if not fabric_height:
+        return jsonify({"error": "fabricHeight is required"}), 400
+    try:
+        result = nest_polygons(
+            data.get("polygons"),
+            float(fabric_height),
+            fabric_roll_length=data.get("fabricRollLength") or data.get("fabric_roll_length"),
+            rotation_steps=int(data.get("rotationSteps") or DEFAULT_ROTATION_STEPS),
+            resolution=data.get("resolution"),
+            gap=data.get("gap", DEFAULT_GAP),
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(result), 200
+
+
+@nest_bp.route("/nest_consolidation", methods=["GET"])
+@role_required("estimator", "designer", "admin")
+def nest_consolidation():
+    """
+    Plan shared rolls across projects waiting to be cut.
+
+    Query: status=<ProjectStatus name> (repeatable; default awaiting_materials
+    and waiting_to_start). See plan_fabric_consolidation for the response.
+    """
+    from endpoints.api.projects.services.fabric_consolidation import ELIGIBLE_STATUSES, plan_fabric_consolidation
+    from models import ProjectStatus
+
+    names = request.args.getlist("status")
+    try:
+        statuses = [ProjectStatus[n] for n in names] if names else list(ELIGIBLE_STATUSES)
+    except KeyError as e:
+        return jsonify({"error": f"Unknown status {e}"}), 400
+
+    return jsonify(plan_fabric_consolidation(statuses)), 200
+
+
+# ---------- Async jobs ----------
+def _job_for_user(job_id: str, user):
+    """Return the job if it exists and belongs to the user (admins see all)."""
+    job = nest_jobs.get(job_id)
+    if job is None or (user.role != "admin" and job.user_id != user.id):
+        return None
+    return job
+
+
+@nest_bp.route("/nest_jobs", methods=["POST"])
+@role_required("estimator", "designer", "client")
+def create_nest_job(user):
+    """
+    Queue a nesting job. Body is the same as /nest_rectangles.
+
+    Returns 202 { job_id, status, progress: { probes, best_width }, ... }.
+    Poll GET /nest_jobs/<job_id>, fetch GET /nest_jobs/<job_id>/result,
+    cancel with POST /nest_jobs/<job_id>/cancel.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Invalid JSON"}), 400
+    if not isinstance(data.get("rectangles"), list) or not data.get("rectangles"):
+        return jsonify({"error": "rectangles must be a non-empty array"}), 400
+
+    try:
+        job = nest_jobs.submit(_nest_params_from_body(data), user_id=user.id)
+    except NestJobQueueFull as e:
+        return jsonify({"error": str(e)}), 429
+    return jsonify(job.to_dict()), 202
+
+
+@nest_bp.route("/nest_jobs/<job_id>", methods=["GET"])
+@role_required("estimator", "designer", "client")
+def get_nest_job(job_id, user):
+    job = _job_for_user(job_id, user)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict()), 200
+
+
+@nest_bp.route("/nest_jobs/<job_id>/result", methods=["GET"])
+@role_required("estimator", "designer", "client")
+def get_nest_job_result(job_id, user):
+    """200 with the nest once done, 202 while queued/running, 409 if failed or cancelled."""
+    job = _job_for_user(job_id, user)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    if job.status == JOB_DONE:
+        return jsonify(job.result), 200
+    if job.status in (JOB_FAILED, JOB_CANCELLED):
+        return jsonify(job.to_dict()), 409
+    return jsonify(job.to_dict()), 202
+
+
+@nest_bp.route("/nest_jobs/<job_id>/cancel", methods=["POST"])
+@role_required("estimator", "designer", "client")
+def cancel_nest_job(job_id, user):
+    job = _job_for_user(job_id, user)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    nest_jobs.cancel(job_id)
+    return jsonify(job.to_dict()), 200
+
+
+@nest_bp.route("/nest_cache", methods=["GET"])
+@role_required("admin")
+def nest_cache_stats():
+    """Hit/miss counters for the nesting result cache."""
+    return jsonify(nest_cache.stats()), 200
+
+
+@nest_bp.route("/nest_cache", methods=["DELETE"])
+@role_required("admin")
+def nest_cache_clear():
+    """Drop in-memory cached nests (disk tier is kept)."""
+    nest_cache.clear()
+    return jsonify(nest_cache.stats()), 200
+
+
+def _budget_ms(value) -> Optional[int]:
+    """A millisecond budget as a positive int, None when unset (None, "" or 0); raises otherwise."""
+    if value is None or value == "" or value == 0:
+        return None
+    if isinstance(value, bool):
+        raise ValueError(value)
+    if isinstance(value, float):
+        if not value.is_integer():
+            raise ValueError(value)
+        value = int(value)
+    value = int(value)
+    if value <= 0:
+        raise ValueError(value)
+    return value
+
+
 def nest_rectangles_logic(
     rectangles,
     fabric_height=None,
@@ -479,7 +911,15 @@ def nest_rectangles_logic(
     group_small=False,
     small_side_max=500,
     group_row_max=2000,
-    fabric_roll_length=None
+    fabric_roll_length=None,
+    use_cache=True,
+    time_budget_ms=None,
+    progress=None,
+    improve_ms=None,
+    previous=None,
+    repack=False,
+    fabric_heights=None,
+    fabric_roll_lengths=None
 ):
     """
     Core nesting logic extracted for internal use without HTTP layer.
@@ -493,6 +933,21 @@ def nest_rectangles_logic(
         small_side_max: Max dimension for "small" panels
         group_row_max: Max row width when grouping
         fabric_roll_length: Maximum length per fabric roll for optimization
+        use_cache: Serve/store the result through the process-wide nest cache
+        time_budget_ms: If set, race the packing portfolio for up to this long and keep
+            the best result (reported under "portfolio")
+        progress: Optional progress(probes_done, best_width) callback; may raise
+            NestCancelled, which propagates to the caller
+        improve_ms: With fabric_roll_length, spend up to this long shortening the last
+            roll afterwards (reported under "improvement")
+        previous: A previous fixed-height result for (mostly) the same rectangles; kept
+            panels stay put and new ones go into its free space (engine "incremental").
+            Falls back to a full nest when they do not fit
+        repack: Ignore previous and nest from scratch
+        fabric_heights: Sweep mode; nest once per candidate fabric height (and per
+            fabric_roll_lengths entry, default [fabric_roll_length]) in parallel and
+            return {"sweep": {"options": [...ranked...]}, **best result}
+        fabric_roll_lengths: Candidate roll lengths for the sweep
     
     Returns:
         Dict with nesting result or {"error": "message"}
@@ -508,6 +963,19 @@ def nest_rectangles_logic(
     except ValueError as ve:
         return {"error": str(ve)}
 
+    # Budgets come straight from request bodies
+    try:
+        time_budget_ms = _budget_ms(time_budget_ms)
+    except (TypeError, ValueError):
+        return {"error": "time_budget_ms must be a positive integer"}
+    try:
+        improve_ms = _budget_ms(improve_ms)
+    except (TypeError, ValueError):
+        return {"error": "improve_ms must be a positive integer"}
+
+    # Grouping knobs only matter (and are only validated) when grouping is on
+    grouping = [int(small_side_max), int(group_row_max)] if group_small else None
+
     # Mode detection
     if bin_obj and isinstance(bin_obj, dict) and ("width" in bin_obj and "height" in bin_obj):
         # Fixed bin mode
@@ -516,13 +984,49 @@ def nest_rectangles_logic(
             bh = int(round(float(bin_obj["height"])))
         except Exception:
             return {"error": "bin width/height must be numeric"}
+        cache_key = make_key(
+            rect_tuples, mode="bin", bin_width=bw, bin_height=bh, rotation=bool(allow_rotation), grouping=grouping,
+        )
+        cached = nest_cache.get(cache_key) if use_cache else None
+        if cached is not None:
+            return cached
         try:
-            return pack_into_fixed_bin(rect_tuples, bw, bh, allow_rotation)
+            result = pack_into_fixed_bin(rect_tuples, bw, bh, allow_rotation)
+            if progress:
+                progress(1, result["used_width"])
+            if use_cache:
+                nest_cache.put(cache_key, result)
+            return result
+        except NestCancelled:
+            raise
         except ValueError as ve:
             return {"error": str(ve)}
         except Exception as e:
             return {"error": f"Nesting failed: {e}"}
 
+    # Sweep mode: one fixed-height nest per candidate fabric, ranked. The candidates
+    # already fill the pool, so they do not race a portfolio of their own.
+    if fabric_heights:
+        try:
+            sweep = run_sweep(
+                rectangles,
+                fabric_heights,
+                fabric_roll_lengths or [fabric_roll_length],
+                panel_area=rect_tuples.total_area(),
+                allow_rotation=allow_rotation,
+                group_small=group_small,
+                small_side_max=small_side_max,
+                group_row_max=group_row_max,
+                use_cache=use_cache,
+                improve_ms=improve_ms,
+            )
+        except ValueError as ve:
+            return {"error": str(ve)}
+        best = sweep.pop("best")
+        if best is None:
+            return {"error": "No candidate fabric could nest the rectangles", "sweep": sweep}
+        return dict(best, sweep=sweep)
+
     # Fixed-height minimize width mode
     if not fabric_height:
         return {"error": "fabricHeight is required when bin is not provided"}
@@ -534,9 +1038,227 @@ def nest_rectangles_logic(
     except Exception as e:
         return {"error": f"Invalid fabricHeight: {e}"}
 
+    if fabric_roll_length:
+        try:
+            fabric_roll_length = int(round(float(fabric_roll_length)))
+        except Exception:
+            return {"error": "fabricRollLength must be numeric"}
+
+    # Incremental edits patch the previous layout instead of repacking everything
+    if previous and not repack and not group_small:
+        try:
+            result = insert_into_nest(previous, rect_tuples, fabric_height, fabric_roll_length or None, bool(allow_rotation))
+        except ValueError as ve:
+            return {"error": str(ve)}
+        if result is not None:
+            if progress:
+                progress(1, result["total_width"])
+            return result
+
+    cache_key = make_key(
+        rect_tuples, mode="strip", fabric_height=fabric_height, fabric_roll_length=fabric_roll_length or None,
+        rotation=bool(allow_rotation), grouping=grouping, portfolio=time_budget_ms,
+        improve_ms=improve_ms if fabric_roll_length else None,
+    )
+    cached = nest_cache.get(cache_key) if use_cache else None
+    if cached is not None:
+        return cached
+
     try:
-        return run_rectpack_with_fixed_height(rect_tuples, fabric_height, allow_rotation, fabric_roll_length)
+        if time_budget_ms:
+            result = run_portfolio(
+                rect_tuples, fabric_height, fabric_roll_length or None, bool(allow_rotation),
+                time_budget_ms=time_budget_ms, progress=progress,
+            )
+        else:
+            result = run_rectpack_with_fixed_height(
+                rect_tuples, fabric_height, allow_rotation, fabric_roll_length, progress=progress
+            )
+        if improve_ms and fabric_roll_length and result.get("rolls"):
+            result = improve_rolls(
+                result, rect_tuples, fabric_height, fabric_roll_length, bool(allow_rotation),
+                deadline_ms=improve_ms, progress=progress,
+            )
+        # A race cut short by its budget may do better next time; don't pin it
+        timed_out = any(s.get("status") in ("timeout", "cancelled") for s in (result.get("portfolio") or {}).get("strategies", ()))
+        if use_cache and not timed_out:
+            nest_cache.put(cache_key, result)
+        return result
+    except NestCancelled:
+        raise
     except ValueError as ve:
         return {"error": str(ve)}
     except Exception as e:
         return {"error": f"Nesting failed: {e}"}
+
+
+# ---------- Batch CLI ----------
+# python -m endpoints.api.projects.nest jobs/ -o results.ndjson
+#
+# Nests exported jobs outside the web tier. Each job is a /nest_rectangles body;
+# jobs run on a process pool and results stream out as NDJSON, one line per job:
+#   {"job": id, "source": "file:line", "ok": true, "result": {...}}
+#   {"job": id, "source": "file:line", "ok": false, "error": "..."}
+# A job's id is its "id" field, else its source. A bad line or a failing job only
+# produces an error line for that job.
+
+BATCH_JOB_SUFFIXES = (".json", ".ndjson", ".jsonl")
+
+
+def _batch_worker_init():
+    # One batch job per core already; portfolio/sweep helpers stay in-process
+    os.environ["NEST_POOL_WORKERS"] = "1"
+
+
+def run_batch_job(body: dict) -> dict:
+    """Pool worker: one /nest_rectangles body. Returns the result or {"error"}."""
+    if not isinstance(body, dict):
+        return {"error": "Job must be a JSON object"}
+    # Packers log to stdout, which carries the NDJSON results
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            return nest_rectangles_logic(**_nest_params_from_body(body))
+    finally:
+        # A portfolio or sweep job may have started this worker's own pool; a pool
+        # left idle would keep the worker from exiting at shutdown
+        shutdown_pool(wait=True)
+
+
+def iter_batch_jobs(sources):
+    """Yield (source, body) for every job in files, directories or "-" (stdin).
+
+    Directories are read in name order: *.json files hold one job, *.ndjson and
+    *.jsonl one job per line. Unreadable jobs yield an exception instead of a body.
+    """
+    def lines(name, handle):
+        for n, line in enumerate(handle, start=1):
+            if line.strip():
+                try:
+                    yield f"{name}:{n}", json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield f"{name}:{n}", ValueError(f"Invalid JSON: {e}")
+
+    def read_file(path):
+        try:
+            with open(path) as f:
+                if path.endswith(".json"):
+                    try:
+                        yield path, json.load(f)
+                    except json.JSONDecodeError as e:
+                        yield path, ValueError(f"Invalid JSON: {e}")
+                else:
+                    yield from lines(path, f)
+        except OSError as e:
+            yield path, e
+
+    for src in sources or ["-"]:
+        if src == "-":
+            yield from lines("stdin", sys.stdin)
+        elif os.path.isdir(src):
+            for name in sorted(os.listdir(src)):
+                if name.endswith(BATCH_JOB_SUFFIXES):
+                    yield from read_file(os.path.join(src, name))
+        else:
+            yield from read_file(src)
+
+
+def _batch_job_id(source: str, body) -> str:
+    if isinstance(body, dict) and body.get("id") not in (None, ""):
+        return str(body["id"])
+    return source
+
+
+def run_batch(sources, out, workers=None, out_dir=None, max_pending=None):
+    """Nest every job from sources on a process pool, writing NDJSON lines to out.
+
+    Results are written as jobs finish; at most max_pending jobs (default four per
+    worker) are read ahead. With out_dir each job's line is also written to
+    <out_dir>/<job id>.json. Returns (ok_count, error_count).
+    """
+    workers = workers or pool_size()
+    max_pending = max_pending or workers * 4
+    counts = {True: 0, False: 0}
+
+    def emit(job_id, source, result):
+        line = {"job": job_id, "source": source}
+        if "error" in result:
+            line.update(ok=False, error=result["error"])
+        else:
+            line.update(ok=True, result=result)
+        counts[line["ok"]] += 1
+        text = json.dumps(line)
+        out.write(text + "\n")
+        out.flush()
+        if out_dir:
+            safe = re.sub(r"[^A-Za-z0-9._-]+", "_", job_id).strip("._") or "job"
+            with open(os.path.join(out_dir, f"{safe}.json"), "w") as f:
+                f.write(text + "\n")
+
+    def new_pool():
+        return ProcessPoolExecutor(max_workers=workers, initializer=_batch_worker_init)
+
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+
+    pool = new_pool()
+    pending = {}
+
+    def drain(keep):
+        nonlocal pool
+        while len(pending) > keep:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                job_id, source = pending.pop(future)
+                try:
+                    result = future.result()
+                except BrokenProcessPool:
+                    # A worker died (e.g. out of memory); only its jobs fail
+                    result = {"error": "Nesting worker crashed"}
+                except Exception as e:
+                    result = {"error": f"Nesting failed: {e}"}
+                emit(job_id, source, result)
+            if getattr(pool, "_broken", False):
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = new_pool()
+
+    try:
+        for source, body in iter_batch_jobs(sources):
+            job_id = _batch_job_id(source, body)
+            if isinstance(body, Exception):
+                emit(job_id, source, {"error": str(body)})
+                continue
+            pending[pool.submit(run_batch_job, body)] = (job_id, source)
+            drain(max_pending - 1)
+        drain(0)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+    return counts[True], counts[False]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m endpoints.api.projects.nest",
+        description="Nest /nest_rectangles request bodies offline and stream the results as NDJSON.",
+    )
+    parser.add_argument("inputs", nargs="*", help="Job files or directories (*.json, *.ndjson, *.jsonl); '-' or none reads NDJSON from stdin")
+    parser.add_argument("-o", "--out", help="Write NDJSON results here instead of stdout")
+    parser.add_argument("--out-dir", help="Also write each job's result line to <dir>/<job id>.json")
+    parser.add_argument("-j", "--workers", type=int, help="Worker processes (default: NEST_POOL_WORKERS or CPU count)")
+    args = parser.parse_args(argv)
+
+    out = open(args.out, "w") if args.out else sys.stdout
+    try:
+        ok, failed = run_batch(args.inputs, out, workers=args.workers, out_dir=args.out_dir)
+    finally:
+        if args.out:
+            out.close()
+    print(f"[NEST] {ok} job(s) nested, {failed} failed", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    # Go through the importable module so pool workers unpickle
+    # endpoints.api.projects.nest.run_batch_job, not __main__.run_batch_job
+    from endpoints.api.projects.nest import main as _main
+
+    sys.exit(_main())
@@ -3,12 +3,28 @@
 from flask import Blueprint, jsonify, request
 
 from models import db, Product, Project
+from endpoints.api.auth.utils import role_required
 from endpoints.api.products import dispatch_calculation
 
 
 projects_calc_api_bp = Blueprint("projects_calc_api", __name__)
 
 
+def _request_schema(data):
+    """Schema sent with the request, else the stored project's (None: product default)."""
+    # 1. Try to get schema from request (if frontend sent it)
+    # 2. Try to get schema from existing project (if id provided)
+    # 3. Fallback to product default schema (inside the estimation service)
+    schema = data.get("estimate_schema")
+    project_id = data.get("id") or data.get("project_id")
+    
+    if not schema and project_id:
+        existing_proj = db.session.get(Project, project_id)
+        if existing_proj:
+            schema = existing_proj.estimate_schema
+    return schema
+
+
 @projects_calc_api_bp.route("/projects/calculate", methods=["POST"])
 # @jwt_required()
 def calculate():
@@ -40,22 +56,13 @@ def calculate():
     
     # --- Perform Estimation on the Result ---
     # We need a schema. 
-    # 1. Try to get schema from request (if frontend sent it)
-    # 2. Try to get schema from existing project (if id provided)
-    # 3. Fallback to product default schema
-    
-    schema = data.get("estimate_schema")
-    project_id = data.get("id") or data.get("project_id")
-    
-    if not schema and project_id:
-        existing_proj = db.session.get(Project, project_id)
-        if existing_proj:
-            schema = existing_proj.estimate_schema
-            
-    # Fallback handled inside estimate_payload if schema is None (uses product default)
+    schema = _request_schema(data)
+
+    # ?trace=1 (or "trace": true) explains each estimate row; off by default
+    trace = str(request.args.get("trace", data.get("trace", ""))).lower() in ("1", "true", "yes")
     
     from endpoints.api.projects.services.estimation_service import estimate_payload
-    evaluated_schema = estimate_payload(product_id, enriched, schema=schema)
+    evaluated_schema = estimate_payload(product_id, enriched, schema=schema, trace=trace)
 
     return jsonify({
         "id": data.get("id"),
@@ -65,3 +72,72 @@ def calculate():
         "project_attributes": enriched.get("project_attributes", calc_input.get("project_attributes") or {}),
         "estimate_schema_evaluated": evaluated_schema,
     }), 200
+
+
+@projects_calc_api_bp.route("/projects/price_grid", methods=["POST"])
+@role_required("estimator")
+def price_grid_route():
+    """What-if price grid over constants/attributes in one call.
+
+    Body: a stored project ({"project_id"}) or a /projects/calculate payload
+    ({"product": {"id"}, "products", "project_attributes", "estimate_schema"?}),
+    plus "axes": [{"key": "marginPercent", "values": [40, 45, 50]},
+    {"key": "width", "start": 2000, "stop": 6000, "steps": 5}] and an
+    optional "target" price. See estimation_service.price_grid for the result.
+    """
+    from endpoints.api.projects.services.estimation_service import price_grid
+
+    data = request.get_json(silent=True) or {}
+    project_id = data.get("id") or data.get("project_id")
+
+    if project_id and not data.get("products"):
+        # Stored project: its saved attributes and calculated values, as last estimated
+        project = db.session.get(Project, project_id)
+        if not project or project.deleted:
+            return jsonify({"error": f"Project id {project_id} not found"}), 404
+        product_id = project.product_id
+        product_name = project.product.name if project.product else None
+        schema = data.get("estimate_schema") or project.estimate_schema
+        payload = {
+            "project_attributes": project.project_attributes or {},
+            "products": [
+                {"id": pp.id, "name": pp.label, "attributes": pp.attributes or {}, "calculated": pp.calculated or {}}
+                for pp in project.products
+            ],
+        }
+    else:
+        product_payload = data.get("product") or {}
+        try:
+            product_id = int(product_payload.get("id")) if product_payload.get("id") is not None else None
+        except (TypeError, ValueError):
+            return jsonify({"error": "product.id must be an integer"}), 400
+        if product_id is None:
+            return jsonify({"error": "Missing 'product.id' or 'project_id' in request body"}), 400
+        product = db.session.get(Product, product_id)
+        if not product:
+            return jsonify({"error": f"Product id {product_id} not found"}), 404
+
+        calc_input = dict(data)
+        calc_input["product"] = {"id": product.id, "name": product.name}
+        calc_input.setdefault("products", [])
+        calc_input.setdefault("project_attributes", {})
+        calc_input.setdefault("general", {})
+        payload = dispatch_calculation(product.name, calc_input)
+        product_name = product.name
+        schema = _request_schema(data)
+
+    def recalculate(calc_input):
+        # Attribute axes: calculated values follow the attribute (see price_grid)
+        calc_input = dict(calc_input, product={"id": product_id, "name": product_name})
+        calc_input.setdefault("general", {})
+        return dispatch_calculation(product_name, calc_input)
+
+    try:
+        grid = price_grid(
+            product_id, payload, data.get("axes"), schema=schema, target=data.get("target"), recalculate=recalculate,
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if grid is None:
+        return jsonify({"error": "No estimating schema for this product"}), 400
+    return jsonify(grid), 200
@@ -1,5 +1,29 @@
-from estimation import estimate_price_from_schema, evaluate_schema_structure
-from models import SKU
+import copy
+from itertools import product as cartesian
+
+import numpy as np
+
+from estimation import get_schema_plan, item_context, item_state_cache
+from endpoints.api.projects.services.sku_price_cache import sku_price_cache
+
+# A what-if grid is one vectorised batch per item; keep it to a sensible size
+PRICE_GRID_MAX_POINTS = 10000
+PRICE_GRID_CONSTANTS = ("contingencyPercent", "marginPercent")
+# Attribute axes rerun the product calculation once per combination of their values
+PRICE_GRID_MAX_RECALCULATIONS = 200
+
+
+def _evaluated_item(plan, evaluated_struct, item_id, name):
+    """One entry of estimate_schema_evaluated["items"]."""
+    return {
+        "id": item_id,
+        "name": name,
+        "contingencyPercent": plan.contingency_percent,
+        "marginPercent": plan.margin_percent,
+        "sections": evaluated_struct.get("sections", {}),
+        "meta": evaluated_struct.get("meta", {})
+    }
+
 
 def estimate_project_total(project):
     """
@@ -16,74 +40,29 @@ def estimate_project_total(project):
     products = project.products
     evaluated_items = []
     
-    # Pre-fetch all SKUs mentioned in schema
-    # 1. Collect all SKU codes from schema
-    sku_codes = set()
-    schema = project.estimate_schema
-    if isinstance(schema, dict):
-         for rows in schema.values():
-             if isinstance(rows, list):
-                 for row in rows:
-                     if isinstance(row, dict) and row.get("type") == "sku" and row.get("sku"):
-                         sku_codes.add(row.get("sku"))
-                         
-    # 2. Fetch from DB
-    loaded_skus = {}
-    if sku_codes:
-        found_skus = SKU.query.filter(SKU.sku.in_(sku_codes)).all()
-        for s in found_skus:
-            loaded_skus[s.sku] = s
+    # Compiled once per schema content; SKU prices come from the in-memory table
+    plan = get_schema_plan(project.estimate_schema)
+    prices = sku_price_cache.prices(plan.sku_codes)
     
     for i, pp in enumerate(products):
         # Merge attributes and calculated values for the evaluation context
-        eval_context = (project.project_attributes or {}).copy()
-        eval_context.update(pp.attributes or {})
-        eval_context.update(pp.calculated or {})
-        eval_context["project_attributes"] = project.project_attributes or {}
-        eval_context["attributes"] = pp.attributes or {}
-        eval_context["calculated"] = pp.calculated or {}
-
-        # 1. EVALUATE STRUCTURE (for storage & frontend)
-        evaluated_struct = evaluate_schema_structure(
-            project.estimate_schema,
-            eval_context,
-            skus=loaded_skus
-        )
-        
-        # Extract constants for this item
-        consts = evaluated_struct.get("_constants", {})
-        contingency_pct = consts.get("contingencyPercent", 3)
-        margin_pct = consts.get("marginPercent", 45)
-        
-        # Calculate item total from the evaluated structure to maintain consistency
-        item_base_cost = 0.0
-        for section_rows in evaluated_struct.get("sections", {}).values():
-            for row in section_rows:
-                if row.get("type") in ("row", "sku"):
-                     q = float(row.get("quantity", 0))
-                     c = float(row.get("unitCost", 0))
-                     item_base_cost += (q * c)
-
-        contingency_amt = item_base_cost * (contingency_pct / 100.0)
-        # Margin formula: Cost / (1 - Margin%)
-        if abs(1.0 - margin_pct/100.0) > 0.001:
-            item_sell_price = (item_base_cost + contingency_amt) / (1.0 - margin_pct / 100.0)
-        else:
-            item_sell_price = item_base_cost + contingency_amt
+        eval_context = item_context(project.project_attributes, pp.attributes, pp.calculated)
+
+        # One pass gives the structure (for storage & frontend) and the item's totals
+        # Saved items re-evaluate only the rows affected by what changed since last time
+        state_key = ("project_product", pp.id) if pp.id else None
+        previous = item_state_cache.peek(state_key) if state_key else None
+        evaluated_struct, state = plan.run_incremental(eval_context, previous, prices=prices)
+        if state_key:
+            item_state_cache.put(state_key, state)
+        item_sell_price = evaluated_struct["totals"]["grand_total"]
 
         # Update product total
         pp.estimate_total = float(item_sell_price)
         grand_total += float(item_sell_price)
 
         # Add to list for project-level JSON
-        evaluated_items.append({
-            "id": pp.id or f"new_{i}",
-            "name": pp.label or f"Item {i+1}",
-            "contingencyPercent": contingency_pct,
-            "marginPercent": margin_pct,
-            "sections": evaluated_struct.get("sections", {}),
-            "meta": evaluated_struct.get("meta", {})
-        })
+        evaluated_items.append(_evaluated_item(plan, evaluated_struct, pp.id or f"new_{i}", pp.label or f"Item {i+1}"))
     
     # Save the structured evaluation including overall meta (grand total)
     project.estimate_schema_evaluated = { "items": evaluated_items, "meta": { "grand_total": grand_total } }
@@ -92,96 +71,201 @@ def estimate_project_total(project):
     return grand_total
 
 
-def estimate_payload(product_id, payload_data, schema=None):
+def _resolve_plan(product_id, schema=None):
+    """Plan for an inline schema, else the product's default schema (None if it has none)."""
+    if schema:
+        return get_schema_plan(schema)
+    # Try to find a default schema for the product
+    # Avoid circular imports if possible, or perform query here
+    from models import Product, db
+    product = db.session.get(Product, product_id)
+    if product and product.default_schema:
+        default_schema = product.default_schema
+        return get_schema_plan(default_schema.data, default_schema.id, default_schema.version)
+    return None
+
+
+def estimate_payload(product_id, payload_data, schema=None, trace=False):
     """
     Perform estimation on a raw dictionary payload (e.g. from calculation preview).
     Returns the evaluated structure (JSON dict).
+    trace: add a per-row "trace" to each item (see SchemaPlan.run).
     """
     
-    # 1. Resolve Schema
-    if not schema:
-        # Try to find a default schema for the product
-        # Avoid circular imports if possible, or perform query here
-        from models import Product, EstimatingSchema, db
-        product = db.session.get(Product, product_id)
-        if product and product.default_schema:
-            schema = product.default_schema.data
-        else:
-            return None # No schema, no estimate
+    # 1. Resolve Schema (stored schemas are cached by id/version, inline ones by content)
+    plan = _resolve_plan(product_id, schema)
+    if plan is None:
+        return None # No schema, no estimate
             
     # 2. Extract Data
     project_attrs = payload_data.get("project_attributes") or {}
     products_list = payload_data.get("products") or []
     
-    # 3. Pre-fetch SKUs (similar to estimate_project_total)
-    sku_codes = set()
-    if isinstance(schema, dict):
-         for rows in schema.values():
-             if isinstance(rows, list):
-                 for row in rows:
-                     if isinstance(row, dict) and row.get("type") == "sku" and row.get("sku"):
-                         sku_codes.add(row.get("sku"))
-    
-    loaded_skus = {}
-    if sku_codes:
-        from models import SKU
-        found_skus = SKU.query.filter(SKU.sku.in_(sku_codes)).all()
-        for s in found_skus:
-            loaded_skus[s.sku] = s
+    # 3. SKU prices (similar to estimate_project_total)
+    prices = sku_price_cache.prices(plan.sku_codes)
 
     # 4. Evaluate Items
     evaluated_items = []
     grand_total = 0.0
 
-    from estimation import evaluate_schema_structure
-    
     for i, pp in enumerate(products_list):
-        # Allow dict access
-        attrs = pp.get("attributes") or {}
-        calc = pp.get("calculated") or {}
-        
-        eval_context = project_attrs.copy()
-        eval_context.update(attrs)
-        eval_context.update(calc)
-        eval_context["project_attributes"] = project_attrs
-        eval_context["attributes"] = attrs
-        eval_context["calculated"] = calc
+        eval_context = item_context(project_attrs, pp.get("attributes"), pp.get("calculated"))
         
-        evaluated_struct = evaluate_schema_structure(
-            schema,
-            eval_context,
-            skus=loaded_skus
-        )
+        evaluated_struct = plan.run(eval_context, prices=prices, trace=trace)
+        grand_total += evaluated_struct["totals"]["grand_total"]
         
-        # Calculate totals for this item
-        consts = evaluated_struct.get("_constants", {})
-        contingency_pct = consts.get("contingencyPercent", 3)
-        margin_pct = consts.get("marginPercent", 45)
+        item = _evaluated_item(plan, evaluated_struct, pp.get("id") or f"temp_{i}", pp.get("name") or f"Item {i+1}")
+        if trace:
+            item["trace"] = evaluated_struct["trace"]
+        evaluated_items.append(item)
         
-        item_base_cost = 0.0
-        for section_rows in evaluated_struct.get("sections", {}).values():
-            for row in section_rows:
-                if row.get("type") in ("row", "sku"):
-                     q = float(row.get("quantity", 0))
-                     c = float(row.get("unitCost", 0))
-                     item_base_cost += (q * c)
-
-        contingency_amt = item_base_cost * (contingency_pct / 100.0)
-        
-        if abs(1.0 - margin_pct/100.0) > 0.001:
-            item_sell_price = (item_base_cost + contingency_amt) / (1.0 - margin_pct / 100.0)
+    return { "items": evaluated_items, "meta": { "grand_total": grand_total } }
+
+
+def _grid_axis(axis):
+    """(key, [values]) from {"key", "values": [...]} or {"key", "start", "stop", "steps"}."""
+    if not isinstance(axis, dict) or not isinstance(axis.get("key"), str) or not axis["key"]:
+        raise ValueError("Each axis needs a 'key'")
+    key = axis["key"]
+    try:
+        if axis.get("values") is not None:
+            values = [float(v) for v in axis["values"]]
         else:
-            item_sell_price = item_base_cost + contingency_amt
+            start, stop = float(axis["start"]), float(axis["stop"])
+            steps = int(axis.get("steps") or 2)
+            if steps < 1:
+                raise ValueError
+            values = np.linspace(start, stop, steps).tolist()
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f"Axis '{key}' needs numeric 'values' or 'start', 'stop' and 'steps'")
+    if not values:
+        raise ValueError(f"Axis '{key}' has no values")
+    return key, values
 
-        grand_total += item_sell_price
-        
-        evaluated_items.append({
+
+def _with_override(eval_context, key, value):
+    """Copy of an item context with one attribute replaced everywhere expressions can read it."""
+    ctx = dict(eval_context)
+    ctx[key] = value
+    for name in ("attributes", "calculated", "project_attributes"):
+        if key in ctx[name]:
+            ctx[name] = {**ctx[name], key: value}
+    return ctx
+
+
+def _with_attributes(payload_data, values):
+    """Deep copy of a calculation payload with attribute values set on every item."""
+    payload = copy.deepcopy(payload_data)
+    project_attrs = payload.get("project_attributes") or {}
+    for key, value in values.items():
+        if key in project_attrs:
+            project_attrs[key] = value
+        for pp in payload.get("products") or []:
+            attrs = pp.get("attributes")
+            if not isinstance(attrs, dict):
+                attrs = pp["attributes"] = {}
+            if key in attrs or key not in project_attrs:
+                attrs[key] = value
+    return payload
+
+
+def price_grid(product_id, payload_data, axes, schema=None, target=None, recalculate=None):
+    """
+    What-if pricing: evaluate a payload for every combination of axis values.
+
+    axes: [{"key", "values" | "start"/"stop"/"steps"}]. contingencyPercent and
+    marginPercent override the schema constants; any other key overrides that
+    attribute in each item's context. recalculate(payload) -> payload reruns
+    the product calculation (dispatch_calculation) once per combination of
+    attribute values, so calculated values follow the attribute; without it
+    they keep their payload values and the result carries a "warnings" list.
+    Each item is evaluated once per combination (SchemaPlan.run_batch).
+    Returns None when there is no schema, else {"axes", "shape", "items":
+    [{id, name, total, grand_total}], "grand_total"} with grids as nested lists
+    (one level per axis); with a target price, "closest" is the cell nearest it.
+    """
+    plan = _resolve_plan(product_id, schema)
+    if plan is None:
+        return None
+
+    if not isinstance(axes, list) or not axes:
+        raise ValueError("'axes' must be a non-empty list")
+    parsed = [_grid_axis(axis) for axis in axes]
+    keys = [key for key, _ in parsed]
+    if len(set(keys)) != len(keys):
+        raise ValueError("Axis keys must be unique")
+    shape = [len(values) for _, values in parsed]
+    size = int(np.prod(shape))
+    if size > PRICE_GRID_MAX_POINTS:
+        raise ValueError(f"A price grid is limited to {PRICE_GRID_MAX_POINTS} points, got {size}")
+
+    points = list(cartesian(*(values for _, values in parsed)))
+    constants = {
+        key: np.array([point[i] for point in points])
+        for i, key in enumerate(keys) if key in PRICE_GRID_CONSTANTS
+    }
+    attribute_axes = [(i, key) for i, key in enumerate(keys) if key not in PRICE_GRID_CONSTANTS]
+
+    # One calculated payload per combination of attribute values
+    combos = {tuple(point[i] for i, _ in attribute_axes) for point in points}
+    warnings = []
+    if attribute_axes and recalculate is not None:
+        if len(combos) > PRICE_GRID_MAX_RECALCULATIONS:
+            raise ValueError(
+                f"Attribute axes are limited to {PRICE_GRID_MAX_RECALCULATIONS} combinations "
+                f"(each one reruns the product calculation), got {len(combos)}"
+            )
+        attribute_keys = [key for _, key in attribute_axes]
+        payloads = {combo: recalculate(_with_attributes(payload_data, dict(zip(attribute_keys, combo)))) for combo in combos}
+    else:
+        payloads = {combo: payload_data for combo in combos}
+        if attribute_axes:
+            warnings.append(
+                "Calculated values were not recomputed for attribute axes "
+                f"({', '.join(key for _, key in attribute_axes)}); prices that depend on them are not reliable"
+            )
+
+    prices = sku_price_cache.prices(plan.sku_codes)
+
+    items = []
+    grand_total = np.zeros(size)
+    for i, pp in enumerate(payload_data.get("products") or []):
+        bases = {}
+        for combo, payload in payloads.items():
+            item = (payload.get("products") or [])[i]
+            bases[combo] = item_context(payload.get("project_attributes") or {}, item.get("attributes"), item.get("calculated"))
+        contexts = []
+        for point in points:
+            ctx = bases[tuple(point[axis_index] for axis_index, _ in attribute_axes)]
+            for axis_index, key in attribute_axes:
+                ctx = _with_override(ctx, key, point[axis_index])
+            contexts.append(ctx)
+        batch = plan.run_batch(contexts, prices=prices, constants=constants)
+        grand_total += batch["grand_total"]
+        items.append({
             "id": pp.get("id") or f"temp_{i}",
             "name": pp.get("name") or f"Item {i+1}",
-            "contingencyPercent": contingency_pct,
-            "marginPercent": margin_pct,
-            "sections": evaluated_struct.get("sections", {}),
-            "meta": evaluated_struct.get("meta", {})
+            "total": batch["total"].reshape(shape).tolist(),
+            "grand_total": batch["grand_total"].reshape(shape).tolist(),
         })
-        
-    return { "items": evaluated_items, "meta": { "grand_total": grand_total } }
+
+    result = {
+        "axes": [{"key": key, "values": values} for key, values in parsed],
+        "shape": shape,
+        "items": items,
+        "grand_total": grand_total.reshape(shape).tolist(),
+    }
+    if warnings:
+        result["warnings"] = warnings
+    if target is not None:
+        try:
+            target = float(target)
+        except (TypeError, ValueError):
+            raise ValueError("'target' must be numeric")
+        best = int(np.argmin(np.abs(grand_total - target)))
+        result["closest"] = {
+            "index": [int(i) for i in np.unravel_index(best, shape)],
+            "point": dict(zip(keys, points[best])),
+            "grand_total": float(grand_total[best]),
+        }
+    return result
@@ -0,0 +1,219 @@
+"""Cross-project fabric consolidation.
+
+Each calculator nests only its own project's panels. The cutting room batches
+every project that is about to be cut onto shared rolls instead: panels from
+all eligible projects are grouped by fabric type and width, each group is
+nested once, and the roll count is compared with nesting every project on its
+own.
+
+Panels come from each ProjectProduct's calculated["panels"] (COVER). Projects
+whose products carry no panels fall back to project_attributes["all_rectangles"]
+(RECTANGLES). Group and per-project nests run in parallel on the nesting
+process pool.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from endpoints.api.projects.shared.fabric import fabric_of
+from endpoints.api.projects.shared.nest_pool import submit
+from models import Project, ProjectProduct, ProjectStatus
+
+ELIGIBLE_STATUSES = (ProjectStatus.awaiting_materials, ProjectStatus.waiting_to_start)
+
+def _num(v):
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
+
+
+def _panels_from_calculated(panels: dict) -> List[Dict[str, Any]]:
+    out = []
+    for label, rec in (panels or {}).items():
+        w = _num((rec or {}).get("width"))
+        h = _num((rec or {}).get("height"))
+        if w and h and w > 0 and h > 0:
+            out.append({"width": w, "height": h, "label": str(label)})
+    return out
+
+
+def _panels_from_rectangles(rectangles: Iterable[dict]) -> List[Dict[str, Any]]:
+    out = []
+    for i, rec in enumerate(rectangles or []):
+        w = _num(rec.get("width"))
+        h = _num(rec.get("height"))
+        qty = int(_num(rec.get("quantity")) or 1)
+        if not (w and h and w > 0 and h > 0):
+            continue
+        label = str(rec.get("label") or f"R{i + 1}")
+        for q in range(max(1, qty)):
+            out.append({"width": w, "height": h, "label": label if qty <= 1 else f"{label}_Q{q + 1}"})
+    return out
+
+
+def collect_fabric_groups(statuses: Iterable[ProjectStatus] = ELIGIBLE_STATUSES) -> Dict[Tuple[str, int], Dict[str, Any]]:
+    """Group panels of eligible projects by (fabric_type, fabric_width).
+
+    Returns {(type, width): {"fabric_type", "fabric_width", "fabric_roll_length",
+    "projects": {project_id: [ {width, height, label}, ... ]}}}.
+    """
+    rows = (
+        ProjectProduct.query.join(Project)
+        .filter(Project.status.in_(list(statuses)))
+        .filter(Project.deleted.is_(False))
+        .filter(ProjectProduct.deleted.is_(False))
+        .order_by(Project.id, ProjectProduct.item_index, ProjectProduct.id)
+        .all()
+    )
+
+    groups: Dict[Tuple[str, int], Dict[str, Any]] = {}
+    projects: Dict[int, Project] = {}
+    with_panels = set()
+
+    def add(project_id, fabric, panels):
+        fabric_type, width, roll_length = fabric
+        group = groups.setdefault((fabric_type, width), {
+            "fabric_type": fabric_type,
+            "fabric_width": width,
+            "fabric_roll_length": roll_length,
+            "projects": {},
+        })
+        group["fabric_roll_length"] = max(group["fabric_roll_length"], roll_length)
+        group["projects"].setdefault(project_id, []).extend(panels)
+
+    for pp in rows:
+        project = pp.project
+        projects[project.id] = project
+        panels = _panels_from_calculated((pp.calculated or {}).get("panels"))
+        if not panels:
+            continue
+        with_panels.add(project.id)
+        add(project.id, fabric_of(pp.attributes or {}, project.project_attributes or {}), panels)
+
+    for project_id, project in projects.items():
+        if project_id in with_panels:
+            continue
+        attrs = project.project_attributes or {}
+        panels = _panels_from_rectangles(attrs.get("all_rectangles") or attrs.get("rectangles"))
+        if panels:
+            add(project_id, fabric_of(attrs), panels)
+
+    return groups
+
+
+def _nest_worker(rectangles: List[Dict[str, Any]], fabric_width: int, roll_length: int) -> Dict[str, Any]:
+    """Pool worker: nest one panel list onto rolls."""
+    from endpoints.api.projects.nest import nest_rectangles_logic
+
+    return nest_rectangles_logic(
+        rectangles=[dict(r, quantity=1) for r in rectangles],
+        fabric_height=fabric_width,
+        allow_rotation=True,
+        fabric_roll_length=roll_length,
+    )
+
+
+def _usage(result: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "num_rolls": int(result.get("num_rolls") or 0),
+        "total_width": int(result.get("total_width") or 0),
+        "last_roll_length": int(result.get("last_roll_length") or 0),
+    }
+
+
+def plan_fabric_consolidation(statuses: Iterable[ProjectStatus] = ELIGIBLE_STATUSES) -> Dict[str, Any]:
+    """Nest every fabric group across projects and compare with per-project nesting.
+
+    Returns:
+      {
+        "groups":   [ {fabric_type, fabric_width, fabric_roll_length, projects, num_panels,
+                       consolidated: {num_rolls, total_width, last_roll_length, rolls},
+                       separate: {num_rolls, total_width}, roll_savings, length_savings} ],
+        "projects": { project_id: [ {fabric_type, fabric_width, panels: {label: {x, y, rotated, bin}}} ] },
+        "totals":   { separate_rolls, consolidated_rolls, roll_savings, length_savings }
+      }
+    Groups that fail to nest carry "error" and are left out of the totals.
+    """
+    groups = collect_fabric_groups(statuses)
+
+    # Submit everything up front so group and per-project nests overlap
+    jobs = []
+    for group in groups.values():
+        width, roll_length = group["fabric_width"], group["fabric_roll_length"]
+        combined = [
+            dict(panel, label=f"J{project_id}_{panel['label']}")
+            for project_id, panels in group["projects"].items()
+            for panel in panels
+        ]
+        combined_future = submit(_nest_worker, combined, width, roll_length)
+        separate_futures = {
+            project_id: submit(_nest_worker, panels, width, roll_length)
+            for project_id, panels in group["projects"].items()
+        }
+        jobs.append((group, combined, combined_future, separate_futures))
+
+    out_groups: List[Dict[str, Any]] = []
+    per_project: Dict[int, List[Dict[str, Any]]] = {}
+    totals = {"separate_rolls": 0, "consolidated_rolls": 0, "roll_savings": 0, "length_savings": 0}
+
+    for group, combined, combined_future, separate_futures in jobs:
+        entry: Dict[str, Any] = {
+            "fabric_type": group["fabric_type"],
+            "fabric_width": group["fabric_width"],
+            "fabric_roll_length": group["fabric_roll_length"],
+            "projects": sorted(group["projects"].keys()),
+            "num_panels": len(combined),
+        }
+        out_groups.append(entry)
+
+        error = _collect_error(combined_future, separate_futures.values())
+        if error:
+            entry["error"] = error
+            continue
+
+        consolidated = combined_future.result()
+        separate = [f.result() for f in separate_futures.values()]
+        entry["consolidated"] = dict(_usage(consolidated), rolls=[
+            {k: roll[k] for k in ("roll_number", "width", "max_width", "is_last")}
+            for roll in consolidated.get("rolls") or []
+        ])
+        entry["separate"] = {
+            "num_rolls": sum(_usage(r)["num_rolls"] for r in separate),
+            "total_width": sum(_usage(r)["total_width"] for r in separate),
+        }
+        entry["roll_savings"] = entry["separate"]["num_rolls"] - entry["consolidated"]["num_rolls"]
+        entry["length_savings"] = entry["separate"]["total_width"] - entry["consolidated"]["total_width"]
+
+        totals["separate_rolls"] += entry["separate"]["num_rolls"]
+        totals["consolidated_rolls"] += entry["consolidated"]["num_rolls"]
+        totals["roll_savings"] += entry["roll_savings"]
+        totals["length_savings"] += entry["length_savings"]
+
+        # Split the shared placements back out per project, under the original labels
+        for project_id in group["projects"]:
+            prefix = f"J{project_id}_"
+            panels = {
+                label[len(prefix):]: placement
+                for label, placement in (consolidated.get("panels") or {}).items()
+                if label.startswith(prefix)
+            }
+            per_project.setdefault(project_id, []).append({
+                "fabric_type": group["fabric_type"],
+                "fabric_width": group["fabric_width"],
+                "panels": panels,
+            })
+
+    return {"groups": out_groups, "projects": per_project, "totals": totals}
+
+
+def _collect_error(combined_future, separate_futures) -> Optional[str]:
+    for future in [combined_future, *separate_futures]:
+        try:
+            result = future.result()
+        except Exception as e:
+            return f"Nesting failed: {e}"
+        if "error" in result:
+            return result["error"]
+    return None
+
+
+__all__ = ["plan_fabric_consolidation", "collect_fabric_groups", "ELIGIBLE_STATUSES"]
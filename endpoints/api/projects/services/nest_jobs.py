@@ -0,0 +1,160 @@
+"""Background nesting jobs.
+
+Large /nest_rectangles requests can hold a web worker for seconds. A job runs
+the same nest_rectangles_logic on a small bounded thread pool instead, so the
+request returns a job id immediately and the client polls for progress and
+the result.
+
+The registry lives in the worker process that accepted the job, so with
+several gunicorn workers, polls for a job must reach the same worker (sticky
+routing or a single worker for nesting traffic).
+
+Environment:
+- NEST_JOB_WORKERS:     concurrent jobs per process (default 2)
+- NEST_JOB_MAX_PENDING: queued + running jobs before new ones are refused (default 32)
+- NEST_JOB_TTL:         seconds a finished job is kept for polling (default 3600)
+"""
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+class NestJobQueueFull(Exception):
+    pass
+
+
+class NestJob:
+    def __init__(self, params: Dict[str, Any], user_id: Optional[int]):
+        self.id = uuid.uuid4().hex
+        self.params = params
+        self.user_id = user_id
+        self.status = QUEUED
+        self.probes = 0
+        self.best_width = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.now(timezone.utc)
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self.future = None
+
+    def to_dict(self, include_result: bool = False) -> Dict[str, Any]:
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "progress": {"probes": self.probes, "best_width": self.best_width},
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+        if self.error:
+            data["error"] = self.error
+        if include_result and self.status == DONE:
+            data["result"] = self.result
+        return data
+
+
+class NestJobManager:
+    def __init__(self, workers: int = 2, max_pending: int = 32, ttl_seconds: int = 3600):
+        self.max_pending = max(1, int(max_pending))
+        self.ttl_seconds = int(ttl_seconds)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(workers)), thread_name_prefix="nest-job")
+        self._jobs: Dict[str, NestJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, params: Dict[str, Any], user_id: Optional[int] = None) -> NestJob:
+        """Queue a job. params are nest_rectangles_logic keyword arguments."""
+        self._evict_expired()
+        with self._lock:
+            active = sum(1 for j in self._jobs.values() if j.status not in FINISHED_STATES)
+            if active >= self.max_pending:
+                raise NestJobQueueFull(f"Too many nesting jobs in progress ({active})")
+            job = NestJob(params, user_id)
+            self._jobs[job.id] = job
+        job.future = self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[NestJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[NestJob]:
+        """Request cancellation. Queued jobs stop at once; running ones at their next probe."""
+        job = self.get(job_id)
+        if job is None or job.status in FINISHED_STATES:
+            return job
+        job.cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            self._finish(job, CANCELLED)
+        return job
+
+    # ---------- Internals ----------
+    def _run(self, job: NestJob) -> None:
+        from endpoints.api.projects.nest import NestCancelled, nest_rectangles_logic
+
+        if job.cancel_event.is_set():
+            self._finish(job, CANCELLED)
+            return
+        job.status = RUNNING
+        job.started_at = datetime.now(timezone.utc)
+
+        def progress(probes, best_width):
+            job.probes = probes
+            if best_width is not None:
+                job.best_width = best_width
+            if job.cancel_event.is_set():
+                raise NestCancelled()
+
+        try:
+            result = nest_rectangles_logic(**job.params, progress=progress)
+        except NestCancelled:
+            self._finish(job, CANCELLED)
+            return
+        except Exception as e:
+            self._finish(job, FAILED, error=f"Nesting failed: {e}")
+            return
+
+        if "error" in result:
+            self._finish(job, FAILED, error=result["error"])
+        else:
+            self._finish(job, DONE, result=result)
+
+    def _finish(self, job: NestJob, status: str, result=None, error=None) -> None:
+        with self._lock:
+            if job.status in FINISHED_STATES:
+                return
+            job.status = status
+            job.result = result
+            job.error = error
+            job.finished_at = datetime.now(timezone.utc)
+            # Finished jobs no longer need their (possibly large) input
+            job.params = {}
+
+    def _evict_expired(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [
+                jid for jid, j in self._jobs.items()
+                if j.finished_at is not None and j.finished_at.timestamp() < cutoff
+            ]
+            for jid in expired:
+                del self._jobs[jid]
+
+
+nest_jobs = NestJobManager(
+    workers=int(os.getenv("NEST_JOB_WORKERS", "2")),
+    max_pending=int(os.getenv("NEST_JOB_MAX_PENDING", "32")),
+    ttl_seconds=int(os.getenv("NEST_JOB_TTL", "3600")),
+)
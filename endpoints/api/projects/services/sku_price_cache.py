@@ -0,0 +1,82 @@
+"""Process-wide SKU price table for estimation.
+
+Estimates used to query the skus table for every save and preview. The table
+is small and changes rarely, so each worker keeps all of it in memory
+(code -> cost, sell, name) and estimates read prices from there.
+
+Freshness: at most every ESTIMATION_SKU_CHECK_SECONDS (default 5) a single
+aggregate query compares the table's version (row count, max id, max
+updated_at) with the loaded one and reloads on change, so edits made through
+another worker show up within that window. /database/get_by_sku and
+/database/sql invalidate this worker's table immediately.
+"""
+import os
+import threading
+import time
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+from sqlalchemy import func
+
+from models import db, SKU
+
+
+class SkuPrice(NamedTuple):
+    sku: str
+    name: Optional[str]
+    costPrice: Optional[float]
+    sellPrice: Optional[float]
+
+
+class SkuPriceCache:
+    def __init__(self, check_seconds: float = 5.0):
+        self.check_seconds = check_seconds
+        self._lock = threading.Lock()
+        self._prices: Optional[Dict[str, SkuPrice]] = None
+        self._version = None
+        self._checked_at = 0.0
+        self.loads = 0
+
+    def _current_version(self):
+        return tuple(db.session.query(func.count(SKU.id), func.max(SKU.id), func.max(SKU.updated_at)).one())
+
+    def _table(self) -> Dict[str, SkuPrice]:
+        with self._lock:
+            now = time.monotonic()
+            if self._prices is not None and now - self._checked_at < self.check_seconds:
+                return self._prices
+            version = self._current_version()
+            if self._prices is None or version != self._version:
+                rows = db.session.query(SKU.sku, SKU.name, SKU.costPrice, SKU.sellPrice).all()
+                self._prices = {row.sku: SkuPrice(row.sku, row.name, row.costPrice, row.sellPrice) for row in rows}
+                self._version = version
+                self.loads += 1
+            self._checked_at = now
+            return self._prices
+
+    def get(self, codes: Iterable[str]) -> Dict[str, SkuPrice]:
+        """{code: SkuPrice} for the codes that exist (same shape as {code: SKU})."""
+        table = self._table()
+        return {code: table[code] for code in codes if code in table}
+
+    def prices(self, codes: Iterable[str]) -> Tuple[Dict[str, float], Dict[str, str]]:
+        """({code: cost}, {code: description}) for the codes that exist; see SchemaPlan.sku_prices."""
+        table = self._table()
+        costs, names = {}, {}
+        for code in codes:
+            price = table.get(code)
+            if price is not None:
+                costs[code] = float(price.costPrice or 0.0)
+                names[code] = price.name or code
+        return costs, names
+
+    def invalidate(self) -> None:
+        """Reload on next use (call after writing SKUs)."""
+        with self._lock:
+            self._prices = None
+            self._version = None
+
+
+sku_price_cache = SkuPriceCache(float(os.getenv("ESTIMATION_SKU_CHECK_SECONDS", "5")))
+
+
+__all__ = ["SkuPrice", "SkuPriceCache", "sku_price_cache"]
@@ -0,0 +1,36 @@
+"""Fabric roll defaults for nesting.
+
+Products may set fabricType/fabric, fabricWidth and fabricRollLength; whatever
+they leave out falls back to the defaults here, for every caller (COVER
+calculate, cross-project consolidation, the sail membrane nest).
+"""
+from typing import Tuple
+
+DEFAULT_FABRIC_WIDTH = 1500
+DEFAULT_ROLL_LENGTH = 50000
+UNSPECIFIED_FABRIC = "unspecified"
+
+
+def _num(v):
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
+
+
+def fabric_of(*sources: dict, default_width: int = DEFAULT_FABRIC_WIDTH) -> Tuple[str, int, int]:
+    """(fabric_type, fabric_width, roll_length) from the first source that sets each."""
+    def first(*keys):
+        for src in sources:
+            for key in keys:
+                if (src or {}).get(key) not in (None, ""):
+                    return src[key]
+        return None
+
+    fabric_type = str(first("fabricType", "fabric") or UNSPECIFIED_FABRIC).strip() or UNSPECIFIED_FABRIC
+    width = _num(first("fabricWidth")) or default_width
+    roll_length = _num(first("fabricRollLength")) or DEFAULT_ROLL_LENGTH
+    return fabric_type, int(width), int(roll_length)
+
+
+__all__ = ["DEFAULT_FABRIC_WIDTH", "DEFAULT_ROLL_LENGTH", "UNSPECIFIED_FABRIC", "fabric_of"]
@@ -0,0 +1,69 @@
+"""Lower bounds on the strip length needed to nest a set of panels.
+
+For a strip of height H (the fabric width), no packing can be shorter than:
+
+- the area bound:        ceil(total panel area / H);
+- the widest panel:      the largest length any single panel needs in its
+                         best feasible orientation;
+- the long-panel bound:  panels taller than H/2 in every feasible orientation
+                         cannot share a column with each other, so their
+                         lengths add up.
+
+The same bounds hold for the total length of a multi-roll nest, since the
+rolls laid end to end form a valid strip.
+"""
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from endpoints.api.projects.shared.rectangle_set import as_rectangle_set
+
+_NEVER = np.iinfo(np.int64).max
+
+
+def width_lower_bound(rectangles, fabric_height: int, allow_rotation: bool = True) -> int:
+    """Largest of the area, widest-panel and long-panel bounds.
+
+    Raises ValueError if a panel is taller than the strip in every allowed orientation.
+    """
+    rects = as_rectangle_set(rectangles)
+    if not len(rects):
+        return 0
+    H = int(fabric_height)
+    w, h = rects.widths, rects.heights
+
+    fits_upright = h <= H
+    fits_rotated = (w <= H) if allow_rotation else np.zeros(len(rects), dtype=bool)
+    if not np.all(fits_upright | fits_rotated):
+        raise ValueError("Cannot fit panels in the given height.")
+
+    # Shortest length each panel can occupy along the strip
+    length = np.minimum(np.where(fits_upright, w, _NEVER), np.where(fits_rotated, h, _NEVER))
+
+    # Tall in every orientation it can take: no two of these stack in one column
+    tall = (~fits_upright | (2 * h > H)) & (~fits_rotated | (2 * w > H))
+
+    area_bound = -(-rects.total_area() // H)
+    long_bound = int(length[tall].sum())
+    widest = int(length.max())
+    return max(area_bound, long_bound, widest)
+
+
+def gap_report(total_width: int, lower_bound: int, upper_bound: Optional[int] = None,
+               fabric_roll_length: Optional[int] = None) -> Dict[str, Any]:
+    """The "bounds" block attached to fixed-height results."""
+    gap = max(0, int(total_width) - int(lower_bound))
+    report: Dict[str, Any] = {
+        "lower_bound": int(lower_bound),
+        "gap": gap,
+        "gap_pct": round(gap * 100.0 / lower_bound, 2) if lower_bound else 0.0,
+        "optimal": gap == 0,
+    }
+    if upper_bound is not None:
+        report["upper_bound"] = int(upper_bound)
+    if fabric_roll_length:
+        report["min_rolls"] = -(-int(lower_bound) // int(fabric_roll_length))
+    return report
+
+
+__all__ = ["width_lower_bound", "gap_report"]
@@ -0,0 +1,153 @@
+"""Content-addressed cache for nesting results.
+
+Keys are a SHA-256 over the canonical rectangle multiset plus every parameter
+that changes the nest (fabric height, roll length, bin, rotation, grouping).
+An in-memory LRU serves repeat previews; when NEST_CACHE_DIR is set, results
+are also written there as JSON so they survive worker restarts.
+
+Environment:
+- NEST_CACHE_SIZE: max in-memory entries (default 256, 0 disables the cache)
+- NEST_CACHE_DIR:  optional directory for the on-disk tier
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+# Bump when packing output changes so stale disk entries are ignored.
+CACHE_VERSION = 2
+
+
+def make_key(rectangles: Iterable[Tuple[int, int, str]], **params: Any) -> str:
+    """Canonical hash of a rectangle multiset and nesting parameters."""
+    canonical = {
+        "v": CACHE_VERSION,
+        "rects": sorted([int(w), int(h), str(label)] for w, h, label in rectangles),
+        "params": {k: params[k] for k in sorted(params)},
+    }
+    blob = json.dumps(canonical, separators=(",", ":"), sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class NestCache:
+    """Thread-safe, size-bounded LRU with an optional JSON-on-disk tier."""
+
+    def __init__(self, max_entries: int = 256, disk_dir: Optional[str] = None):
+        self.max_entries = max(0, int(max_entries))
+        self.disk_dir = disk_dir or None
+        # Entries are stored as JSON text: json.loads hands every caller a private copy
+        # faster than deepcopy, and the same text is what goes to disk.
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    # ---------- Disk tier ----------
+    def _disk_path(self, key: str) -> Optional[str]:
+        if not self.disk_dir:
+            return None
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def _read_disk(self, key: str) -> Optional[str]:
+        path = self._disk_path(key)
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_disk(self, key: str, value: str) -> None:
+        path = self._disk_path(key)
+        if not path:
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write-then-rename so concurrent workers never read a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(value)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[NEST CACHE] Disk write failed for {key}: {e}")
+
+    # ---------- Public API ----------
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a private copy of the cached result, or None."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            text = self._entries.get(key)
+            if text is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return json.loads(text)
+
+        text = self._read_disk(key)
+        try:
+            value = json.loads(text) if text is not None else None
+        except ValueError:
+            value = None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._store(key, text)
+        return value
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        """Cache a successful result (error results are never stored)."""
+        if not self.enabled or not isinstance(value, dict) or "error" in value:
+            return
+        text = json.dumps(value, separators=(",", ":"))
+        with self._lock:
+            self._store(key, text)
+        self._write_disk(key, text)
+
+    def _store(self, key: str, text: str) -> None:
+        self._entries[key] = text
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop in-memory entries and reset counters (the disk tier is left alone)."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.disk_hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": ((self.hits + self.disk_hits) / lookups) if lookups else 0.0,
+                "disk_dir": self.disk_dir,
+            }
+
+
+# Process-wide instance used by nest_rectangles_logic
+nest_cache = NestCache(
+    max_entries=int(os.getenv("NEST_CACHE_SIZE", "256")),
+    disk_dir=os.getenv("NEST_CACHE_DIR") or None,
+)
+
+
+__all__ = ["NestCache", "nest_cache", "make_key", "CACHE_VERSION"]
@@ -0,0 +1,289 @@
+"""Deadline-bounded improvement pass for multi-roll nests.
+
+Takes a finished multi-roll result and tries to shorten the last roll:
+
+- re-insert: last-roll panels are dropped into free space left in earlier
+  rolls (the earlier rolls' free lists are rebuilt from their placements, so
+  any packer's output can be improved);
+- swap: a last-roll panel replaces a smaller panel in an earlier roll, which
+  moves to the last roll instead;
+- reorder / rotate: the last roll is repacked with two panels swapped in the
+  packing order, or with one panel's orientation toggled.
+
+Moves that do not make (num_rolls, last_roll_length, total_width) worse are kept; the best
+state seen is returned when the deadline passes.
+"""
+import random
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from endpoints.api.projects.shared.nest_bounds import gap_report
+from endpoints.api.projects.shared.rectangle_set import as_rectangle_set
+from endpoints.api.projects.shared.strip_pack import DEFAULT_SORT_KEYS, StripPacker, sort_rectangles
+
+# (x, y, placed_w, placed_h) keyed by label, one dict per roll
+Roll = Dict[str, Tuple[int, int, int, int]]
+# Last-roll packing order: (w, h, label, rotation_allowed)
+SeqItem = Tuple[int, int, str, bool]
+
+DEFAULT_IMPROVE_MS = 500
+PROGRESS_EVERY = 50
+
+
+def _roll_width(roll: Roll) -> int:
+    return max((x + w for x, _, w, _ in roll.values()), default=0)
+
+
+def _packer_for(roll: Roll, fabric_height: int, roll_length: int, skip: Optional[str] = None) -> StripPacker:
+    """Rebuild a roll's free space from its fixed placements."""
+    packer = StripPacker(fabric_height, roll_length)
+    for label, (x, y, w, h) in roll.items():
+        if label != skip:
+            packer.place(x, y, w, h)
+    return packer
+
+
+def _pack_sequence(seq: List[SeqItem], fabric_height: int, roll_length: int) -> Optional[Roll]:
+    """Pack one roll in the given order; None if anything does not fit."""
+    packer = StripPacker(fabric_height, roll_length)
+    roll: Roll = {}
+    for w, h, label, rotatable in seq:
+        placed = packer.insert(w, h, rotatable)
+        if placed is None:
+            return None
+        x, y, pw, ph, _ = placed
+        roll[label] = (x, y, pw, ph)
+    return roll
+
+
+def _compact_last(seq: List[SeqItem], fabric_height: int, roll_length: int) -> Tuple[List[SeqItem], Optional[Roll]]:
+    """Best of the default orderings for a fresh last roll."""
+    best_seq, best_roll = seq, _pack_sequence(seq, fabric_height, roll_length)
+    for key in DEFAULT_SORT_KEYS:
+        candidate = sort_rectangles(seq, key)
+        roll = _pack_sequence(candidate, fabric_height, roll_length)
+        if roll is not None and (best_roll is None or _roll_width(roll) < _roll_width(best_roll)):
+            best_seq, best_roll = candidate, roll
+    return best_seq, best_roll
+
+
+class _State:
+    def __init__(self, rolls: List[Roll], seq: List[SeqItem], last: Roll):
+        self.rolls = rolls      # all rolls except the last
+        self.seq = seq          # packing order of the last roll
+        self.last = last
+
+    def score(self) -> Tuple[int, int, int]:
+        """Rolls used, then last roll length (earlier rolls are consumed whole), then total."""
+        last = _roll_width(self.last)
+        widths = sum(_roll_width(r) for r in self.rolls) + last
+        return len(self.rolls) + (1 if self.last else 0), last, widths
+
+    def all_rolls(self) -> List[Roll]:
+        return self.rolls + ([self.last] if self.last else [])
+
+
+def improve_rolls(
+    result: Dict[str, Any],
+    rectangles,
+    fabric_height: int,
+    fabric_roll_length: int,
+    allow_rotation: bool = True,
+    deadline_ms: int = DEFAULT_IMPROVE_MS,
+    seed: int = 0,
+    progress=None,
+) -> Dict[str, Any]:
+    """Improve a pack_into_multiple_rolls result until the deadline.
+
+    Returns a result of the same shape with an "improvement" block
+    ({deadline_ms, elapsed_ms, iterations, accepted, num_rolls, last_roll_length,
+    total_width}, each of the last three as {"before", "after"}). If nothing
+    better is found the original placements are returned unchanged.
+
+    progress, if given, is called as progress(iterations, best_total_width)
+    every few dozen iterations; NestCancelled raised from it propagates.
+    """
+    from endpoints.api.projects.nest import _build_rolls_result
+
+    started = time.perf_counter()
+    deadline = started + max(0, int(deadline_ms or 0)) / 1000.0
+    rects = as_rectangle_set(rectangles)
+    H, L = int(fabric_height), int(fabric_roll_length)
+
+    before = {
+        "num_rolls": int(result.get("num_rolls") or 0),
+        "last_roll_length": int(result.get("last_roll_length") or 0),
+        "total_width": int(result.get("total_width") or 0),
+    }
+
+    rolls: List[Roll] = []
+    for roll in result.get("rolls") or []:
+        placed: Roll = {}
+        for label, p in (roll.get("panels") or {}).items():
+            w, h = rects.dims(label)
+            if p.get("rotated"):
+                w, h = h, w
+            placed[label] = (int(p["x"]), int(p["y"]), w, h)
+        rolls.append(placed)
+
+    if not rolls:
+        result["improvement"] = _report(before, before, started, deadline_ms, 0, 0)
+        return result
+
+    def seq_of(roll: Roll) -> List[SeqItem]:
+        return [(w, h, label, allow_rotation) for label, (_, _, w, h) in roll.items()]
+
+    roll_area = H * L
+    # Rebuilt free lists by roll object; rolls are never written in place once shared
+    packer_cache: Dict[int, Tuple[Roll, StripPacker]] = {}
+
+    def packer_of(roll: Roll) -> StripPacker:
+        hit = packer_cache.get(id(roll))
+        if hit is not None and hit[0] is roll:
+            return hit[1]
+        if len(packer_cache) > 8 * (len(rolls) + 1):
+            packer_cache.clear()
+        packer = _packer_for(roll, H, L)
+        packer_cache[id(roll)] = (roll, packer)
+        return packer
+
+    def settle(st: _State) -> None:
+        """Repack the last roll from scratch if that is no longer than its current layout."""
+        seq, packed = _compact_last(st.seq, H, L)
+        if packed is not None and _roll_width(packed) <= _roll_width(st.last):
+            st.seq, st.last = seq, packed
+
+    def reinsert(st: _State) -> bool:
+        """Move last-roll panels into earlier rolls' free space. True if anything moved."""
+        moved = False
+        while True:
+            free = [roll_area - sum(w * h for _, _, w, h in r.values()) for r in st.rolls]
+            copied = set()
+            for w, h, label, rotatable in sorted(st.seq, key=lambda s: s[0] * s[1], reverse=True):
+                for ri, roll in enumerate(st.rolls):
+                    if free[ri] < w * h:
+                        continue
+                    packer = packer_of(roll)
+                    placed = packer.insert(w, h, rotatable)
+                    if placed is not None:
+                        x, y, pw, ph, _ = placed
+                        # The packer now describes the written roll, not the shared one
+                        packer_cache.pop(id(roll), None)
+                        if ri not in copied:
+                            # Rolls are shared between states; copy before writing
+                            st.rolls[ri] = roll = dict(roll)
+                            copied.add(ri)
+                        roll[label] = (x, y, pw, ph)
+                        packer_cache[id(roll)] = (roll, packer)
+                        free[ri] -= pw * ph
+                        del st.last[label]
+                        moved = True
+                        break
+            st.seq = [s for s in st.seq if s[2] in st.last]
+            if st.last:
+                if moved:
+                    settle(st)
+                return moved
+            if not st.rolls:
+                return moved
+            # An emptied last roll promotes the previous roll; keep filling it
+            st.last = st.rolls.pop()
+            st.seq = seq_of(st.last)
+            settle(st)
+
+    last = rolls.pop()
+    state = _State(rolls, seq_of(last), last)
+    settle(state)
+    reinsert(state)
+    best = _State(list(state.rolls), list(state.seq), dict(state.last))
+    best_score = best.score()
+    rng = random.Random(seed)
+    iterations = accepted = 0
+
+    while time.perf_counter() < deadline and state.seq:
+        iterations += 1
+        candidate = _State(list(state.rolls), list(state.seq), dict(state.last))
+        move = rng.random()
+
+        if move < 0.4 and candidate.rolls:
+            # Swap a last-roll panel with a smaller one in an earlier roll
+            w, h, label, rotatable = rng.choice(candidate.seq)
+            ri = rng.randrange(len(candidate.rolls))
+            roll = candidate.rolls[ri] = dict(candidate.rolls[ri])
+            smaller = [lbl for lbl, (_, _, qw, qh) in roll.items() if qw * qh < w * h]
+            if not smaller:
+                continue
+            victim = rng.choice(smaller)
+            placed = _packer_for(roll, H, L, skip=victim).insert(w, h, rotatable)
+            if placed is None:
+                continue
+            vx, vy, vw, vh = roll.pop(victim)
+            x, y, pw, ph, _ = placed
+            roll[label] = (x, y, pw, ph)
+            candidate.seq = [s for s in candidate.seq if s[2] != label] + [(vw, vh, victim, allow_rotation)]
+            candidate.seq, packed = _compact_last(candidate.seq, H, L)
+        elif move < 0.7 and len(candidate.seq) > 1:
+            # Reorder the last roll
+            i, j = rng.sample(range(len(candidate.seq)), 2)
+            candidate.seq[i], candidate.seq[j] = candidate.seq[j], candidate.seq[i]
+            packed = _pack_sequence(candidate.seq, H, L)
+        elif allow_rotation:
+            # Toggle one panel's orientation and pin it
+            i = rng.randrange(len(candidate.seq))
+            w, h, label, _ = candidate.seq[i]
+            # Rotated, the panel is w tall
+            if w > H:
+                continue
+            candidate.seq[i] = (h, w, label, False)
+            packed = _pack_sequence(candidate.seq, H, L)
+        else:
+            continue
+
+        if packed is None:
+            continue
+        candidate.last = packed
+        reinsert(candidate)
+        if candidate.score() <= state.score():
+            state = candidate
+            accepted += 1
+            if state.score() < best_score:
+                best = _State(list(state.rolls), list(state.seq), dict(state.last))
+                best_score = best.score()
+        if progress and iterations % PROGRESS_EVERY == 0:
+            progress(iterations, best_score[2])
+
+    if best_score >= (before["num_rolls"], before["last_roll_length"], before["total_width"]):
+        result["improvement"] = _report(before, before, started, deadline_ms, iterations, accepted)
+        return result
+
+    placed = [
+        (bin_idx, x, y, w, h, label)
+        for bin_idx, roll in enumerate(best.all_rolls())
+        for label, (x, y, w, h) in roll.items()
+    ]
+    improved = _build_rolls_result(rects, placed, H, L, allow_rotation)
+    for key in ("engine", "portfolio"):
+        if key in result:
+            improved[key] = result[key]
+    if "bounds" in result:
+        improved["bounds"] = gap_report(
+            improved["total_width"], result["bounds"]["lower_bound"], fabric_roll_length=L,
+        )
+    after = {k: int(improved[k]) for k in ("num_rolls", "last_roll_length", "total_width")}
+    improved["improvement"] = _report(before, after, started, deadline_ms, iterations, accepted)
+    return improved
+
+
+def _report(before, after, started, deadline_ms, iterations, accepted) -> Dict[str, Any]:
+    return {
+        "deadline_ms": int(deadline_ms or 0),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000.0, 3),
+        "iterations": iterations,
+        "accepted": accepted,
+        "num_rolls": {"before": before["num_rolls"], "after": after["num_rolls"]},
+        "last_roll_length": {"before": before["last_roll_length"], "after": after["last_roll_length"]},
+        "total_width": {"before": before["total_width"], "after": after["total_width"]},
+    }
+
+
+__all__ = ["improve_rolls", "DEFAULT_IMPROVE_MS"]
@@ -0,0 +1,142 @@
+"""Incremental insertion into an existing nest.
+
+Interactive edits (adding a rectangle on the RECTANGLES page) would otherwise
+repack the whole job. Given the previous result, panels that are still in
+the job keep their placements, removed panels just free their space, and new
+panels are dropped into the free space left around the kept ones:
+
+- each roll's (or the strip's) free list is rebuilt from its kept placements;
+- new panels go in largest first, first roll that fits;
+- a kept panel that no longer lies in free space (its size changed and now
+  overlaps a neighbour) or a new panel that fits no existing roll means the
+  layout cannot be patched, and the caller repacks from scratch;
+- so does a patch that has drifted too far from a fresh pack. Each patched
+  result remembers the gap to the lower bound of the last full pack it grew
+  from ("base_gap_pct"); once a patch's gap exceeds that by more than
+  MAX_GAP_GROWTH_PCT points, the caller repacks. Without this an open strip,
+  which always has room at the end, would only ever get longer.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+from endpoints.api.projects.shared.nest_bounds import gap_report, width_lower_bound
+from endpoints.api.projects.shared.rectangle_set import as_rectangle_set
+from endpoints.api.projects.shared.strip_pack import StripPacker, _contains, sort_rectangles
+
+# (bin_idx, x, y, placed_w, placed_h, label), as rectpack's rect_list()
+Placed = Tuple[int, int, int, int, int, str]
+
+# Percentage points of lower-bound gap a chain of patches may add over its last full pack
+MAX_GAP_GROWTH_PCT = 10.0
+
+
+def _compatible(previous: Dict[str, Any], fabric_height: int, fabric_roll_length: Optional[int],
+                allow_rotation: bool) -> bool:
+    if not isinstance(previous, dict) or "error" in previous or not previous.get("panels"):
+        return False
+    if int(previous.get("bin_height") or 0) != fabric_height:
+        return False
+    if bool(previous.get("rotation", True)) != allow_rotation:
+        return False
+    return int(previous.get("fabric_roll_length") or 0) == int(fabric_roll_length or 0)
+
+
+def insert_into_nest(
+    previous: Dict[str, Any],
+    rectangles,
+    fabric_height: int,
+    fabric_roll_length: Optional[int] = None,
+    allow_rotation: bool = True,
+) -> Optional[Dict[str, Any]]:
+    """Patch a previous fixed-height result to hold `rectangles`; None if a full repack is needed.
+
+    The result has the usual shape (rolls when fabric_roll_length is set) plus
+    engine="incremental" and "incremental": {kept, inserted, removed, base_gap_pct}.
+    """
+    H = int(fabric_height)
+    L = int(fabric_roll_length) if fabric_roll_length else None
+    if not _compatible(previous, H, L, bool(allow_rotation)):
+        return None
+    base_gap_pct = (previous.get("incremental") or {}).get("base_gap_pct")
+    if base_gap_pct is None:
+        base_gap_pct = (previous.get("bounds") or {}).get("gap_pct")
+    if base_gap_pct is None:
+        # Nothing to measure drift against
+        return None
+
+    rects = as_rectangle_set(rectangles)
+    old = previous["panels"]
+    packers: Dict[int, StripPacker] = {}
+    placed: List[Placed] = []
+    new = []
+
+    for w, h, label in rects:
+        p = old.get(label)
+        if p is None:
+            new.append((w, h, label))
+            continue
+        if p.get("rotated"):
+            if not allow_rotation:
+                return None
+            w, h = h, w
+        placed.append((int(p.get("bin", 0) or 0), int(p["x"]), int(p["y"]), w, h, label))
+
+    # Replayed left to right, as the packer placed them, the free lists stay short
+    placed.sort()
+    for bin_idx, x, y, w, h, _ in placed:
+        packer = packers.get(bin_idx)
+        if packer is None:
+            packer = packers[bin_idx] = StripPacker(H, L)
+        if not any(_contains(f, (x, y, w, h)) for f in packer.free):
+            return None
+        packer.place(x, y, w, h)
+
+    kept = len(placed)
+    if not packers:
+        packers[0] = StripPacker(H, L)
+    order = sorted(packers)
+    for w, h, label in sort_rectangles(new, "area"):
+        for bin_idx in order:
+            spot = packers[bin_idx].insert(w, h, allow_rotation)
+            if spot is not None:
+                x, y, pw, ph, _ = spot
+                placed.append((bin_idx, x, y, pw, ph, label))
+                break
+        else:
+            return None
+
+    # Rolls emptied by removals close up
+    renumber = {b: i for i, b in enumerate(sorted({p[0] for p in placed}))}
+    placed = [(renumber[b], x, y, w, h, label) for b, x, y, w, h, label in placed]
+
+    if L:
+        from endpoints.api.projects.nest import _build_rolls_result
+
+        result = _build_rolls_result(rects, placed, H, L, allow_rotation)
+    else:
+        used_width = max((x + w for _, x, _, w, _, _ in placed), default=0)
+        result = {
+            "panels": {
+                label: {"x": x, "y": y, "rotated": rects.is_rotated(label, w, h)}
+                for _, x, y, w, h, label in placed
+            },
+            "total_width": int(used_width),
+            "required_width": int(used_width),
+            "bin_height": H,
+            "rotation": bool(allow_rotation),
+        }
+    result["bounds"] = gap_report(
+        result["total_width"], width_lower_bound(rects, H, allow_rotation), fabric_roll_length=L,
+    )
+    if result["bounds"]["gap_pct"] > float(base_gap_pct) + MAX_GAP_GROWTH_PCT:
+        return None
+    result["engine"] = "incremental"
+    result["incremental"] = {
+        "kept": kept,
+        "inserted": len(new),
+        "removed": sum(1 for label in old if label not in rects),
+        "base_gap_pct": float(base_gap_pct),
+    }
+    return result
+
+
+__all__ = ["insert_into_nest"]
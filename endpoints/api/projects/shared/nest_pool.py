@@ -0,0 +1,92 @@
+"""Process pool shared by the CPU-bound nesting helpers.
+
+One lazily created ProcessPoolExecutor per worker process. Packing is pure
+Python, so threads would serialise on the GIL; processes give real
+parallelism for per-fabric partitions, width sweeps and consolidation.
+
+Portfolio strategies get a second pool of their own, so a race that runs up
+to its time budget never leaves those jobs queued behind it.
+
+Environment:
+- NEST_POOL_WORKERS: pool size (default: CPU count)
+- NEST_PORTFOLIO_WORKERS: portfolio pool size (default: NEST_POOL_WORKERS)
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+_pool: Optional[ProcessPoolExecutor] = None
+_portfolio_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def pool_size() -> int:
+    try:
+        return max(1, int(os.getenv("NEST_POOL_WORKERS") or os.cpu_count() or 1))
+    except ValueError:
+        return max(1, os.cpu_count() or 1)
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Return the shared pool, creating (or replacing a broken) one on demand."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or getattr(_pool, "_broken", False):
+            _pool = ProcessPoolExecutor(max_workers=pool_size())
+        return _pool
+
+
+def submit(fn, *args, **kwargs):
+    """Submit to the shared pool, rebuilding it once if a worker died."""
+    try:
+        return get_pool().submit(fn, *args, **kwargs)
+    except BrokenProcessPool:
+        shutdown_pool(portfolio=False)
+        return get_pool().submit(fn, *args, **kwargs)
+
+
+def portfolio_pool_size() -> int:
+    try:
+        return max(1, int(os.getenv("NEST_PORTFOLIO_WORKERS") or pool_size()))
+    except ValueError:
+        return pool_size()
+
+
+def get_portfolio_pool() -> ProcessPoolExecutor:
+    """Return the portfolio pool, creating (or replacing a broken) one on demand."""
+    global _portfolio_pool
+    with _pool_lock:
+        if _portfolio_pool is None or getattr(_portfolio_pool, "_broken", False):
+            _portfolio_pool = ProcessPoolExecutor(max_workers=portfolio_pool_size())
+        return _portfolio_pool
+
+
+def submit_portfolio(fn, *args, **kwargs):
+    """Submit to the portfolio pool, rebuilding it once if a worker died."""
+    try:
+        return get_portfolio_pool().submit(fn, *args, **kwargs)
+    except BrokenProcessPool:
+        shutdown_pool(shared=False)
+        return get_portfolio_pool().submit(fn, *args, **kwargs)
+
+
+def shutdown_pool(wait: bool = False, shared: bool = True, portfolio: bool = True) -> None:
+    global _pool, _portfolio_pool
+    pools = []
+    with _pool_lock:
+        if shared and _pool is not None:
+            pools.append(_pool)
+            _pool = None
+        if portfolio and _portfolio_pool is not None:
+            pools.append(_portfolio_pool)
+            _portfolio_pool = None
+    for pool in pools:
+        pool.shutdown(wait=wait, cancel_futures=True)
+
+
+__all__ = [
+    "get_pool", "submit", "shutdown_pool", "pool_size",
+    "get_portfolio_pool", "submit_portfolio", "portfolio_pool_size",
+]
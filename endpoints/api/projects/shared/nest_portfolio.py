@@ -0,0 +1,227 @@
+"""Algorithm portfolio for nesting: race several packers, keep the best.
+
+Each strategy is a (pack_algo, sort_key) pair. pack_algo is a rectpack
+algorithm class name or "strip" for the native MaxRects strip packer. All
+strategies run concurrently on the portfolio process pool (see nest_pool);
+whatever has finished when the time budget runs out is compared and the best
+one wins.
+
+A strategy cannot be cancelled once a worker has picked it up, so each one
+carries the race's deadline and stops itself there (an interval timer in the
+worker), handing the worker back to the next race.
+"""
+import contextlib
+import signal
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, TimeoutError as FutureTimeout, as_completed, wait
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from endpoints.api.projects.shared.nest_bounds import gap_report, width_lower_bound
+from endpoints.api.projects.shared.nest_pool import submit_portfolio
+from endpoints.api.projects.shared.rectangle_set import as_rectangle_set
+
+Rect = Tuple[int, int, str]
+
+PORTFOLIO_ALGOS = (
+    "strip",
+    "MaxRectsBssf",
+    "MaxRectsBaf",
+    "MaxRectsBl",
+    "SkylineBlWm",
+    "SkylineMwflWm",
+    "GuillotineBssfSas",
+)
+PORTFOLIO_SORTS = ("area", "long_side", "perimeter")
+DEFAULT_STRATEGIES = tuple((a, s) for a in PORTFOLIO_ALGOS for s in PORTFOLIO_SORTS)
+
+DEFAULT_TIME_BUDGET_MS = 1000
+
+
+class StrategyTimeout(Exception):
+    """A strategy ran past its race's deadline."""
+
+
+def _on_deadline(_signum, _frame):
+    raise StrategyTimeout("time budget exceeded")
+
+
+@contextlib.contextmanager
+def _deadline(deadline: Optional[float]):
+    """Raise StrategyTimeout inside the block once time.time() passes deadline.
+
+    Uses SIGALRM, so it only applies on the main thread of a POSIX process
+    (pool workers); elsewhere the block runs to completion.
+    """
+    if deadline is None or not hasattr(signal, "setitimer") or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+    remaining = deadline - time.time()
+    if remaining <= 0:
+        raise StrategyTimeout("time budget exceeded before start")
+    previous = signal.signal(signal.SIGALRM, _on_deadline)
+    signal.setitimer(signal.ITIMER_REAL, remaining)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def run_strategy(
+    rectangles: Sequence[Rect],
+    fabric_height: int,
+    fabric_roll_length: Optional[int],
+    allow_rotation: bool,
+    pack_algo: str,
+    sort_key: str,
+    deadline: Optional[float] = None,
+) -> Tuple[Dict[str, Any], float]:
+    """Run one strategy (in a pool worker). Returns (result, elapsed_ms).
+
+    deadline is a time.time() value; past it the strategy raises StrategyTimeout.
+    """
+    start = time.perf_counter()
+    with _deadline(deadline):
+        result = _pack_strategy(rectangles, fabric_height, fabric_roll_length, allow_rotation, pack_algo, sort_key)
+    return result, (time.perf_counter() - start) * 1000.0
+
+
+def _pack_strategy(rectangles, fabric_height, fabric_roll_length, allow_rotation, pack_algo, sort_key):
+    from endpoints.api.projects.nest import _pack_open_strip, pack_into_multiple_rolls
+
+    if fabric_roll_length:
+        result = pack_into_multiple_rolls(
+            rectangles, fabric_height, fabric_roll_length, allow_rotation,
+            pack_algo=pack_algo, sort_key=sort_key,
+        )
+    elif pack_algo == "strip":
+        result = _pack_open_strip(rectangles, fabric_height, allow_rotation, sort_keys=(sort_key,))
+    else:
+        # Open-ended strip: one bin long enough for every panel end to end
+        open_length = sum(max(w, h) for w, h, _ in rectangles)
+        rolls = pack_into_multiple_rolls(
+            rectangles, fabric_height, open_length, allow_rotation,
+            pack_algo=pack_algo, sort_key=sort_key,
+        )
+        result = {
+            "panels": {rid: {"x": p["x"], "y": p["y"], "rotated": p["rotated"]} for rid, p in rolls["panels"].items()},
+            "total_width": int(rolls["total_width"]),
+            "required_width": int(rolls["total_width"]),
+            "bin_height": int(fabric_height),
+            "rotation": bool(allow_rotation),
+            "engine": pack_algo,
+        }
+    return result
+
+
+def _score(result: Dict[str, Any], expected: int) -> Tuple:
+    """Lower is better: unplaced panels, then rolls, total length, last roll."""
+    unplaced = expected - len(result.get("panels") or {})
+    return (
+        unplaced,
+        int(result.get("num_rolls") or 1),
+        float(result.get("total_width") or 0),
+        float(result.get("last_roll_length") or 0),
+    )
+
+
+def run_portfolio(
+    rectangles: Sequence[Rect],
+    fabric_height: int,
+    fabric_roll_length: Optional[int] = None,
+    allow_rotation: bool = True,
+    time_budget_ms: int = DEFAULT_TIME_BUDGET_MS,
+    strategies: Sequence[Tuple[str, str]] = DEFAULT_STRATEGIES,
+    progress=None,
+) -> Dict[str, Any]:
+    """Race the strategies and return the best finished result.
+
+    The result carries a "portfolio" block: the winning strategy, the budget and
+    per-strategy status/elapsed time, and "bounds" as run_rectpack_with_fixed_height.
+    Every strategy but the first stops at the deadline; the first always runs
+    to completion, so if nothing finishes inside the budget its result is used.
+
+    progress, if given, is called as progress(strategies_done, best_width) as
+    each strategy finishes; an exception from it cancels the remaining ones.
+    """
+    budget_ms = max(1, int(time_budget_ms or DEFAULT_TIME_BUDGET_MS))
+    rects = as_rectangle_set(rectangles)
+    started = time.perf_counter()
+
+    # Workers compare against the wall clock; the small grace covers pickling the result back
+    deadline = time.time() + budget_ms / 1000.0 + 0.05
+    futures = {
+        submit_portfolio(
+            run_strategy, rects, fabric_height, fabric_roll_length, allow_rotation, algo, sort_key,
+            None if i == 0 else deadline,
+        ): f"{algo}/{sort_key}"
+        for i, (algo, sort_key) in enumerate(strategies)
+    }
+    done = set()
+    best_width = None
+    try:
+        for future in as_completed(futures, timeout=budget_ms / 1000.0):
+            done.add(future)
+            if progress:
+                if future.exception() is None:
+                    width = future.result()[0].get("total_width")
+                    best_width = width if best_width is None else min(best_width, width)
+                progress(len(done), best_width)
+    except FutureTimeout:
+        pass
+    except BaseException:
+        for f in futures:
+            f.cancel()
+        raise
+    pending = set(futures) - done
+    if not done:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+    for f in pending:
+        f.cancel()
+
+    report: List[Dict[str, Any]] = []
+    best = None
+    for future, name in futures.items():
+        if future not in done:
+            report.append({"strategy": name, "status": "cancelled" if future.cancelled() else "timeout"})
+            continue
+        try:
+            result, elapsed_ms = future.result()
+        except StrategyTimeout:
+            report.append({"strategy": name, "status": "timeout"})
+            continue
+        except Exception as e:
+            report.append({"strategy": name, "status": "error", "error": str(e)})
+            continue
+        score = _score(result, len(rects))
+        report.append({
+            "strategy": name,
+            "status": "done",
+            "elapsed_ms": round(elapsed_ms, 3),
+            "total_width": result.get("total_width"),
+            "num_rolls": result.get("num_rolls"),
+            "unplaced": score[0],
+        })
+        if best is None or score < best[0]:
+            best = (score, name, result)
+
+    if best is None:
+        raise ValueError("No nesting strategy succeeded")
+
+    result = best[2]
+    result["bounds"] = gap_report(
+        result.get("total_width") or 0,
+        width_lower_bound(rects, fabric_height, allow_rotation),
+        fabric_roll_length=fabric_roll_length,
+    )
+    result["portfolio"] = {
+        "winner": best[1],
+        "time_budget_ms": budget_ms,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000.0, 3),
+        "strategies": report,
+    }
+    return result
+
+
+__all__ = ["run_portfolio", "run_strategy", "StrategyTimeout", "DEFAULT_STRATEGIES", "DEFAULT_TIME_BUDGET_MS"]
@@ -0,0 +1,120 @@
+"""Fabric width / roll length sweep.
+
+Nests the same panels once per candidate (fabric height, roll length) on the
+nesting process pool and ranks the options by fabric consumed, so estimators
+can pick the roll width that wastes least without rerunning by hand.
+"""
+from itertools import product
+from typing import Any, Dict, Iterable, List, Optional
+
+from endpoints.api.projects.shared.nest_pool import submit
+
+# Each option is a full nest; keep a sweep to a sensible number of them
+SWEEP_MAX_OPTIONS = 24
+
+
+def _num_list(values, name: str) -> List[Optional[int]]:
+    if values is None:
+        return []
+    if not isinstance(values, (list, tuple)):
+        values = [values]
+    out = []
+    for v in values:
+        if v in (None, "", 0):
+            out.append(None)
+            continue
+        try:
+            n = int(round(float(v)))
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} must be numeric")
+        if n <= 0:
+            raise ValueError(f"{name} must be positive")
+        out.append(n)
+    return list(dict.fromkeys(out))
+
+
+def _sweep_worker(rectangles, fabric_height: int, fabric_roll_length: Optional[int], options: Dict[str, Any]):
+    """Pool worker: one candidate nest."""
+    from endpoints.api.projects.nest import nest_rectangles_logic
+
+    return nest_rectangles_logic(
+        rectangles=rectangles,
+        fabric_height=fabric_height,
+        fabric_roll_length=fabric_roll_length,
+        **options,
+    )
+
+
+def _summary(result: Dict[str, Any], fabric_height: int, panel_area: int) -> Dict[str, Any]:
+    total_width = int(result.get("total_width") or 0)
+    fabric_area = total_width * fabric_height
+    return {
+        "total_width": total_width,
+        "num_rolls": int(result.get("num_rolls") or 1),
+        "last_roll_length": int(result.get("last_roll_length") or total_width),
+        "fabric_area_m2": round(fabric_area / 1_000_000, 3),
+        "waste_m2": round((fabric_area - panel_area) / 1_000_000, 3),
+        "utilisation": round(panel_area / fabric_area, 4) if fabric_area else 0.0,
+    }
+
+
+def run_sweep(
+    rectangles,
+    fabric_heights: Iterable,
+    fabric_roll_lengths: Iterable = (None,),
+    panel_area: int = 0,
+    **options: Any,
+) -> Dict[str, Any]:
+    """Nest every (fabric_height, fabric_roll_length) pair in parallel and rank them.
+
+    options are passed on to nest_rectangles_logic (allow_rotation, grouping, ...).
+    Returns {"options": [...], "best": {...}}: options are ranked by fabric area
+    used (least first), then roll count and total length; each has fabric_height,
+    fabric_roll_length, rank and the _summary() fields, or "error" (ranked last).
+    "best" is the full nest result of the top-ranked option, or None.
+    """
+    heights = [h for h in _num_list(fabric_heights, "fabricHeights") if h]
+    roll_lengths = _num_list(fabric_roll_lengths, "fabricRollLengths") or [None]
+    if not heights:
+        raise ValueError("fabricHeights must list at least one fabric height")
+    candidates = list(product(heights, roll_lengths))
+    if len(candidates) > SWEEP_MAX_OPTIONS:
+        raise ValueError(f"A sweep is limited to {SWEEP_MAX_OPTIONS} options, got {len(candidates)}")
+
+    futures = [
+        (h, length, submit(_sweep_worker, rectangles, h, length, options))
+        for h, length in candidates
+    ]
+
+    rows = []
+    results = {}
+    for h, length, future in futures:
+        row: Dict[str, Any] = {"fabric_height": h, "fabric_roll_length": length}
+        try:
+            result = future.result()
+        except Exception as e:
+            result = {"error": f"Nesting failed: {e}"}
+        if "error" in result:
+            row["error"] = result["error"]
+        else:
+            row.update(_summary(result, h, panel_area))
+            results[(h, length)] = result
+        rows.append(row)
+
+    rows.sort(key=lambda r: (
+        "error" in r,
+        r.get("fabric_area_m2", 0.0),
+        r.get("num_rolls", 0),
+        r.get("total_width", 0),
+    ))
+    for rank, row in enumerate(rows, start=1):
+        row["rank"] = rank
+
+    best = rows[0] if rows and "error" not in rows[0] else None
+    return {
+        "options": rows,
+        "best": results[(best["fabric_height"], best["fabric_roll_length"])] if best else None,
+    }
+
+
+__all__ = ["run_sweep", "SWEEP_MAX_OPTIONS"]
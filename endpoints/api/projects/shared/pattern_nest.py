@@ -0,0 +1,208 @@
+"""Quantity-aware pattern nesting for repeated panels.
+
+Repeat orders arrive fully expanded (COVER sends P1_MAIN_Q1 .. P1_MAIN_Q200),
+so hundreds of identical panels would go through the packer one by one.
+Instead, identical panels are counted by size, the repeated ones are split
+into identical "units" (e.g. one MAIN and two SIDEs per cover), a pattern of
+one to a few units is packed once, and that pattern is tiled along the strip.
+Only the leftovers (partial units and one-off panels) are packed
+individually. On rolls the repeated pattern is a whole roll instead, since
+the best roll usually mixes parts of several units.
+
+Placements are still produced per label, so callers and plot files see the
+same shape as an ordinary nest.
+"""
+from math import gcd
+from typing import Dict, List, Optional, Tuple
+
+from endpoints.api.projects.shared.rectangle_set import RectangleSet, as_rectangle_set
+from endpoints.api.projects.shared.strip_pack import StripPacker, pack_strip
+
+# A size must repeat at least this often (and the order have at least this many units)
+PATTERN_MIN_REPEAT = 8
+# Units bigger than this are not worth tiling (mixed orders with unrelated quantities)
+PATTERN_MAX_UNIT = 24
+# Smaller jobs pack quickly enough one panel at a time
+PATTERN_MIN_PANELS = 200
+# Share of the job that must be whole repeated units
+PATTERN_MIN_SHARE = 0.5
+# Candidate pattern sizes, in units
+PATTERN_UNITS = (1, 2, 3, 4)
+
+# (bin_idx, x, y, placed_w, placed_h, label), as rectpack's rect_list()
+Placed = Tuple[int, int, int, int, int, str]
+
+
+def find_unit(rects: RectangleSet) -> Optional[Tuple[Dict[Tuple[int, int], int], int]]:
+    """Return ({(w, h): panels_per_unit}, units) for the repeated sizes, or None."""
+    counts: Dict[Tuple[int, int], int] = {}
+    for w, h in zip(rects.widths.tolist(), rects.heights.tolist()):
+        counts[(w, h)] = counts.get((w, h), 0) + 1
+
+    repeated = {size: c for size, c in counts.items() if c >= PATTERN_MIN_REPEAT}
+    if not repeated:
+        return None
+
+    units = 0
+    for c in repeated.values():
+        units = gcd(units, c)
+    if units < PATTERN_MIN_REPEAT:
+        # Quantities that do not share a factor: leftovers go to the remainder
+        units = min(repeated.values())
+
+    unit = {size: c // units for size, c in repeated.items()}
+    if sum(unit.values()) > PATTERN_MAX_UNIT:
+        return None
+    return unit, units
+
+
+def _best_pattern(unit, units, H, L, allow_rotation):
+    """Pack k units for each candidate k; keep the best length per unit.
+
+    Returns (width, k, placements, sizes) where placements/sizes are keyed by slot label.
+    """
+    best = None
+    for k in PATTERN_UNITS:
+        if k > units:
+            break
+        sizes = {
+            f"{w}x{h}#{n}": (w, h)
+            for (w, h), per_unit in unit.items()
+            for n in range(per_unit * k)
+        }
+        pieces = [(w, h, label) for label, (w, h) in sizes.items()]
+        try:
+            placements, width, _ = pack_strip(pieces, H, allow_rotation)
+        except ValueError:
+            return None
+        if L and width > L:
+            break
+        if best is None or width * best[1] < best[0] * k:
+            best = (width, k, placements, sizes)
+    return best
+
+
+def _label_pool(rects: RectangleSet) -> Dict[Tuple[int, int], List[str]]:
+    """Labels by size; pop() hands them out in input order."""
+    pool: Dict[Tuple[int, int], List[str]] = {}
+    for w, h, label in rects:
+        pool.setdefault((w, h), []).append(label)
+    for labels in pool.values():
+        labels.reverse()
+    return pool
+
+
+def _fill(packer: StripPacker, pool, allow_rotation: bool) -> List[Tuple[Tuple[int, int], int, int, int, int]]:
+    """First-fit pooled panels, largest sizes first; returns (size, x, y, w, h) slots.
+
+    Once a size fails, further copies of it cannot fit either, so each size is
+    tried until its first miss.
+    """
+    slots = []
+    for size in sorted(pool, key=lambda sz: sz[0] * sz[1], reverse=True):
+        for _ in range(len(pool[size])):
+            spot = packer.insert(size[0], size[1], allow_rotation)
+            if spot is None:
+                break
+            x, y, pw, ph, _ = spot
+            slots.append((size, x, y, pw, ph))
+    return slots
+
+
+def _take(pool, slots, roll: int, offset: int, placed: List[Placed]) -> None:
+    for size, x, y, w, h in slots:
+        placed.append((roll, offset + x, y, w, h, pool[size].pop()))
+
+
+def _covers(pool, need: Dict[Tuple[int, int], int]) -> bool:
+    return all(len(pool.get(size, ())) >= n for size, n in need.items())
+
+
+def _counts(slots) -> Dict[Tuple[int, int], int]:
+    need: Dict[Tuple[int, int], int] = {}
+    for slot in slots:
+        need[slot[0]] = need.get(slot[0], 0) + 1
+    return need
+
+
+def _nest_rolls(pool, H: int, L: int, allow_rotation: bool, placed: List[Placed]) -> Dict[str, int]:
+    """Fill a roll first-fit, then repeat that exact roll while the pool allows."""
+    rolls = patterns = 0
+    while any(pool.values()):
+        slots = _fill(StripPacker(H, L), pool, allow_rotation)
+        if not slots:
+            label = next(labels[-1] for labels in pool.values() if labels)
+            raise ValueError(f"Panel '{label}' does not fit on an empty roll")
+        patterns += 1
+        need = _counts(slots)
+        while _covers(pool, need):
+            _take(pool, slots, rolls, 0, placed)
+            rolls += 1
+    return {"roll_patterns": patterns, "rolls": rolls}
+
+
+def _nest_strip(unit, units, pool, H: int, allow_rotation: bool, placed: List[Placed]) -> Optional[Dict[str, int]]:
+    """Tile a pattern of whole units along an open strip, then pack what is left after it."""
+    pattern = _best_pattern(unit, units, H, None, allow_rotation)
+    if pattern is None:
+        return None
+    tile_width, per_tile, slots, sizes = pattern
+    tile = [(sizes[label], p["x"], p["y"], p["w"], p["h"]) for label, p in slots.items()]
+    need = _counts(tile)
+
+    used = tiles = 0
+    while _covers(pool, need):
+        _take(pool, tile, 0, used, placed)
+        used += tile_width
+        tiles += 1
+
+    packer = StripPacker(H)
+    packer.place(0, 0, used, H)
+    remainder = sum(len(labels) for labels in pool.values())
+    _take(pool, _fill(packer, pool, allow_rotation), 0, 0, placed)
+    if any(pool.values()):
+        raise ValueError("Cannot fit panels in the given height.")
+    return {"units_per_tile": per_tile, "tiles": tiles, "tile_width": tile_width, "remainder": remainder}
+
+
+def pattern_nest(
+    rectangles,
+    fabric_height: int,
+    fabric_roll_length: Optional[int] = None,
+    allow_rotation: bool = True,
+) -> Optional[Tuple[List[Placed], Dict[str, int]]]:
+    """Nest by repeating packed patterns; None if the panels do not repeat enough.
+
+    On an open strip the pattern is one to a few whole units, tiled end to end,
+    with leftovers packed after the tiles. With a roll length the pattern is a
+    whole roll: one roll is filled first-fit and then repeated as long as the
+    remaining panels allow, so roll tails are used as well as a fresh pack would.
+
+    Returns (placed, info): placed as (bin_idx, x, y, w, h, label) tuples (bin_idx
+    is 0 without a roll length); info has "units" plus {"roll_patterns", "rolls"}
+    for rolls or {"units_per_tile", "tiles", "tile_width", "remainder"} for a strip.
+    """
+    rects = as_rectangle_set(rectangles)
+    if len(rects) < PATTERN_MIN_PANELS:
+        return None
+    found = find_unit(rects)
+    if found is None:
+        return None
+    unit, units = found
+    if sum(unit.values()) * units < PATTERN_MIN_SHARE * len(rects):
+        return None
+    H = int(fabric_height)
+    pool = _label_pool(rects)
+    placed: List[Placed] = []
+
+    if fabric_roll_length:
+        info = _nest_rolls(pool, H, int(fabric_roll_length), allow_rotation, placed)
+    else:
+        info = _nest_strip(unit, units, pool, H, allow_rotation, placed)
+        if info is None:
+            return None
+    info["units"] = units
+    return placed, info
+
+
+__all__ = ["pattern_nest", "find_unit", "PATTERN_MIN_REPEAT"]
@@ -0,0 +1,395 @@
+"""Raster-collision nesting for arbitrary polygons (shade sail membranes).
+
+The rectangle packers only see bounding boxes; a triangular or skewed sail
+wastes most of its box. Here each outline is rasterised onto a grid (cell =
+`resolution` mm) and placed on the fabric by testing every position at once:
+
+- the roll's occupancy grid is correlated with the outline's mask through
+  NumPy FFTs, so the overlap count for all offsets comes out of one pass;
+- offsets with zero overlap are feasible; the one with the smallest right
+  edge (then lowest y) wins, over every allowed rotation;
+- masks are conservative (interior cells plus every cell an edge passes
+  through) and candidate masks are dilated by `gap`, so placed outlines never
+  touch.
+
+Coordinates follow the rectangle nests: x runs along the roll, y across the
+fabric width (0..fabric_height). Each placement records the rigid transform
+(rotate by `rotation` degrees about the origin, then translate by tx, ty) and
+the placed outline, so DXF generators can draw it directly (see nest_entities).
+"""
+import math
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Target cells across the fabric width when no resolution is given
+DEFAULT_CELLS_ACROSS = 200
+MIN_RESOLUTION = 5.0
+DEFAULT_ROTATION_STEPS = 4
+DEFAULT_GAP = 20.0
+
+# Request limits: every outline is rasterised per rotation and FFT-scanned
+# against the whole grid, so work grows with all of these together
+MAX_ROTATION_STEPS = 36
+MAX_POLYGONS = 200
+MAX_CELLS_ACROSS = 1000
+# outlines x rotations x grid cells scanned (about 8 s of FFTs)
+MAX_RASTER_WORK = 5e8
+
+Point = Tuple[float, float]
+
+
+# ---------- Rasterising ----------
+def _rotate(points: np.ndarray, degrees: float) -> np.ndarray:
+    a = math.radians(degrees)
+    c, s = math.cos(a), math.sin(a)
+    return points @ np.array([[c, s], [-s, c]])
+
+
+def _mask(points: np.ndarray, res: float) -> np.ndarray:
+    """Cells (rows = y, cols = x) covered by the polygon, measured from its bbox corner."""
+    pts = points - points.min(axis=0)
+    w = max(1, int(math.ceil(pts[:, 0].max() / res)))
+    h = max(1, int(math.ceil(pts[:, 1].max() / res)))
+
+    # Interior: cell centres inside the polygon (even-odd rule, all cells at once)
+    cx = (np.arange(w) + 0.5) * res
+    cy = (np.arange(h) + 0.5) * res
+    gx, gy = np.meshgrid(cx, cy)
+    inside = np.zeros((h, w), dtype=bool)
+    x0, y0 = pts[:, 0], pts[:, 1]
+    x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+    for ax, ay, bx, by in zip(x0, y0, x1, y1):
+        if ay == by:
+            continue
+        crosses = (ay > gy) != (by > gy)
+        x_at = ax + (gy - ay) * (bx - ax) / (by - ay)
+        inside ^= crosses & (gx < x_at)
+
+    # Boundary: every cell an edge passes through
+    for ax, ay, bx, by in zip(x0, y0, x1, y1):
+        steps = max(1, int(math.ceil(math.hypot(bx - ax, by - ay) / (res / 4.0))))
+        t = np.linspace(0.0, 1.0, steps + 1)
+        cols = np.clip(((ax + (bx - ax) * t) / res).astype(int), 0, w - 1)
+        rows = np.clip(((ay + (by - ay) * t) / res).astype(int), 0, h - 1)
+        inside[rows, cols] = True
+    return inside
+
+
+def _dilate(mask: np.ndarray, cells: int) -> np.ndarray:
+    """Grow a mask by `cells` in every direction (square structuring element)."""
+    if cells <= 0:
+        return mask
+    h, w = mask.shape
+    out = np.zeros((h + 2 * cells, w + 2 * cells), dtype=bool)
+    rows = np.zeros((h + 2 * cells, w), dtype=bool)
+    for d in range(2 * cells + 1):
+        rows[d:d + h] |= mask
+    for d in range(2 * cells + 1):
+        out[:, d:d + w] |= rows
+    return out
+
+
+def _fast_len(n: int) -> int:
+    """Next FFT-friendly length (2^a * 3^b * 5^c) >= n."""
+    best = 1 << max(0, (n - 1).bit_length())
+    f5 = 1
+    while f5 < best:
+        f35 = f5
+        while f35 < best:
+            f = f35
+            while f < n:
+                f *= 2
+            best = min(best, f)
+            f35 *= 3
+        f5 *= 5
+    return best
+
+
+# ---------- Shapes ----------
+class _Shape:
+    """One outline with its rotated variants: (degrees, points, mask, dilated mask)."""
+
+    def __init__(self, label: str, points: np.ndarray, angles: Sequence[float], res: float, gap_cells: int):
+        self.label = label
+        self.points = points
+        x, y = points[:, 0], points[:, 1]
+        self.area = 0.5 * abs(float(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1))))
+        self.variants = []
+        for degrees in angles:
+            rotated = _rotate(points, degrees)
+            mask = _mask(rotated, res)
+            self.variants.append((degrees, rotated, mask, _dilate(mask, gap_cells)))
+
+
+class _Roll:
+    """Occupancy grid of one roll (or the open strip), padded by the gap on every side."""
+
+    def __init__(self, rows: int, cols: Optional[int], pad: int):
+        self.rows, self.cols, self.pad = rows, cols, pad
+        self.grid = np.zeros((rows + 2 * pad, (cols or 256) + 2 * pad), dtype=np.float32)
+        self.used_cols = 0
+
+    def _ensure(self, cols: int) -> None:
+        have = self.grid.shape[1] - 2 * self.pad
+        if cols > have:
+            grow = max(cols - have, have)
+            self.grid = np.pad(self.grid, ((0, 0), (0, grow)))
+
+    def best_fit(self, shape: _Shape) -> Optional[Tuple[int, int, int]]:
+        """(variant index, row, col) with the smallest right edge, then lowest row; None if none fits."""
+        pad = self.pad
+        fitting = [
+            (i, v) for i, v in enumerate(shape.variants)
+            if v[2].shape[0] <= self.rows and (self.cols is None or v[2].shape[1] <= self.cols)
+        ]
+        if not fitting:
+            return None
+        max_w = max(v[2].shape[1] for _, v in fitting)
+        window = self.used_cols + max_w
+        if self.cols is not None:
+            window = min(window, self.cols)
+        self._ensure(window)
+
+        occ = self.grid[:, :window + 2 * pad]
+        dh = max(v[3].shape[0] for _, v in fitting)
+        dw = max(v[3].shape[1] for _, v in fitting)
+        size = (_fast_len(occ.shape[0] + dh), _fast_len(occ.shape[1] + dw))
+        occ_f = np.fft.rfft2(occ, size)
+
+        best = None
+        for i, (_, _, mask, dilated) in fitting:
+            h, w = mask.shape
+            rows, cols = self.rows - h + 1, window - w + 1
+            if cols <= 0:
+                continue
+            # overlap[r, c] = sum(occ[r:r+dh, c:c+dw] * dilated): correlation via FFT
+            corr = np.fft.irfft2(occ_f * np.conj(np.fft.rfft2(dilated.astype(np.float32), size)), size)
+            free = corr[:rows, :cols] < 0.5
+            if not free.any():
+                continue
+            col = int(np.argmax(free.any(axis=0)))
+            row = int(np.argmax(free[:, col]))
+            key = (col + w, row)
+            if best is None or key < best[0]:
+                best = (key, i, row, col)
+        if best is None:
+            return None
+        return best[1], best[2], best[3]
+
+    def place(self, mask: np.ndarray, row: int, col: int) -> None:
+        h, w = mask.shape
+        r, c = row + self.pad, col + self.pad
+        self.grid[r:r + h, c:c + w] += mask
+        self.used_cols = max(self.used_cols, col + w)
+
+
+# ---------- Nesting ----------
+def prepare_polygons(polygons: Iterable[Dict[str, Any]]) -> List[Tuple[str, np.ndarray]]:
+    """Expand {label, points: [[x, y], ...], quantity} dicts into (label, points array)."""
+    out = []
+    for i, poly in enumerate(polygons or []):
+        if not isinstance(poly, dict):
+            raise ValueError("Each polygon must be an object")
+        label = str(poly.get("label") or f"S{i + 1}")
+        try:
+            points = np.asarray([(float(p[0]), float(p[1])) for p in poly.get("points") or []], dtype=float)
+            quantity = int(poly.get("quantity", 1) or 1)
+        except (TypeError, ValueError, IndexError, KeyError):
+            raise ValueError(f"Polygon '{label}' points must be [x, y] pairs")
+        if len(points) < 3 or quantity < 1:
+            raise ValueError(f"Polygon '{label}' needs at least 3 points and a positive quantity")
+        if len(out) + quantity > MAX_POLYGONS:
+            raise ValueError(f"At most {MAX_POLYGONS} polygons (after quantities) can be nested")
+        for q in range(quantity):
+            out.append((f"{label}_Q{q + 1}" if quantity > 1 else label, points))
+    if not out:
+        raise ValueError("polygons must be a non-empty array")
+    return out
+
+
+def _check_limits(outlines, H: float, L: Optional[float], steps: int, res: float, gap: float) -> None:
+    """Reject jobs whose raster work would tie up a worker (ValueError); prepare_polygons caps the count."""
+    rows = H / res
+    if rows > MAX_CELLS_ACROSS:
+        raise ValueError(
+            f"fabricHeight / resolution gives {int(rows)} grid cells across; the limit is {MAX_CELLS_ACROSS}"
+        )
+    # Grid length scanned: the roll, plus every outline laid end to end (any rotation)
+    along = sum(float(np.hypot(*np.ptp(pts, axis=0))) + gap for _, pts in outlines) / res
+    if L:
+        along += L / res
+    work = len(outlines) * steps * rows * along
+    if work > MAX_RASTER_WORK:
+        raise ValueError(
+            "Polygon nest too large: reduce the number of polygons, rotationSteps or the resolution"
+        )
+
+
+def nest_polygons(
+    polygons,
+    fabric_height: float,
+    fabric_roll_length: Optional[float] = None,
+    rotation_steps: int = DEFAULT_ROTATION_STEPS,
+    resolution: Optional[float] = None,
+    gap: float = DEFAULT_GAP,
+) -> Dict[str, Any]:
+    """Nest polygon outlines onto fabric of width fabric_height.
+
+    polygons: [{label, points: [[x, y], ...], quantity}] in mm.
+    rotation_steps: allowed rotations, evenly spaced (4 = 0/90/180/270; 1 = none).
+    resolution: grid cell in mm (default: fabric_height / 200, at least 5 mm).
+    gap: minimum clearance kept between outlines, in mm.
+
+    Returns the rectangle-nest shape with polygon placements:
+      {panels: {label: {x, y, bin, rotation, tx, ty, points}}, total_width, required_width,
+       bin_height, rotation, rotation_steps, resolution, gap, utilisation, engine: "polygon"}
+    plus rolls/num_rolls/last_roll_length/fabric_roll_length with a roll length.
+    Raises ValueError if an outline does not fit across the fabric in any rotation, or
+    if the job exceeds the request limits (MAX_ROTATION_STEPS, MAX_POLYGONS,
+    MAX_CELLS_ACROSS, MAX_RASTER_WORK).
+    """
+    H = float(fabric_height)
+    if H <= 0:
+        raise ValueError("fabric_height must be positive")
+    L = float(fabric_roll_length) if fabric_roll_length else None
+    steps = int(rotation_steps or 1)
+    if not 1 <= steps <= MAX_ROTATION_STEPS:
+        raise ValueError(f"rotationSteps must be between 1 and {MAX_ROTATION_STEPS}")
+    res = max(MIN_RESOLUTION, float(resolution) if resolution else H / DEFAULT_CELLS_ACROSS)
+    gap = max(0.0, float(gap or 0.0))
+    gap_cells = int(math.ceil(gap / res))
+    angles = [k * 360.0 / steps for k in range(steps)]
+
+    outlines = prepare_polygons(polygons)
+    _check_limits(outlines, H, L, steps, res, gap)
+    shapes = [_Shape(label, pts, angles, res, gap_cells) for label, pts in outlines]
+    # Biggest first, as the rectangle packers do
+    shapes.sort(key=lambda s: s.area, reverse=True)
+
+    rows = int(math.floor(H / res))
+    cols = int(math.floor(L / res)) if L else None
+    rolls: List[_Roll] = []
+    placements: Dict[str, Dict[str, Any]] = {}
+
+    for shape in shapes:
+        spot = None
+        for bin_idx, roll in enumerate(rolls):
+            fit = roll.best_fit(shape)
+            if fit is not None:
+                spot = (bin_idx, fit)
+                break
+            if not L:
+                break
+        if spot is None:
+            roll = _Roll(rows, cols, gap_cells)
+            fit = roll.best_fit(shape)
+            if fit is None:
+                raise ValueError(f"Polygon '{shape.label}' does not fit on the fabric in any rotation")
+            rolls.append(roll)
+            spot = (len(rolls) - 1, fit)
+
+        bin_idx, (variant, row, col) = spot
+        degrees, rotated, mask, _ = shape.variants[variant]
+        rolls[bin_idx].place(mask, row, col)
+        x, y = col * res, row * res
+        corner = rotated.min(axis=0)
+        tx, ty = x - float(corner[0]), y - float(corner[1])
+        placed = rotated + (tx, ty)
+        placements[shape.label] = {
+            "x": round(x, 3),
+            "y": round(y, 3),
+            "bin": bin_idx,
+            "rotation": degrees,
+            "tx": round(tx, 3),
+            "ty": round(ty, 3),
+            "points": [[round(float(px), 3), round(float(py), 3)] for px, py in placed],
+            "_max_x": float(placed[:, 0].max()),
+        }
+
+    roll_widths = [0.0] * len(rolls)
+    for p in placements.values():
+        roll_widths[p["bin"]] = max(roll_widths[p["bin"]], p.pop("_max_x"))
+    roll_widths = [int(math.ceil(w)) for w in roll_widths]
+    total_width = sum(roll_widths)
+    area = sum(s.area for s in shapes)
+
+    result: Dict[str, Any] = {
+        "panels": placements,
+        "total_width": total_width,
+        "required_width": int(L) if L else total_width,
+        "bin_height": int(round(H)),
+        "rotation": steps > 1,
+        "rotation_steps": steps,
+        "resolution": round(res, 3),
+        "gap": gap,
+        "utilisation": round(area / (total_width * H), 4) if total_width else 0.0,
+        "engine": "polygon",
+    }
+    if L:
+        result.update({
+            "fabric_roll_length": int(L),
+            "num_rolls": len(rolls),
+            "last_roll_length": roll_widths[-1] if rolls else 0,
+            "rolls": [
+                {
+                    "roll_number": i + 1,
+                    "width": width,
+                    "max_width": int(L),
+                    "height": int(round(H)),
+                    "panels": {label: p for label, p in placements.items() if p["bin"] == i},
+                    "is_last": i == len(rolls) - 1,
+                }
+                for i, width in enumerate(roll_widths)
+            ],
+        })
+    else:
+        for p in placements.values():
+            p.pop("bin")
+    return result
+
+
+# ---------- DXF ----------
+def nest_entities(result: Dict[str, Any], roll_gap: float = 500.0, layer: str = "AD_PEN") -> List[Dict[str, Any]]:
+    """Entity dicts ({"type": "line"|"mtext", ...}, as SHADE_SAIL generators emit) for a polygon nest.
+
+    Rolls are drawn as outlined bins stacked downwards, roll_gap apart, with each
+    placed outline and its label inside.
+    """
+    H = float(result.get("bin_height") or 0)
+    rolls = result.get("rolls") or [{
+        "roll_number": 1,
+        "width": result.get("total_width") or 0,
+        "panels": result.get("panels") or {},
+    }]
+    entities: List[Dict[str, Any]] = []
+    for i, roll in enumerate(rolls):
+        dy = -i * (H + roll_gap)
+        width = float(roll.get("width") or 0)
+        corners = [(0.0, dy), (width, dy), (width, dy + H), (0.0, dy + H)]
+        for a, b in zip(corners, corners[1:] + corners[:1]):
+            entities.append({"type": "line", "start": (a[0], a[1], 0.0), "end": (b[0], b[1], 0.0), "dxfattribs": {"layer": "BORDER"}})
+        entities.append({
+            "type": "mtext",
+            "text": f"Roll {roll.get('roll_number', i + 1)}: {int(width)}mm",
+            "dxfattribs": {"layer": "AD_INFO", "char_height": 150},
+            "location": (0.0, dy + H + 300.0, 0.0),
+        })
+        for label, p in (roll.get("panels") or {}).items():
+            pts = [(float(x), float(y) + dy) for x, y in p.get("points") or []]
+            for a, b in zip(pts, pts[1:] + pts[:1]):
+                entities.append({"type": "line", "start": (a[0], a[1], 0.0), "end": (b[0], b[1], 0.0), "dxfattribs": {"layer": layer}})
+            if pts:
+                cx = sum(x for x, _ in pts) / len(pts)
+                cy = sum(y for _, y in pts) / len(pts)
+                entities.append({
+                    "type": "mtext",
+                    "text": str(label),
+                    "dxfattribs": {"layer": "AD_INFO", "char_height": 120},
+                    "location": (cx, cy, 0.0),
+                    "attachment_point": 5,
+                })
+    return entities
+
+
+__all__ = ["nest_polygons", "nest_entities", "prepare_polygons"]
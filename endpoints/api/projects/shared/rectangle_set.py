@@ -0,0 +1,150 @@
+"""Compact rectangle container for the nesting pipeline.
+
+Widths and heights live in NumPy int arrays, labels in a list, and a
+label -> index dict gives O(1) lookups when mapping packer output back to the
+source panels. Iterating yields (width, height, label) tuples, so packers and
+helpers written against the old tuple lists keep working unchanged.
+"""
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple, Union
+
+import numpy as np
+
+Rect = Tuple[int, int, str]
+
+
+class RectangleSet:
+    __slots__ = ("widths", "heights", "labels", "_index")
+
+    def __init__(self, widths: Iterable[int] = (), heights: Iterable[int] = (), labels: Iterable[str] = ()):
+        self.widths = np.asarray(list(widths), dtype=np.int64)
+        self.heights = np.asarray(list(heights), dtype=np.int64)
+        self.labels: List[str] = [str(lbl) for lbl in labels]
+        if not (len(self.widths) == len(self.heights) == len(self.labels)):
+            raise ValueError("widths, heights and labels must have the same length")
+        # First occurrence wins, matching the old next(r for r in ... if r[2] == rid) lookups
+        self._index: Dict[str, int] = {}
+        for i, lbl in enumerate(self.labels):
+            self._index.setdefault(lbl, i)
+
+    @classmethod
+    def from_tuples(cls, rectangles: Iterable[Rect]) -> "RectangleSet":
+        widths, heights, labels = [], [], []
+        for w, h, lbl in rectangles:
+            widths.append(w)
+            heights.append(h)
+            labels.append(lbl)
+        return cls(widths, heights, labels)
+
+    # ---------- Sequence protocol (tuple view) ----------
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def __iter__(self) -> Iterator[Rect]:
+        return zip(self.widths.tolist(), self.heights.tolist(), self.labels)
+
+    def __getitem__(self, i: int) -> Rect:
+        return int(self.widths[i]), int(self.heights[i]), self.labels[i]
+
+    def __getstate__(self):
+        return self.widths, self.heights, self.labels
+
+    def __setstate__(self, state):
+        self.widths, self.heights, self.labels = state
+        self._index = {}
+        for i, lbl in enumerate(self.labels):
+            self._index.setdefault(lbl, i)
+
+    def to_tuples(self) -> List[Rect]:
+        return list(self)
+
+    # ---------- Lookups ----------
+    def __contains__(self, label: str) -> bool:
+        return label in self._index
+
+    def index_of(self, label: str) -> int:
+        return self._index[label]
+
+    def dims(self, label: str) -> Tuple[int, int]:
+        i = self._index[label]
+        return int(self.widths[i]), int(self.heights[i])
+
+    def is_rotated(self, label: str, placed_w: int, placed_h: int) -> bool:
+        """True if a placement of placed_w x placed_h differs from the source orientation."""
+        w, h = self.dims(label)
+        return placed_w != w or placed_h != h
+
+    # ---------- Vectorised views ----------
+    @property
+    def areas(self) -> np.ndarray:
+        return self.widths * self.heights
+
+    @property
+    def long_sides(self) -> np.ndarray:
+        return np.maximum(self.widths, self.heights)
+
+    @property
+    def short_sides(self) -> np.ndarray:
+        return np.minimum(self.widths, self.heights)
+
+    def total_area(self) -> int:
+        return int(self.areas.sum()) if len(self) else 0
+
+    # ---------- Derived sets ----------
+    def take(self, indices: Union[Sequence[int], np.ndarray]) -> "RectangleSet":
+        idx = np.asarray(indices, dtype=np.int64)
+        return RectangleSet(self.widths[idx], self.heights[idx], [self.labels[i] for i in idx.tolist()])
+
+    def concat(self, other: "RectangleSet") -> "RectangleSet":
+        return RectangleSet(
+            np.concatenate([self.widths, other.widths]),
+            np.concatenate([self.heights, other.heights]),
+            self.labels + other.labels,
+        )
+
+    def order_by_long_side(self) -> np.ndarray:
+        """Indices sorted by longer side, descending (stable, like list.sort(reverse=True))."""
+        # Negate for descending while keeping equal keys in input order
+        return np.argsort(-self.long_sides, kind="stable")
+
+
+def as_rectangle_set(rectangles: Union["RectangleSet", Iterable[Rect]]) -> RectangleSet:
+    """Accept a RectangleSet or any iterable of (w, h, label) tuples."""
+    if isinstance(rectangles, RectangleSet):
+        return rectangles
+    return RectangleSet.from_tuples(rectangles)
+
+
+def group_small_panels(rects: RectangleSet, small_side_max: int, group_row_max: int) -> RectangleSet:
+    """Greedy horizontal grouping of small panels into rows.
+
+    Panels are ordered by longer side (descending). Those with both sides below
+    small_side_max are laid end to end into rows no wider than group_row_max;
+    each row becomes one rectangle labelled group_<n>. Larger panels follow,
+    unchanged. A small panel wider than group_row_max gets a row of its own.
+    """
+    ordered = rects.take(rects.order_by_long_side())
+    small_mask = (ordered.widths < small_side_max) & (ordered.heights < small_side_max)
+    small = np.flatnonzero(small_mask)
+    large = np.flatnonzero(~small_mask)
+
+    widths = ordered.widths[small].tolist()
+    heights = ordered.heights[small].tolist()
+    row_ws: List[int] = []
+    row_hs: List[int] = []
+    i = 0
+    while i < len(widths):
+        row_w = widths[i]
+        row_h = heights[i]
+        i += 1
+        while i < len(widths) and row_w + widths[i] <= group_row_max:
+            row_w += widths[i]
+            row_h = max(row_h, heights[i])
+            i += 1
+        row_ws.append(row_w)
+        row_hs.append(row_h)
+
+    grouped = RectangleSet(row_ws, row_hs, [f"group_{n}" for n in range(len(row_ws))])
+    return grouped.concat(ordered.take(large))
+
+
+__all__ = ["RectangleSet", "as_rectangle_set", "group_small_panels"]
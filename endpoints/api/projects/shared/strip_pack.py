@@ -0,0 +1,227 @@
+"""MaxRects strip packing for fixed-height, open-ended fabric strips.
+
+The strip has a fixed height (the fabric width, y axis) and unlimited length
+(x axis). Free space is kept as a list of maximal free rectangles; the first
+one starts at x=0 and runs to the end of the strip. Each panel is dropped at
+the position that keeps its right edge as close to x=0 as possible, so the
+used length falls out of one pass instead of a search over bin widths.
+"""
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+Rect = Tuple[int, int, str]
+FreeRect = Tuple[int, int, int, int]  # (x, y, w, h)
+
+# Orderings tried by default; each is a single packing pass.
+DEFAULT_SORT_KEYS = ("area", "long_side", "height")
+
+_SORT_FUNCS = {
+    "area": lambda r: r[0] * r[1],
+    "long_side": lambda r: (max(r[0], r[1]), min(r[0], r[1])),
+    "height": lambda r: (r[1], r[0]),
+    "width": lambda r: (r[0], r[1]),
+    "perimeter": lambda r: r[0] + r[1],
+}
+
+
+def sort_rectangles(rectangles: Sequence[Rect], key: str) -> List[Rect]:
+    """Return rectangles sorted descending by one of the named orderings."""
+    func = _SORT_FUNCS.get(key)
+    if func is None:
+        raise ValueError(f"Unknown sort key '{key}'")
+    return sorted(rectangles, key=func, reverse=True)
+
+
+def _contains(a: FreeRect, b: FreeRect) -> bool:
+    """True if free rect a fully contains b."""
+    return (b[0] >= a[0] and b[1] >= a[1]
+            and b[0] + b[2] <= a[0] + a[2] and b[1] + b[3] <= a[1] + a[3])
+
+
+class StripPacker:
+    """MaxRects free-space list over a strip of fixed height and open length."""
+
+    def __init__(self, strip_height: int, strip_length: Optional[int] = None):
+        self.strip_height = int(strip_height)
+        # An "open-ended" strip is a very long one; callers may cap it (e.g. a roll).
+        self.strip_length = int(strip_length) if strip_length else 2 ** 62
+        self.free: List[FreeRect] = [(0, 0, self.strip_length, self.strip_height)]
+        self.used_width = 0
+
+    def find_position(self, w: int, h: int) -> Optional[Tuple[int, int]]:
+        """Bottom-left position (smallest right edge, then lowest y) or None."""
+        best = None
+        for fx, fy, fw, fh in self.free:
+            if w <= fw and h <= fh:
+                score = (fx + w, fy)
+                if best is None or score < best:
+                    best = score
+        if best is None:
+            return None
+        return best[0] - w, best[1]
+
+    def place(self, x: int, y: int, w: int, h: int) -> None:
+        """Mark [x, x + w) x [y, y + h) as used and re-split the free list."""
+        kept: List[FreeRect] = []
+        created: List[FreeRect] = []
+        for f in self.free:
+            fx, fy, fw, fh = f
+            if x >= fx + fw or x + w <= fx or y >= fy + fh or y + h <= fy:
+                kept.append(f)
+                continue
+            if x > fx:
+                created.append((fx, fy, x - fx, fh))
+            if x + w < fx + fw:
+                created.append((x + w, fy, fx + fw - x - w, fh))
+            if y > fy:
+                created.append((fx, fy, fw, y - fy))
+            if y + h < fy + fh:
+                created.append((fx, y + h, fw, fy + fh - y - h))
+
+        # Only the new pieces can be redundant: drop those contained by any other free rect.
+        created = list(dict.fromkeys(created))
+        survivors = [
+            c for i, c in enumerate(created)
+            if not any(_contains(k, c) for k in kept)
+            and not any(j != i and _contains(o, c) for j, o in enumerate(created))
+        ]
+        self.free = kept + survivors
+        self.used_width = max(self.used_width, x + w)
+
+    def insert(self, w: int, h: int, allow_rotation: bool = True) -> Optional[Tuple[int, int, int, int, bool]]:
+        """Place a w x h panel. Returns (x, y, placed_w, placed_h, rotated) or None."""
+        options = [(w, h, False)]
+        if allow_rotation and w != h:
+            options.append((h, w, True))
+
+        best = None
+        for ow, oh, rotated in options:
+            if oh > self.strip_height:
+                continue
+            pos = self.find_position(ow, oh)
+            if pos is None:
+                continue
+            score = (pos[0] + ow, pos[1])
+            if best is None or score < best[0]:
+                best = (score, pos[0], pos[1], ow, oh, rotated)
+
+        if best is None:
+            return None
+        _, x, y, ow, oh, rotated = best
+        self.place(x, y, ow, oh)
+        return x, y, ow, oh, rotated
+
+
+def pack_strip_once(
+    rectangles: Sequence[Rect],
+    strip_height: int,
+    allow_rotation: bool = True,
+) -> Tuple[Dict[str, Dict[str, int | bool]], int]:
+    """Pack rectangles in the given order. Returns (placements, used_width).
+
+    Placements are keyed by label: {"x", "y", "w", "h", "rotated"} where w/h are
+    the placed (possibly rotated) dimensions. Raises ValueError if any rectangle
+    is taller than the strip in every allowed orientation.
+    """
+    packer = StripPacker(strip_height)
+    placements: Dict[str, Dict[str, int | bool]] = {}
+
+    for w, h, label in rectangles:
+        placed = packer.insert(w, h, allow_rotation)
+        if placed is None:
+            raise ValueError("Cannot fit panels in the given height.")
+        x, y, ow, oh, rotated = placed
+        placements[label] = {"x": x, "y": y, "w": ow, "h": oh, "rotated": rotated}
+
+    return placements, packer.used_width
+
+
+def pack_strip(
+    rectangles: Sequence[Rect],
+    strip_height: int,
+    allow_rotation: bool = True,
+    sort_keys: Sequence[str] = DEFAULT_SORT_KEYS,
+    progress=None,
+) -> Tuple[Dict[str, Dict[str, int | bool]], int, str]:
+    """Pack into an open-ended strip, keeping the shortest of a few orderings.
+
+    progress, if given, is called as progress(passes_done, best_used_width)
+    after each ordering. Returns (placements, used_width, sort_key_used).
+    """
+    if strip_height <= 0:
+        raise ValueError("fabric_height must be a positive integer")
+    if not rectangles:
+        return {}, 0, sort_keys[0] if sort_keys else "area"
+
+    best = None
+    for n, key in enumerate(sort_keys, start=1):
+        placements, used = pack_strip_once(sort_rectangles(rectangles, key), strip_height, allow_rotation)
+        if best is None or used < best[1]:
+            best = (placements, used, key)
+        if progress:
+            progress(n, best[1])
+    return best
+
+
+def iter_rolls(
+    rectangles: Sequence[Rect],
+    strip_height: int,
+    roll_length: int,
+    allow_rotation: bool = True,
+    sort_key: str = "area",
+) -> Iterator[Dict[str, Dict[str, int | bool]]]:
+    """Fill one roll at a time and yield each as soon as it is closed.
+
+    The sorted panels are offered to the open roll in order; those that do not
+    fit are carried over to the next roll. This gives exactly the same rolls as
+    first-fit over all open rolls, but only one roll's free list is alive at a
+    time. Yields placements dicts (same format as pack_strip_once). Raises
+    ValueError if a panel does not fit an empty roll.
+    """
+    remaining = sort_rectangles(rectangles, sort_key)
+    # Fail before the first roll is yielded rather than part-way through
+    for w, h, label in remaining:
+        fits = w <= roll_length and h <= strip_height
+        if allow_rotation:
+            fits = fits or (h <= roll_length and w <= strip_height)
+        if not fits:
+            raise ValueError(f"Panel '{label}' does not fit on an empty roll")
+    roll_area = int(roll_length) * int(strip_height)
+
+    while remaining:
+        packer = StripPacker(strip_height, roll_length)
+        placements: Dict[str, Dict[str, int | bool]] = {}
+        carried: List[Rect] = []
+        free_area = roll_area
+
+        for rect in remaining:
+            w, h, label = rect
+            # Cheap reject once the roll is nearly full
+            placed = packer.insert(w, h, allow_rotation) if w * h <= free_area else None
+            if placed is None:
+                carried.append(rect)
+                continue
+            x, y, ow, oh, rotated = placed
+            placements[label] = {"x": x, "y": y, "w": ow, "h": oh, "rotated": rotated}
+            free_area -= ow * oh
+
+        remaining = carried
+        yield placements
+
+
+def pack_rolls(
+    rectangles: Sequence[Rect],
+    strip_height: int,
+    roll_length: int,
+    allow_rotation: bool = True,
+    sort_key: str = "area",
+) -> List[Dict[str, Dict[str, int | bool]]]:
+    """First-fit the rectangles into rolls of fixed length.
+
+    Each panel goes into the first roll that has room, otherwise a new roll is
+    started. Returns one placements dict per roll (same format as
+    pack_strip_once). Raises ValueError if a panel does not fit an empty roll.
+    """
+    return list(iter_rolls(rectangles, strip_height, roll_length, allow_rotation, sort_key))
+
+
+__all__ = ["StripPacker", "pack_strip", "pack_strip_once", "pack_rolls", "iter_rolls", "sort_rectangles", "DEFAULT_SORT_KEYS"]
@@ -12,8 +12,18 @@ Returns a dict: { "totals": { "total": float, "grand_total": float } }
 """
 
 import ast
+import copy
+import hashlib
+import json
+import logging
+import os
 import re
-from typing import Any, Dict, List
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
 
 
 class _MissingValue:
@@ -108,12 +118,8 @@ def _convert_js_expr(expr: str) -> str:
     expr = expr.replace("false", "False")
     return expr
 
-def _eval_python_expr(expr: str, variables: Dict[str, Any]) -> float:
-    """Evaluate a standard Python expression using built-in eval().
-    
-    WARNING: Only use with trusted input (admins).
-    Provides math library and variables context.
-    """
+def _python_context(variables: Dict[str, Any]) -> "_EvalContext":
+    """Names visible to Python-syntax expressions: helpers, variables, then attribute keys."""
     import math
     
     # 1. Flatten variables (handle dot notation slightly differently?)
@@ -124,7 +130,6 @@ def _eval_python_expr(expr: str, variables: Dict[str, Any]) -> float:
     # Let's map flattened keys for convenience if needed, 
     # but the primary context has "attributes" as a dict.
     
-    # Create a safe-ish context
     context = _EvalContext({
         "math": math,
         "abs": abs,
@@ -147,176 +152,183 @@ def _eval_python_expr(expr: str, variables: Dict[str, Any]) -> float:
             if k not in context:
                 context[k] = v
 
-    try:
-        return float(eval(expr, {"__builtins__": {}}, context))
-    except Exception as e:
-        print(f"PYTHON EVAL ERROR: {e} in '{expr}'")
-        return 0.0
+    return context
 
-def _safe_eval_expr(expr: str, variables: Dict[str, Any]) -> float:
-    """Evaluate a simple arithmetic expression safely.
+
+def _eval_python_expr(expr: str, variables: Dict[str, Any], code=None) -> float:
+    """Evaluate a standard Python expression using built-in eval().
     
-    Now supports explicit Python syntax if detected, or legacy JS-ish syntax.
+    WARNING: Only use with trusted input (admins).
+    Provides math library and variables context.
+    `code` is expr already compiled by compile(); evaluated instead of the text.
     """
-    original_expr = expr
-    expr = expr.strip()
-    
-    # Heuristic: If it contains "if " or "else " or looks like a python function call, use Python eval
-    if any(token in expr for token in [" if ", " else ", "math.", ".get(", "max(", "min(", "round(", "abs(", "int(", "float("]):
-         return _eval_python_expr(expr, variables)
+    return _eval_python_in(expr, _python_context(variables), code)
 
-    # Pre-process: remove newlines which break regex/ternary parsing
-    expr = expr.replace('\n', ' ').replace('\r', ' ')
-    
-    # 1. Convert JS syntax
-    expr = _convert_js_expr(expr.strip())
-    
-    # 2. Convert ternaries
-    expr = _convert_ternary(expr)
-    
-    # Verbose logging for debugging "cable" or "Evaluations"
-    verbose = any(x in original_expr for x in ["cable", "=="])
-    if verbose:
-        #print(f"EVAL START: '{original_expr}' -> '{expr}'")
-        pass
 
+def _eval_python_in(expr: str, context: "_EvalContext", code=None) -> float:
     try:
-        node = ast.parse(expr, mode="eval")
-    except SyntaxError as e:
-        if verbose:
-            print(f"EVAL ERROR: SyntaxError: {e}")
+        return float(eval(code if code is not None else expr, {"__builtins__": {}}, context))
+    except Exception as e:
+        # Traces report the error per row (trace_value); otherwise say it once
+        _log_once("PYTHON EVAL ERROR", expr, e)
         return 0.0
 
-    def _eval(n: ast.AST) -> Any:
-        if isinstance(n, ast.Expression):
-            return _eval(n.body)
-        
-        # Binary Operators
-        if isinstance(n, ast.BinOp):
-            left = _eval(n.left)
-            right = _eval(n.right)
-            if isinstance(n.op, ast.Add): return float(left) + float(right)
-            if isinstance(n.op, ast.Sub): return float(left) - float(right)
-            if isinstance(n.op, ast.Mult): return float(left) * float(right)
-            if isinstance(n.op, ast.Div):
-                r = float(right) 
-                return float(left) / r if r != 0 else 0.0
-            raise ValueError("Unsupported operator")
-            
-        # Unary Operators
-        if isinstance(n, ast.UnaryOp):
-            val = float(_eval(n.operand))
-            if isinstance(n.op, ast.UAdd): return +val
-            if isinstance(n.op, ast.USub): return -val
-            if isinstance(n.op, ast.Not): return not val
-            raise ValueError("Unsupported unary operator")
-            
-        # Boolean Logic (and, or)
-        if isinstance(n, ast.BoolOp):
-            values = [_eval(v) for v in n.values]
-            if isinstance(n.op, ast.Or):
-                # Return first truthy, or last
-                for v in values:
-                    if v: return v
-                return values[-1]
-            if isinstance(n.op, ast.And):
-                # Return first falsy, or last
-                for v in values:
-                    if not v: return v
-                return values[-1]
-                
-        # Comparisons (==, !=, >, <, etc)
-        if isinstance(n, ast.Compare):
-            left = _eval(n.left)
-            for op, comparator in zip(n.ops, n.comparators):
-                right = _eval(comparator)
-                
-                # Helper for loose comparison (JS-style behavior)
-                def _loose_eq(a, b):
-                    if a == b: return True
-                    # Try converting strings to floats
-                    try: 
-                        if float(a) == float(b): return True
-                    except (ValueError, TypeError): pass
-                    return False
-
-                res = False
-                if isinstance(op, ast.Eq):
-                    res = _loose_eq(left, right)
-                elif isinstance(op, ast.NotEq):
-                    res = not _loose_eq(left, right)
-                elif isinstance(op, ast.Gt):
-                    res = (float(left) > float(right))
-                elif isinstance(op, ast.Lt):
-                    res = (float(left) < float(right))
-                elif isinstance(op, ast.GtE):
-                    res = (float(left) >= float(right))
-                elif isinstance(op, ast.LtE):
-                    res = (float(left) <= float(right))
-                else:
-                    raise ValueError(f"Unsupported comparison: {type(op)}")
-                
-                if verbose:
-                    print(f"   CMP: {left} {type(op).__name__} {right} -> {res}")
-                
-                if not res: return False
+
+# ---------- Expression error logging ----------
+# A bad expression fails for every item of every estimate; log each one once
+logger = logging.getLogger(__name__)
+
+_LOGGED_ERRORS_MAX = 1024
+_logged_errors: set = set()
+_logged_errors_lock = threading.Lock()
+
+
+def _log_once(kind: str, expr: str, error: Exception) -> None:
+    key = (kind, expr, type(error).__name__)
+    with _logged_errors_lock:
+        if key in _logged_errors:
+            return
+        if len(_logged_errors) >= _LOGGED_ERRORS_MAX:
+            _logged_errors.clear()
+        _logged_errors.add(key)
+    logger.warning("%s: %s in '%s'", kind, error, expr)
+
+
+# ---------- Compiled expressions ----------
+# Python-syntax expressions go to eval(); everything else is JS-ish and is
+# converted, parsed and walked by the restricted interpreter below.
+_PYTHON_TOKENS = [" if ", " else ", "math.", ".get(", "max(", "min(", "round(", "abs(", "int(", "float("]
+
+
+def _loose_eq(a, b):
+    """JS-style loose equality: "2" == 2."""
+    if a == b: return True
+    # Try converting strings to floats
+    try:
+        if float(a) == float(b): return True
+    except (ValueError, TypeError): pass
+    return False
+
+
+def _raiser(message: str):
+    # Unsupported elements only fail when evaluated, so an untaken branch is harmless
+    def _fail(_variables):
+        raise ValueError(message)
+    return _fail
+
+
+def _compile_node(n: ast.AST):
+    """Turn an AST node into a closure fn(variables) -> value (same semantics as the old walker)."""
+    if isinstance(n, ast.Expression):
+        return _compile_node(n.body)
+
+    # Binary Operators
+    if isinstance(n, ast.BinOp):
+        left = _compile_node(n.left)
+        right = _compile_node(n.right)
+        if isinstance(n.op, ast.Add): return lambda v: float(left(v)) + float(right(v))
+        if isinstance(n.op, ast.Sub): return lambda v: float(left(v)) - float(right(v))
+        if isinstance(n.op, ast.Mult): return lambda v: float(left(v)) * float(right(v))
+        if isinstance(n.op, ast.Div):
+            def _div(v):
+                l, r = float(left(v)), float(right(v))
+                return l / r if r != 0 else 0.0
+            return _div
+        return _raiser("Unsupported operator")
+
+    # Unary Operators
+    if isinstance(n, ast.UnaryOp):
+        operand = _compile_node(n.operand)
+        if isinstance(n.op, ast.UAdd): return lambda v: +float(operand(v))
+        if isinstance(n.op, ast.USub): return lambda v: -float(operand(v))
+        if isinstance(n.op, ast.Not): return lambda v: not float(operand(v))
+        return _raiser("Unsupported unary operator")
+
+    # Boolean Logic (and, or): every operand is evaluated, JS-style value is returned
+    if isinstance(n, ast.BoolOp):
+        parts = [_compile_node(p) for p in n.values]
+        is_or = isinstance(n.op, ast.Or)
+
+        def _boolop(v):
+            values = [p(v) for p in parts]
+            for val in values:
+                if bool(val) == is_or: return val
+            return values[-1]
+        return _boolop
+
+    # Comparisons (==, !=, >, <, etc)
+    if isinstance(n, ast.Compare):
+        first = _compile_node(n.left)
+        steps = []
+        for op, comparator in zip(n.ops, n.comparators):
+            if isinstance(op, ast.Eq): fn = _loose_eq
+            elif isinstance(op, ast.NotEq): fn = lambda a, b: not _loose_eq(a, b)
+            elif isinstance(op, ast.Gt): fn = lambda a, b: float(a) > float(b)
+            elif isinstance(op, ast.Lt): fn = lambda a, b: float(a) < float(b)
+            elif isinstance(op, ast.GtE): fn = lambda a, b: float(a) >= float(b)
+            elif isinstance(op, ast.LtE): fn = lambda a, b: float(a) <= float(b)
+            else: fn = None
+            steps.append((type(op).__name__, fn, _compile_node(comparator)))
+
+        def _compare(v):
+            left = first(v)
+            for name, fn, comparator in steps:
+                right = comparator(v)
+                if fn is None:
+                    raise ValueError(f"Unsupported comparison: {name}")
+                if not fn(left, right): return False
                 left = right
             return True
+        return _compare
 
-        if isinstance(n, ast.Name):
-            if n.id in variables:
-                val = variables[n.id]
-                if verbose:
-                    print(f"   VAR: {n.id} -> {val}")
-                return val
-            if verbose:
-                print(f"   VAR: {n.id} -> MISSING (0.0)")
-            return 0.0 
-        
-        if isinstance(n, ast.Attribute):
-            obj = _eval(n.value)
+    if isinstance(n, ast.Name):
+        name = n.id
+
+        return lambda v: v[name] if name in v else 0.0
+
+    if isinstance(n, ast.Attribute):
+        value, attr = _compile_node(n.value), n.attr
+
+        def _attribute(v):
+            obj = value(v)
             if isinstance(obj, dict):
-                 return obj.get(n.attr, 0.0)
-            if hasattr(obj, n.attr):
-                 return getattr(obj, n.attr)
+                return obj.get(attr, 0.0)
+            if hasattr(obj, attr):
+                return getattr(obj, attr)
             return 0.0
+        return _attribute
 
-        if isinstance(n, ast.Constant):
-            # Return exact value (int, float, string, bool)
-            return n.value
-            
-        if isinstance(n, ast.Num):  # py<3.8
-            return n.n
-        if isinstance(n, ast.Str):  # py<3.8
-            return n.s
-            
-        if isinstance(n, ast.IfExp):
-            # Handle ternary
-            cond_val = _eval(n.test)
-            if cond_val:
-                return _eval(n.body)
-            else:
-                return _eval(n.orelse)
-                
-        if isinstance(n, ast.Subscript):
-            # e.g. fittingCounts['Key']
-            val = _eval(n.value)
-            idx = _eval(n.slice) # In py3.9+ slice is the index node
+    if isinstance(n, ast.Constant):
+        # Return exact value (int, float, string, bool)
+        const = n.value
+        return lambda v: const
+
+    if isinstance(n, ast.IfExp):
+        test = _compile_node(n.test)
+        body = _compile_node(n.body)
+        orelse = _compile_node(n.orelse)
+        return lambda v: body(v) if test(v) else orelse(v)
+
+    if isinstance(n, ast.Subscript):
+        # e.g. fittingCounts['Key']
+        value = _compile_node(n.value)
+        index = _compile_node(n.slice)
+
+        def _subscript(v):
+            val = value(v)
+            idx = index(v)
             if isinstance(val, dict):
                 return val.get(idx, 0.0)
             if isinstance(val, (list, tuple)) and isinstance(idx, int):
                 if 0 <= idx < len(val):
                     return val[idx]
             return 0.0
+        return _subscript
 
-        # Attempt to handle Index node for older python if ast.Subscript structure differs?
-        # In modern python ast.Index is deprecated but might appear wrapped in n.slice
-        if isinstance(n, ast.Index):
-             return _eval(n.value)
+    return _raiser(f"Unsupported expression element: {type(n)}")
 
-        raise ValueError(f"Unsupported expression element: {type(n)}")
 
-    result = _eval(node)
+def _as_number(result: Any) -> float:
     try:
         return float(result)
     except (ValueError, TypeError):
@@ -328,6 +340,133 @@ def _safe_eval_expr(expr: str, variables: Dict[str, Any]) -> float:
         return 0.0
 
 
+def _prepare_expr(expr: str) -> Tuple[str, str]:
+    """("py", text) for Python-syntax expressions, else ("js", text converted to Python)."""
+    expr = expr.strip()
+
+    # Heuristic: If it contains "if " or "else " or looks like a python function call, use Python eval
+    if any(token in expr for token in _PYTHON_TOKENS):
+        return "py", expr
+
+    # Pre-process: remove newlines which break regex/ternary parsing
+    expr = expr.replace('\n', ' ').replace('\r', ' ')
+
+    # 1. Convert JS syntax
+    expr = _convert_js_expr(expr.strip())
+
+    # 2. Convert ternaries
+    return "js", _convert_ternary(expr)
+
+
+def _compile_expr(expr: str):
+    """Parse and convert an expression once; returns fn(variables) -> float."""
+    mode, expr = _prepare_expr(expr)
+
+    if mode == "py":
+        try:
+            code = compile(expr, "<estimate>", "eval")
+        except SyntaxError as e:
+            _log_once("EVAL ERROR", expr, e)
+            return lambda _variables: 0.0
+        fn = lambda variables: _eval_python_expr(expr, variables, code)
+        # Batches evaluate it against their own prebuilt contexts (see _batch_values)
+        fn.python = (expr, code)
+        return fn
+
+    try:
+        node = ast.parse(expr, mode="eval")
+    except SyntaxError as e:
+        _log_once("EVAL ERROR", expr, e)
+        return lambda _variables: 0.0
+
+    root = _compile_node(node)
+    return lambda variables: _as_number(root(variables))
+
+
+class CompileCache:
+    """Thread-safe, size-bounded LRU of compiled objects (expression evaluators, schema plans)."""
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max(0, int(max_entries))
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Any, build: Callable[[], Any]):
+        """Return the entry for `key`, calling build() to create it on a miss."""
+        with self._lock:
+            fn = self._entries.get(key)
+            if fn is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return fn
+            self.misses += 1
+        fn = build()
+        if self.max_entries:
+            with self._lock:
+                self._entries[key] = fn
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return fn
+
+    def peek(self, key: Any):
+        """The entry for `key`, or None; never builds."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: Any, value: Any) -> None:
+        if not self.max_entries:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+# Process-wide cache; ESTIMATION_EXPR_CACHE_SIZE=0 compiles on every call
+expression_cache = CompileCache(int(os.getenv("ESTIMATION_EXPR_CACHE_SIZE", "2048")))
+
+
+def compile_expr(expr: str):
+    """Cached evaluator for an expression string: fn(variables) -> float."""
+    return expression_cache.get(expr, lambda: _compile_expr(expr))
+
+
+def _safe_eval_expr(expr: str, variables: Dict[str, Any]) -> float:
+    """Evaluate a simple arithmetic expression safely.
+    
+    Now supports explicit Python syntax if detected, or legacy JS-ish syntax.
+    Expressions are compiled once and reused (see CompileCache).
+    """
+    return compile_expr(expr)(variables)
+
+
 def _evaluate_value(val: Any, attrs: Dict[str, Any]) -> float:
     """Return numeric value from literal or expression string.
     - numbers -> float
@@ -361,238 +500,1000 @@ def _collect_rows(schema_data: Any) -> List[Dict[str, Any]]:
     return []
 
 
-def estimate_price_from_schema(schema_data: Any, attributes: Dict[str, Any], skus = None) -> Dict[str, Any]:
-    print("\n--- ESTIMATING PRICE START ---")
-    total = 0.0
-    input_state = {}
-    
-    # 1. Initialize input state from schema defaults
-    if isinstance(schema_data, dict):
-        for section, rows in schema_data.items():
-            if isinstance(rows, list):
-                for row in rows:
-                    if isinstance(row, dict) and row.get("type") == "input":
-                        key = row.get("key")
-                        default_val = row.get("default", 0)
-                        if key:
-                            input_state[key] = default_val
-    
-    print(f"Initialized Inputs: {input_state}")
+# ---------- Tracing ----------
+# Opt-in explanation of an estimate: callers pass a list as `trace` and get one
+# entry per row appended to it. Nothing here runs unless a trace is requested.
+_TRACE_MAX_ITEMS = 20
 
-    # Create rows list with section tags
-    flattened_rows = []
-    if isinstance(schema_data, dict):
-        for section, rows in schema_data.items():
-            if section == "_constants" or not isinstance(rows, list):
+
+def _trace_json(value: Any) -> Any:
+    """JSON-safe, size-capped copy of a variable's value for a trace."""
+    if isinstance(value, _MissingValue):
+        return None
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, np.number):
+        return value.item()
+    if isinstance(value, dict):
+        if len(value) > _TRACE_MAX_ITEMS:
+            return f"<{len(value)} keys>"
+        return {str(k): _trace_json(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        if len(value) > _TRACE_MAX_ITEMS:
+            return f"<{len(value)} items>"
+        return [_trace_json(v) for v in value]
+    return str(value)
+
+
+def _references(node: ast.AST) -> List[ast.AST]:
+    """Outermost variable references in an expression: names, a.b chains, a['k'], a.get('k', d)."""
+    def _rooted(n):
+        while isinstance(n, (ast.Attribute, ast.Subscript)):
+            n = n.value
+        return isinstance(n, ast.Name)
+
+    def _is_ref(n):
+        if isinstance(n, ast.Call):
+            return (isinstance(n.func, ast.Attribute) and n.func.attr == "get" and _rooted(n.func)
+                    and all(isinstance(a, ast.Constant) for a in n.args))
+        return isinstance(n, (ast.Name, ast.Attribute, ast.Subscript)) and _rooted(n)
+
+    refs = []
+
+    def _visit(n):
+        if _is_ref(n):
+            refs.append(n)
+            return
+        for child in ast.iter_child_nodes(n):
+            # A call's own name (max, math.ceil) is not a variable
+            if isinstance(n, ast.Call) and child is n.func:
                 continue
-            for row in rows:
-                if isinstance(row, dict):
-                    row["_section"] = section 
-                    flattened_rows.append(row)
-    
-    print(f"Flattened Rows Count: {len(flattened_rows)}")
-    
-    section_totals = {}
-    
-    sku_lookup = {}
-    if skus:
-        for code, obj in skus.items():
-            sku_lookup[code] = float(obj.costPrice or 0.0)
-
-    # Context available to expressions
-    eval_context = {
-        **attributes,
-        "inputs": input_state,
-        "skus": sku_lookup,
-        "global": {
-            "contingencyPercent": schema_data.get("_constants", {}).get("contingencyPercent", 3),
-            "marginPercent": schema_data.get("_constants", {}).get("marginPercent", 45),
-        }
-    }
-    
-    print(f"Eval Context Global: {eval_context['global']}")
+            _visit(child)
 
-    # Evaluate rows
-    for row in flattened_rows:
-        rtype = (row.get("type") or "row").lower()
-        section = row.get("_section", "General")
-        
-        if rtype in ("row", "sku"):
-            raw_qty = row.get("quantity", 0)
-            quantity = _evaluate_value(raw_qty, eval_context)
-            unit_cost = 0.0
-            
-            if rtype == "sku":
-                sku_code = row.get("sku")
-                if skus and sku_code in skus:
-                    unit_cost = float(skus[sku_code].costPrice or 0.0)
-                    print(f"DEBUG SKU: Found '{sku_code}' | Cost: {unit_cost} | Qty: {quantity}")
-                else:
-                    print(f"DEBUG SKU: Missing '{sku_code}' in lookup. Keys: {list(skus.keys()) if skus else 'None'}")
-                    unit_cost = 0.0
+    _visit(node)
+    return refs
+
+
+def trace_value(val: Any, variables: Dict[str, Any]) -> Dict[str, Any]:
+    """Explain one quantity/unitCost field: expression, converted form, variables read, value."""
+    entry: Dict[str, Any] = {"expr": val, "value": _evaluate_value(val, variables)}
+    if not isinstance(val, str):
+        return entry
+    try:
+        float(val)
+        return entry
+    except Exception:
+        pass
+
+    mode, text = _prepare_expr(val)
+    entry["mode"] = mode
+    if text != val.strip():
+        entry["python"] = text
+    try:
+        node = ast.parse(text, mode="eval")
+    except SyntaxError as e:
+        entry["error"] = f"SyntaxError: {e}"
+        return entry
+
+    resolved = {}
+    context = _python_context(variables) if mode == "py" else None
+    for ref in _references(node):
+        source = ast.unparse(ref)
+        try:
+            if mode == "py":
+                value = eval(compile(ast.Expression(body=ref), "<trace>", "eval"), {"__builtins__": {}}, context)
             else:
-                raw_cost = row.get("unitCost", 0)
-                unit_cost = _evaluate_value(raw_cost, eval_context)
-                print(f"DEBUG ROW: {section} | Qty: {quantity} (from {raw_qty}) | Unit: {unit_cost} (from {raw_cost})")
-            
-            line_total = quantity * unit_cost
-            total += line_total
-            section_totals[section] = section_totals.get(section, 0.0) + line_total
-            print(f"  -> Line Total: {line_total} | Section '{section}' Total so far: {section_totals[section]}")
-
-    # Update context with section totals for completeness (though unused here)
-    for sname, sval in section_totals.items():
-        eval_context[f"{sname.lower()}Total"] = sval
-        
-    eval_context["baseCost"] = total
+                value = _compile_node(ref)(variables)
+        except Exception as e:
+            value = f"<error: {e}>"
+        resolved[source] = _trace_json(value)
+    entry["variables"] = resolved
 
-    # Apply Markup
-    contingency_pct = eval_context["global"].get("contingencyPercent", 3)
-    margin_pct = eval_context["global"].get("marginPercent", 45)
-    
-    contingency_amt = total * (contingency_pct / 100.0)
-    
-    suggested_price = 0.0
-    if abs(1.0 - margin_pct/100.0) > 0.001:
-        suggested_price = (total + contingency_amt) / (1.0 - margin_pct / 100.0)
+    # The evaluators swallow errors into 0; surface them here
+    try:
+        if mode == "py":
+            eval(compile(text, "<trace>", "eval"), {"__builtins__": {}}, context)
+        else:
+            _compile_node(node)(variables)
+    except Exception as e:
+        entry["error"] = f"{type(e).__name__}: {e}"
+    return entry
+
+
+def _trace_row(row: Dict[str, Any], section: str, index: int, variables: Dict[str, Any],
+               quantity: float, unit_cost: float, section_total: float, sku_found=None) -> Dict[str, Any]:
+    rtype = (row.get("type") or "row").lower()
+    entry = {
+        "section": section,
+        "index": index,
+        "type": rtype,
+        "description": row.get("description"),
+        "quantity": trace_value(row.get("quantity", 0), variables),
+    }
+    if rtype == "sku":
+        entry["unitCost"] = {"sku": row.get("sku"), "found": bool(sku_found), "value": unit_cost}
     else:
-         suggested_price = total + contingency_amt
-    
-    print(f"--- MARKUP CALCULATION ---")
-    print(f"Base Total: {total}")
-    print(f"Contingency %: {contingency_pct} -> Amt: {contingency_amt}")
-    print(f"Margin %: {margin_pct}")
-    print(f"Suggested Price: {suggested_price}")
-    print("--- ESTIMATING PRICE END ---\n")
+        entry["unitCost"] = trace_value(row.get("unitCost", 0), variables)
+    # The values the estimate used (trace_value re-evaluates for the explanation)
+    entry["quantity"]["value"] = quantity
+    entry["unitCost"]["value"] = unit_cost
+    entry["lineTotal"] = quantity * unit_cost
+    entry["sectionTotal"] = section_total
+    return entry
+
 
+def _trace_totals(totals: Dict[str, float], contingency_pct: float, margin_pct: float,
+                  section_totals: Dict[str, float]) -> Dict[str, Any]:
     return {
-        "totals": {
-            "total": total, # Base cost
-            "grand_total": suggested_price, # Final price
-            "contingency_amount": contingency_amt
-        }
+        "sectionTotals": dict(section_totals),
+        "baseTotal": totals["total"],
+        "contingencyPercent": contingency_pct,
+        "contingencyAmount": totals["contingency_amount"],
+        "marginPercent": margin_pct,
+        "grandTotal": totals["grand_total"],
     }
 
 
+def estimate_price_from_schema(schema_data: Any, attributes: Dict[str, Any], skus = None, trace: Optional[List] = None) -> Dict[str, Any]:
+    """Price one item: { "totals": { total, grand_total, contingency_amount } }.
+
+    Same engine and numbers as evaluate_schema_structure(), without the rows.
+    trace: optional list; one entry per priced row (see _trace_row) and a final
+    {"totals": ...} entry are appended to it.
+    """
+    return {"totals": get_schema_plan(schema_data).totals(attributes, skus, trace=trace)}
+
+
 from datetime import datetime, timezone
 
-def evaluate_schema_structure(schema_data: Any, attributes: Dict[str, Any], skus = None) -> Dict[str, Any]:
+
+# ---------- Batch evaluation ----------
+# Rows can also be evaluated for many items at once (SchemaPlan.run_batch): each
+# expression becomes NumPy operations over one column of values per name. Only
+# numeric data and arithmetic/comparison/boolean/ternary expressions (plus
+# max/min/abs/round/int/float and dict .get() in Python syntax) are vectorised;
+# anything else raises _NotVectorisable and that row is evaluated item by item.
+_NUMERIC = (int, float, np.number)
+
+
+class _NotVectorisable(Exception):
+    """An expression, or the data it reads, needs the per-item evaluator."""
+
+
+class _Batch:
+    """Per-item evaluation contexts plus a cache of gathered name columns."""
+
+    def __init__(self, contexts: List[Dict[str, Any]]):
+        self.contexts = contexts
+        self.n = len(contexts)
+        self._columns: Dict[Any, Any] = {}
+        self._python_contexts = None
+
+    def python_contexts(self):
+        if self._python_contexts is None:
+            self._python_contexts = [_python_context(ctx) for ctx in self.contexts]
+        return self._python_contexts
+
+    def column(self, key, getter, python: bool = False):
+        """(values, missing mask) of getter(ctx) over every item, cached per key.
+
+        Values must be numeric; undefined names in Python contexts (_MissingValue)
+        read as 0 and are flagged in the mask (None when there are none).
+        """
+        cached = self._columns.get(key)
+        if cached is None:
+            try:
+                values = [getter(ctx) for ctx in (self.python_contexts() if python else self.contexts)]
+                missing = [isinstance(v, _MissingValue) for v in values]
+                if any(missing):
+                    values = [0.0 if m else v for v, m in zip(values, missing)]
+                if not all(isinstance(v, _NUMERIC) for v in values):
+                    raise _NotVectorisable(key)
+                cached = (np.asarray(values, dtype=float), np.array(missing) if any(missing) else None)
+            except _NotVectorisable as e:
+                cached = e
+            self._columns[key] = cached
+        if isinstance(cached, _NotVectorisable):
+            raise cached
+        return cached
+
+    def set(self, name: str, values: np.ndarray) -> None:
+        """Publish a per-item value (section totals) to later rows."""
+        for ctx, v in zip(self.contexts, values.tolist()):
+            ctx[name] = v
+        if self._python_contexts is not None:
+            for ctx, v in zip(self._python_contexts, values.tolist()):
+                ctx[name] = v
+        # Keys are names, ("py", name, ...) tuples or ast dumps that mention the name
+        self._columns = {k: v for k, v in self._columns.items() if name not in k}
+
+
+def _either(*masks):
+    """OR of masks, skipping None (all False)."""
+    out = None
+    for m in masks:
+        if m is not None:
+            out = m if out is None else (out | m)
+    return out
+
+
+def _select(cond, when_true, when_false):
+    """np.where over masks that may be None (all False)."""
+    if when_true is None and when_false is None:
+        return None
+    return np.where(cond, False if when_true is None else when_true, False if when_false is None else when_false)
+
+
+def _gathered(column):
+    values, missing = column
+    return values, None, missing
+
+
+_COLUMN_BINOPS = {ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply}
+_COLUMN_COMPARE = {
+    ast.Eq: np.equal, ast.NotEq: np.not_equal,
+    ast.Gt: np.greater, ast.Lt: np.less, ast.GtE: np.greater_equal, ast.LtE: np.less_equal,
+}
+_COLUMN_CALLS = {"abs": np.abs, "round": np.round, "int": np.trunc, "float": lambda v: v}
+
+
+def _compile_column(n: ast.AST, mode: str):
+    """Vector form of an expression node: fn(batch) -> (values, error mask, missing mask).
+
+    mode "js" follows the restricted interpreter (_compile_node): missing names
+    are 0 and x / 0 is 0. mode "py" follows eval(): a name that is not defined
+    is a falsy placeholder (the missing mask, value 0) that fails in arithmetic,
+    and any failure (or x / 0) makes that item's whole expression 0, which the
+    error mask records. Masks are None when no item is affected.
     """
-    Evaluates schema but returns the structure with resolved quantities and unitCosts 
-    instead of just the total price.
-    Returns: { "sections": { "SectionName": [rows...] }, "_constants": {...}, "meta": {...} }
+    if isinstance(n, ast.Expression):
+        return _compile_column(n.body, mode)
+
+    if isinstance(n, ast.Constant):
+        if not isinstance(n.value, (int, float)):
+            raise _NotVectorisable("constant")
+        const = float(n.value)
+        return lambda b: (np.full(b.n, const), None, None)
+
+    if isinstance(n, ast.Name):
+        name = n.id
+        if mode == "js":
+            return lambda b: _gathered(b.column(name, lambda ctx: ctx[name] if name in ctx else 0.0))
+        return lambda b: _gathered(b.column(("py", name), lambda ctx: ctx[name], python=True))
+
+    if isinstance(n, ast.BinOp):
+        left = _compile_column(n.left, mode)
+        right = _compile_column(n.right, mode)
+        op = _COLUMN_BINOPS.get(type(n.op))
+        if op is None and not isinstance(n.op, ast.Div):
+            raise _NotVectorisable("operator")
+
+        def _binop(b):
+            l, le, lm = left(b)
+            r, re_, rm = right(b)
+            if op is not None:
+                return op(l, r), _either(le, re_, lm, rm), None
+            zero = r == 0
+            out = np.divide(l, r, out=np.zeros(b.n), where=~zero)
+            return out, _either(le, re_, lm, rm, zero if mode == "py" else None), None
+        return _binop
+
+    if isinstance(n, ast.UnaryOp):
+        operand = _compile_column(n.operand, mode)
+        if isinstance(n.op, ast.Not):
+            # not <undefined> is True, like not 0
+            return lambda b: (lambda v, e, m: (v == 0, e, None))(*operand(b))
+        if isinstance(n.op, (ast.USub, ast.UAdd)):
+            sign = -1.0 if isinstance(n.op, ast.USub) else 1.0
+            return lambda b: (lambda v, e, m: (sign * v, _either(e, m), None))(*operand(b))
+        raise _NotVectorisable("unary operator")
+
+    if isinstance(n, ast.BoolOp):
+        parts = [_compile_column(p, mode) for p in n.values]
+        is_or = isinstance(n.op, ast.Or)
+
+        def _boolop(b):
+            evaluated = [p(b) for p in parts]
+            vals, err, missing = evaluated[-1]
+            for v, e, m in reversed(evaluated[:-1]):
+                # JS-style value: the first truthy (or) / falsy (and) operand, else the last
+                take = (v != 0) if is_or else (v == 0)
+                vals = np.where(take, v, vals)
+                err = _either(e, None if err is None else (err & ~take))
+                missing = _select(take, m, missing)
+            return vals, err, missing
+        return _boolop
+
+    if isinstance(n, ast.Compare):
+        first = _compile_column(n.left, mode)
+        steps = []
+        for op, comparator in zip(n.ops, n.comparators):
+            fn = _COLUMN_COMPARE.get(type(op))
+            if fn is None:
+                raise _NotVectorisable("comparison")
+            steps.append((type(op), fn, _compile_column(comparator, mode)))
+
+        def _compare(b):
+            left, err, left_missing = first(b)
+            result = np.ones(b.n, dtype=bool)
+            for op, fn, comparator in steps:
+                right, e, right_missing = comparator(b)
+                # A chain stops at its first False, so later operands only matter while True
+                err = _either(err, None if e is None else (e & result))
+                res = fn(left, right)
+                undefined = _either(left_missing, right_missing)
+                if undefined is not None:
+                    if op in (ast.Eq, ast.NotEq):
+                        # An undefined name equals nothing
+                        res = np.where(undefined, op is ast.NotEq, res)
+                    else:
+                        err = _either(err, undefined & result)
+                result = result & res
+                left, left_missing = right, right_missing
+            return result, err, None
+        return _compare
+
+    if isinstance(n, ast.IfExp):
+        test = _compile_column(n.test, mode)
+        body = _compile_column(n.body, mode)
+        orelse = _compile_column(n.orelse, mode)
+
+        def _ifexp(b):
+            t, te, _ = test(b)
+            cond = t != 0
+            bv, be, bm = body(b)
+            ov, oe, om = orelse(b)
+            return np.where(cond, bv, ov), _either(te, _select(cond, be, oe)), _select(cond, bm, om)
+        return _ifexp
+
+    if mode == "js" and isinstance(n, (ast.Attribute, ast.Subscript)):
+        # inputs.x, skus['CODE'], fittingCounts['Key']: gathered per item, then numeric
+        scalar = _compile_node(n)
+        key = ast.dump(n)
+        return lambda b: _gathered(b.column(key, scalar))
+
+    if mode == "py" and isinstance(n, ast.Call) and not n.keywords:
+        func = n.func
+        if isinstance(func, ast.Name) and func.id in ("max", "min") and len(n.args) >= 2:
+            args = [_compile_column(a, mode) for a in n.args]
+            reduce = np.maximum if func.id == "max" else np.minimum
+
+            def _extreme(b):
+                evaluated = [a(b) for a in args]
+                vals = evaluated[0][0]
+                for v, _, _ in evaluated[1:]:
+                    vals = reduce(vals, v)
+                return vals, _either(*(e for _, e, _ in evaluated), *(m for _, _, m in evaluated)), None
+            return _extreme
+        if isinstance(func, ast.Name) and func.id in _COLUMN_CALLS and len(n.args) == 1:
+            arg = _compile_column(n.args[0], mode)
+            if func.id in ("int", "float"):
+                # int()/float() of an undefined name give 0; int() of inf/nan raises
+                def _convert(b):
+                    v, e, _ = arg(b)
+                    if func.id == "float":
+                        return v, e, None
+                    finite = np.isfinite(v)
+                    return np.where(finite, np.trunc(np.nan_to_num(v)), 0.0), _either(e, ~finite), None
+                return _convert
+            fn = _COLUMN_CALLS[func.id]
+            return lambda b: (lambda v, e, m: (fn(v), _either(e, m), None))(*arg(b))
+        if (isinstance(func, ast.Attribute) and func.attr == "get" and isinstance(func.value, ast.Name)
+                and 1 <= len(n.args) <= 2 and all(isinstance(a, ast.Constant) for a in n.args)):
+            # fittingCounts.get('Key', 0)
+            name = func.value.id
+            args = tuple(a.value for a in n.args)
+
+            def _get(ctx):
+                obj = ctx[name]
+                if not isinstance(obj, (dict, _MissingValue)):
+                    raise _NotVectorisable(name)
+                return obj.get(*args)
+            key = ("py", name, "get", repr(args))
+            return lambda b: _gathered(b.column(key, _get, python=True))
+
+    if mode == "py" and isinstance(n, ast.Subscript) and isinstance(n.value, ast.Name) and isinstance(n.slice, ast.Constant):
+        name, index = n.value.id, n.slice.value
+
+        def _item(ctx):
+            obj = ctx[name]
+            if isinstance(obj, dict) and index in obj:
+                return obj[index]
+            raise _NotVectorisable(name)
+        key = ("py", name, "[]", repr(index))
+        return lambda b: _gathered(b.column(key, _item, python=True))
+
+    raise _NotVectorisable(type(n).__name__)
+
+
+def _value_column(val: Any):
+    """Vector evaluator for a quantity/unitCost field: fn(batch) -> float array.
+
+    Returns None when the field can only be evaluated item by item.
     """
+    if isinstance(val, (int, float)):
+        const = float(val)
+        return lambda b: np.full(b.n, const)
+    if not isinstance(val, str):
+        return lambda b: np.zeros(b.n)
+    try:
+        const = float(val)
+        return lambda b: np.full(b.n, const)
+    except Exception:
+        pass
+    try:
+        mode, text = _prepare_expr(val)
+        fn = _compile_column(ast.parse(text, mode="eval"), mode)
+    except (SyntaxError, ValueError, _NotVectorisable):
+        return None
+
+    def _column(b):
+        vals, err, _ = fn(b)
+        vals = np.asarray(vals, dtype=float)
+        return vals if err is None else np.where(err, 0.0, vals)
+    return _column
+
+
+# ---------- Dependencies ----------
+# Which context keys a row reads, for incremental re-estimation. Keys are
+# top-level names ("width", "skus", "combinedTotal") or one level into a dict
+# ("attributes.width", "skus.CODE"). Over-reporting only costs a re-evaluation.
+def _dependencies(node: ast.AST, python: bool) -> set:
+    deps = set()
+
+    def _root(name, first_key):
+        deps.add(f"{name}.{first_key}" if isinstance(first_key, str) else name)
+        if python:
+            # Bare names fall back to attributes/calculated keys (see _python_context)
+            deps.update((f"attributes.{name}", f"calculated.{name}"))
+
+    def _visit(n):
+        keys, cur = [], n
+        while True:
+            if isinstance(cur, ast.Attribute):
+                keys.append(cur.attr)
+                cur = cur.value
+            elif isinstance(cur, ast.Subscript):
+                if isinstance(cur.slice, ast.Constant):
+                    keys.append(cur.slice.value)
+                else:
+                    keys.append(None)
+                    _visit(cur.slice)
+                cur = cur.value
+            elif isinstance(cur, ast.Call) and isinstance(cur.func, ast.Attribute) and cur.func.attr == "get":
+                args = list(cur.args) + [k.value for k in cur.keywords]
+                if cur.args and isinstance(cur.args[0], ast.Constant):
+                    keys.append(cur.args[0].value)
+                    args = args[1:]
+                else:
+                    keys.append(None)
+                for a in args:
+                    _visit(a)
+                cur = cur.func.value
+            else:
+                break
+        if isinstance(cur, ast.Name):
+            _root(cur.id, keys[-1] if keys else None)
+            return
+        if cur is not n:
+            _visit(cur)
+            return
+        if isinstance(n, ast.Call):
+            # A call's own name (max, math.ceil) is not a variable
+            if isinstance(n.func, ast.Attribute):
+                _visit(n.func.value)
+            elif not isinstance(n.func, ast.Name):
+                _visit(n.func)
+            for a in n.args:
+                _visit(a)
+            for k in n.keywords:
+                _visit(k.value)
+            return
+        for child in ast.iter_child_nodes(n):
+            _visit(child)
+
+    _visit(node)
+    return deps
+
+
+def _value_dependencies(val: Any) -> set:
+    """Context keys a quantity/unitCost field reads (empty for literals)."""
+    if not isinstance(val, str):
+        return set()
+    try:
+        float(val)
+        return set()
+    except Exception:
+        pass
+    mode, text = _prepare_expr(val)
+    try:
+        node = ast.parse(text, mode="eval")
+    except SyntaxError:
+        return set()  # Always evaluates to 0
+    return _dependencies(node, mode == "py")
+
+
+_ABSENT = object()
+_SCALARS = (str, int, float, bool, type(None))
+
+
+def _same(a: Any, b: Any) -> bool:
+    try:
+        return type(a) is type(b) and bool(a == b)
+    except Exception:
+        return False
+
+
+def changed_keys(before: Dict[str, Any], after: Dict[str, Any]) -> set:
+    """Dependency keys that differ between two estimate contexts.
+
+    A changed dict value also reports its changed inner keys ("attributes.width");
+    any other changed value reports "key.*" so every "key.<inner>" matches.
+    """
+    changed = set()
+    for key in before.keys() | after.keys():
+        a, b = before.get(key, _ABSENT), after.get(key, _ABSENT)
+        if _same(a, b):
+            continue
+        changed.add(key)
+        if isinstance(a, dict) and isinstance(b, dict):
+            changed.update(f"{key}.{k}" for k in a.keys() | b.keys()
+                           if not _same(a.get(k, _ABSENT), b.get(k, _ABSENT)))
+        else:
+            changed.add(f"{key}.*")
+    return changed
+
+
+# ---------- Execution plans ----------
+class _PlanRow(NamedTuple):
+    kind: str                                   # lowercased row type
+    template: MappingProxyType                  # the schema row, copied into each result
+    quantity: Callable[[Dict[str, Any]], float]
+    unit_cost: Callable[[Dict[str, Any]], float]
+    sku: Any
+    quantity_column: Optional[Callable[[_Batch], np.ndarray]]   # None: per item only
+    unit_cost_column: Optional[Callable[[_Batch], np.ndarray]]
+    depends: frozenset                          # context keys read (see _dependencies)
+
+
+class EstimateState(NamedTuple):
+    """One item's last evaluation, for SchemaPlan.run_incremental()."""
+    plan: "SchemaPlan"
+    attributes: Dict[str, Any]      # deep copy of the context it was evaluated with
+    costs: Dict[str, float]
+    names: Dict[str, str]
+    section_totals: Dict[str, float]
+    result: Dict[str, Any]
+
+
+def _value_evaluator(val: Any) -> Callable[[Dict[str, Any]], float]:
+    """Compile a quantity/unitCost field once; same results as _evaluate_value()."""
+    if isinstance(val, (int, float)):
+        const = float(val)
+        return lambda _ctx: const
+    if not isinstance(val, str):
+        return lambda _ctx: 0.0
+    try:
+        const = float(val)
+        return lambda _ctx: const
+    except Exception:
+        pass
+    try:
+        fn = compile_expr(val)
+    except Exception:
+        return lambda _ctx: 0.0
+
+    def _expr(ctx):
+        try:
+            return fn(ctx)
+        except Exception:
+            # If expression evaluation fails, return 0 to avoid breaking the entire calculation
+            return 0.0
+    _expr.python = getattr(fn, "python", None)
+    return _expr
+
+
+class SchemaPlan:
+    """Immutable execution plan for one estimating schema (see compile_schema).
+
+    Holds everything evaluate_schema_structure used to rebuild per item: the
+    section layout with compiled row evaluators, input defaults, referenced SKU
+    codes and the markup constants. run() evaluates one item against it.
+    """
+
+    def __init__(self, sections, input_defaults, sku_codes, constants, constants_out):
+        self.sections: Tuple[Tuple[str, Tuple[_PlanRow, ...]], ...] = sections
+        self.input_defaults = MappingProxyType(input_defaults)
+        self.sku_codes = frozenset(sku_codes)
+        self.constants = MappingProxyType(constants)
+        self.contingency_percent = constants.get("contingencyPercent", 3)
+        self.margin_percent = constants.get("marginPercent", 45)
+        self._constants_out = constants_out
+        # dependency key -> [(section index, row index)]; by root for "key.*" changes
+        self._dependents: Dict[str, List[Tuple[int, int]]] = {}
+        self._dependents_by_root: Dict[str, List[Tuple[int, int]]] = {}
+        for si, (_, rows) in enumerate(sections):
+            for ri, row in enumerate(rows):
+                for dep in row.depends:
+                    self._dependents.setdefault(dep, []).append((si, ri))
+                    self._dependents_by_root.setdefault(dep.split(".", 1)[0], []).append((si, ri))
+
+    @staticmethod
+    def sku_prices(skus) -> Tuple[Dict[str, float], Dict[str, str]]:
+        """({code: cost}, {code: description}) from {code: SKU}; build once per estimate."""
+        costs, names = {}, {}
+        for code, obj in (skus or {}).items():
+            costs[code] = float(obj.costPrice or 0.0)
+            names[code] = obj.name or code
+        return costs, names
+
+    def _evaluate(self, attributes: Dict[str, Any], prices, build_rows: bool, trace: Optional[List] = None):
+        costs, names = prices
+        eval_context = self._context(attributes, costs)
+        evaluated_sections = {}
+        section_totals = {}
+        for section_name, rows in self.sections:
+            evaluated_rows = []
+            current_section_total = 0.0
+            for index, row in enumerate(rows):
+                new_row = dict(row.template) if build_rows else None
+                if row.kind in ("row", "sku"):
+                    quantity = row.quantity(eval_context)
+                    if row.kind == "sku":
+                        unit_cost = costs.get(row.sku, 0.0)
+                        if build_rows and row.sku in names:
+                            new_row["description"] = names[row.sku]
+                    else:
+                        unit_cost = row.unit_cost(eval_context)
+                    if build_rows:
+                        new_row["quantity"] = quantity
+                        new_row["unitCost"] = unit_cost
+                    current_section_total += quantity * unit_cost
+                    if trace is not None:
+                        trace.append(_trace_row(row.template, section_name, index, eval_context, quantity, unit_cost,
+                                                current_section_total, row.sku in costs if row.kind == "sku" else None))
+                if build_rows:
+                    evaluated_rows.append(new_row)
+            evaluated_sections[section_name] = evaluated_rows
+            section_totals[section_name] = current_section_total
+            # Add to context for subsequent sections/expressions
+            eval_context[f"{section_name.lower()}Total"] = current_section_total
+        return evaluated_sections, section_totals
+
+    def run(self, attributes: Dict[str, Any], skus=None, prices=None, trace: bool = False) -> Dict[str, Any]:
+        """Evaluate one item in a single pass over the rows.
+
+        Returns {"sections", "_constants", "meta", "totals"}: the evaluated rows
+        (as stored in estimate_schema_evaluated) and, from the same pass,
+        totals {total, grand_total, contingency_amount}.
+        prices: sku_prices(skus), to share across items instead of passing skus.
+        trace: also return "trace": {"rows": [...], "totals": {...}} explaining
+        each priced row (expressions, variables read, values, line total).
+        """
+        rows_trace = [] if trace else None
+        sections, section_totals = self._evaluate(attributes, prices or self.sku_prices(skus), True, rows_trace)
+        result = self._result(sections, section_totals)
+        if trace:
+            result["trace"] = {
+                "rows": rows_trace,
+                "totals": _trace_totals(result["totals"], self.contingency_percent, self.margin_percent, section_totals),
+            }
+        return result
+
+    def _result(self, sections, section_totals) -> Dict[str, Any]:
+        totals = self.markup(sum(section_totals.values()))
+        return {
+            "sections": sections,
+            "_constants": self._constants_out,
+            "meta": {
+                "evaluated_at": datetime.now(timezone.utc).isoformat(),
+                "grand_total": totals["grand_total"],
+            },
+            "totals": totals,
+        }
+
+    def markup(self, total, contingency_percent=None, margin_percent=None):
+        """{total, grand_total, contingency_amount} for a base cost (a float or an array of them).
+
+        contingency_percent/margin_percent override the schema's constants; arrays
+        give one value per item (see run_batch).
+        """
+        if contingency_percent is None:
+            contingency_percent = self.contingency_percent
+        if margin_percent is None:
+            margin_percent = self.margin_percent
+        contingency_amt = total * (contingency_percent / 100.0)
+        # Margin formula: Cost / (1 - Margin%)
+        if isinstance(margin_percent, np.ndarray):
+            divisor = 1.0 - margin_percent / 100.0
+            usable = np.abs(divisor) > 0.001
+            suggested_price = (total + contingency_amt) / np.where(usable, divisor, 1.0)
+        elif abs(1.0 - margin_percent/100.0) > 0.001:
+            suggested_price = (total + contingency_amt) / (1.0 - margin_percent / 100.0)
+        else:
+            suggested_price = total + contingency_amt
+        return {
+            "total": total,  # Base cost
+            "grand_total": suggested_price,  # Final price
+            "contingency_amount": contingency_amt,
+        }
+
+    def run_incremental(self, attributes: Dict[str, Any], previous: Optional[EstimateState] = None,
+                        skus=None, prices=None) -> Tuple[Dict[str, Any], EstimateState]:
+        """run(), re-evaluating only the rows that read something that changed.
+
+        previous: the state this returned for the same item last time (a state
+        from another plan, or None, evaluates everything). Rows whose
+        dependencies are unchanged keep their previous values; a section total
+        that moves re-evaluates the later rows reading it. Returns (result, state)
+        where result is what run() would give.
+        """
+        costs, names = prices or self.sku_prices(skus)
+        # Copied deeply enough that in-place edits to the caller's dicts still show as changes
+        snapshot = {k: v if isinstance(v, _SCALARS) else copy.deepcopy(v) for k, v in attributes.items()}
+        if previous is None or previous.plan is not self:
+            sections, section_totals = self._evaluate(attributes, (costs, names), True)
+            result = self._result(sections, section_totals)
+            return result, EstimateState(self, snapshot, dict(costs), dict(names), section_totals, result)
+
+        changed = changed_keys(previous.attributes, attributes)
+        for code in costs.keys() | previous.costs.keys():
+            if (costs.get(code) != previous.costs.get(code)) or (names.get(code) != previous.names.get(code)):
+                changed.update(("skus", f"skus.{code}"))
+        dirty: Dict[int, set] = {}
+        self._mark_dependents(changed, dirty)
+
+        eval_context = self._context(attributes, costs)
+        previous_sections = previous.result["sections"]
+        sections, section_totals = {}, {}
+        for si, (section_name, rows) in enumerate(self.sections):
+            section_rows = previous_sections[section_name]
+            current_section_total = previous.section_totals[section_name]
+            if si in dirty:
+                section_rows = list(section_rows)
+                for ri in sorted(dirty[si]):
+                    row = rows[ri]
+                    if row.kind not in ("row", "sku"):
+                        continue
+                    new_row = dict(row.template)
+                    new_row["quantity"] = row.quantity(eval_context)
+                    if row.kind == "sku":
+                        new_row["unitCost"] = costs.get(row.sku, 0.0)
+                        if row.sku in names:
+                            new_row["description"] = names[row.sku]
+                    else:
+                        new_row["unitCost"] = row.unit_cost(eval_context)
+                    section_rows[ri] = new_row
+                # Same summation order as _evaluate(), so totals match run() exactly
+                current_section_total = 0.0
+                for row, new_row in zip(rows, section_rows):
+                    if row.kind in ("row", "sku"):
+                        current_section_total += new_row["quantity"] * new_row["unitCost"]
+                if current_section_total != previous.section_totals[section_name]:
+                    self._mark_dependents({f"{section_name.lower()}Total"}, dirty, after=si)
+            sections[section_name] = section_rows
+            section_totals[section_name] = current_section_total
+            eval_context[f"{section_name.lower()}Total"] = current_section_total
+
+        result = self._result(sections, section_totals)
+        return result, EstimateState(self, snapshot, dict(costs), dict(names), section_totals, result)
+
+    def _mark_dependents(self, changed, dirty: Dict[int, set], after: int = -1) -> None:
+        """Add rows (in sections after `after`) reading any changed key to dirty {section: {row}}."""
+        for key in changed:
+            if key.endswith(".*"):
+                hits = self._dependents_by_root.get(key[:-2], ())
+            else:
+                hits = self._dependents.get(key, ())
+            for si, ri in hits:
+                if si > after:
+                    dirty.setdefault(si, set()).add(ri)
+
+    def totals(self, attributes: Dict[str, Any], skus=None, prices=None, trace: Optional[List] = None) -> Dict[str, float]:
+        """run()'s totals without building result rows.
+
+        trace: optional list; per-row entries and a final {"totals": ...} are appended.
+        """
+        _, section_totals = self._evaluate(attributes, prices or self.sku_prices(skus), False, trace)
+        totals = self.markup(sum(section_totals.values()))
+        if trace is not None:
+            trace.append({"totals": _trace_totals(totals, self.contingency_percent, self.margin_percent, section_totals)})
+        return totals
+
+    def _context(self, attributes: Dict[str, Any], costs: Dict[str, float]) -> Dict[str, Any]:
+        return {
+            **attributes,
+            "inputs": dict(self.input_defaults),
+            "skus": costs,  # Allow skus['CODE'] in expressions
+            "global": {
+                "contingencyPercent": self.contingency_percent,
+                "marginPercent": self.margin_percent,
+            },
+        }
+
+    def run_batch(self, contexts: List[Dict[str, Any]], skus=None, prices=None,
+                  constants: Optional[Dict[str, np.ndarray]] = None) -> Dict[str, Any]:
+        """Evaluate many items (or what-if variants of one) in one pass over the rows.
+
+        Each row is evaluated for every item at once as NumPy column operations;
+        rows whose expression or data cannot be vectorised (strings, nested
+        values, unsupported calls) fall back to the per-item evaluator, so every
+        item gets exactly what totals() would give it.
+
+        Returns {"rows": [{section, index, type, description}], "quantity" and
+        "unit_cost": (rows x items) arrays, "section_totals": {section: (items,)},
+        "total", "contingency_amount", "grand_total": (items,) arrays}.
+        constants: per-item {"contingencyPercent": (items,), "marginPercent": (items,)}
+        overriding the schema's (either may be omitted); seen by expressions as
+        global.* and used for the markup.
+        """
+        costs, _ = prices or self.sku_prices(skus)
+        n = len(contexts)
+        constants = constants or {}
+        contingency = constants.get("contingencyPercent")
+        margin = constants.get("marginPercent")
+        eval_contexts = [self._context(ctx, costs) for ctx in contexts]
+        if contingency is not None or margin is not None:
+            for i, ctx in enumerate(eval_contexts):
+                ctx["global"] = {
+                    "contingencyPercent": self.contingency_percent if contingency is None else contingency[i].item(),
+                    "marginPercent": self.margin_percent if margin is None else margin[i].item(),
+                }
+        batch = _Batch(eval_contexts)
+
+        rows, quantities, unit_costs = [], [], []
+        section_totals = {}
+        with np.errstate(all="ignore"):
+            for section_name, plan_rows in self.sections:
+                current_section_total = np.zeros(n)
+                for index, row in enumerate(plan_rows):
+                    if row.kind not in ("row", "sku"):
+                        continue
+                    quantity = _batch_values(row.quantity_column, row.quantity, batch)
+                    if row.kind == "sku":
+                        unit_cost = np.full(n, costs.get(row.sku, 0.0))
+                    else:
+                        unit_cost = _batch_values(row.unit_cost_column, row.unit_cost, batch)
+                    rows.append({
+                        "section": section_name,
+                        "index": index,
+                        "type": row.kind,
+                        "description": row.template.get("description"),
+                    })
+                    quantities.append(quantity)
+                    unit_costs.append(unit_cost)
+                    current_section_total += quantity * unit_cost
+                section_totals[section_name] = current_section_total
+                batch.set(f"{section_name.lower()}Total", current_section_total)
+
+        return {
+            "rows": rows,
+            "quantity": np.array(quantities).reshape(len(rows), n),
+            "unit_cost": np.array(unit_costs).reshape(len(rows), n),
+            "section_totals": section_totals,
+            **self.markup(sum(section_totals.values(), np.zeros(n)), contingency, margin),
+        }
+
+
+def _batch_values(column, scalar, batch: _Batch) -> np.ndarray:
+    if column is not None:
+        try:
+            return column(batch)
+        except _NotVectorisable:
+            pass
+    python = getattr(scalar, "python", None)
+    if python is not None:
+        expr, code = python
+        return np.fromiter((_eval_python_in(expr, ctx, code) for ctx in batch.python_contexts()), dtype=float, count=batch.n)
+    return np.fromiter((scalar(ctx) for ctx in batch.contexts), dtype=float, count=batch.n)
+
+
+def compile_schema(schema_data: Any) -> SchemaPlan:
+    """Compile schema data ({section: [rows], "_constants": {...}}) into a SchemaPlan."""
     if not isinstance(schema_data, dict):
-        return {"sections": {}, "_constants": {}, "meta": {}}
+        return SchemaPlan((), {}, (), {}, {})
 
-    input_state = {}
-    
-    # 1. Initialize Inputs
-    for section, rows in schema_data.items():
+    input_defaults = {}
+    sku_codes = set()
+    for rows in schema_data.values():
         if isinstance(rows, list):
             for row in rows:
-                if isinstance(row, dict) and row.get("type") == "input":
-                    key = row.get("key")
-                    default_val = row.get("default", 0)
-                    if key:
-                        input_state[key] = default_val
-
-    # 2. Build Context
-    sku_lookup = {}
-    if skus:
-        # Create a safe lookup dict for expressions: skus['CODE'] -> cost
-        # Or skus['CODE'].cost
-        # Let's map to a simple object or dict
-        for code, obj in skus.items():
-            sku_lookup[code] = float(obj.costPrice or 0.0)
-            
-    eval_context = {
-        **attributes,
-        "inputs": input_state,
-        "skus": sku_lookup, # Allow skus['CODE'] in expressions
-        "global": {
-            "contingencyPercent": schema_data.get("_constants", {}).get("contingencyPercent", 3),
-            "marginPercent": schema_data.get("_constants", {}).get("marginPercent", 45),
-        }
-    }
+                if not isinstance(row, dict):
+                    continue
+                if row.get("type") == "input" and row.get("key"):
+                    input_defaults[row.get("key")] = row.get("default", 0)
+                if row.get("type") == "sku" and row.get("sku"):
+                    sku_codes.add(row.get("sku"))
 
-    # 3. Evaluate Sections
-    evaluated_sections = {}
-    
-    # Calculate section totals first pass? 
-    # Or just evaluate rows independently. The original logic tracked section totals for Expressions.
-    # To support calculate rows referencing section totals, we need a multi-pass or maintain state.
-    # For now, let's do single pass roughly like the original logic, grouped by section.
-    
-    section_totals = {}
-    
-    # Collect sections to iterate
-    sections_to_process = {k: v for k, v in schema_data.items() if k != "_constants" and isinstance(v, list)}
-    
-    for section_name, rows in sections_to_process.items():
-        evaluated_rows = []
-        current_section_total = 0.0
-        
+    sections = []
+    for section_name, rows in schema_data.items():
+        if section_name == "_constants" or not isinstance(rows, list):
+            continue
+        plan_rows = []
         for row in rows:
-            if not isinstance(row, dict): continue
-            
-            new_row = row.copy()
+            if not isinstance(row, dict):
+                continue
             rtype = (row.get("type") or "row").lower()
-            
+            depends = set()
             if rtype in ("row", "sku"):
-                 # Evaluate Quantity
-                 qty_expr = row.get("quantity", 0)
-                 quantity = _evaluate_value(qty_expr, eval_context)
-                 new_row["quantity"] = quantity
-                 
-                 # Evaluate Unit Cost
-                 unit_cost = 0.0
-                 if rtype == "sku":
-                     sku_code = row.get("sku")
-                     if skus and sku_code in skus:
-                         unit_cost = float(skus[sku_code].costPrice or 0.0)
-                         new_row["description"] = skus[sku_code].name or sku_code
-                     else:
-                         unit_cost = 0.0
-                 else:
-                     cost_expr = row.get("unitCost", 0)
-                     unit_cost = _evaluate_value(cost_expr, eval_context)
-                
-                 new_row["unitCost"] = unit_cost
-                 
-                 line_total = quantity * unit_cost
-                 current_section_total += line_total
-            
-            elif rtype == "calc":
-                 # Calc rows usually display a value
-                 expr = row.get("expr")
-                 val = _evaluate_value(expr, eval_context)
-                 # We might want to store the result?
-                 # For now just pass it through, maybe frontend displays it differently
-                 pass
-            
-            elif rtype == "input":
-                 # Ensure default is set in the row if needed, basically pass through
-                 pass
+                depends = _value_dependencies(row.get("quantity", 0))
+                if rtype == "sku":
+                    depends.add(f"skus.{row.get('sku')}")
+                else:
+                    depends |= _value_dependencies(row.get("unitCost", 0))
+            plan_rows.append(_PlanRow(
+                kind=rtype,
+                template=MappingProxyType(row.copy()),
+                quantity=_value_evaluator(row.get("quantity", 0)),
+                unit_cost=_value_evaluator(row.get("unitCost", 0)),
+                sku=row.get("sku"),
+                quantity_column=_value_column(row.get("quantity", 0)),
+                unit_cost_column=_value_column(row.get("unitCost", 0)),
+                depends=frozenset(depends),
+            ))
+        sections.append((section_name, tuple(plan_rows)))
 
-            evaluated_rows.append(new_row)
-        
-        evaluated_sections[section_name] = evaluated_rows
-        section_totals[section_name] = current_section_total
-        # Add to context for subsequent sections/expressions
-        eval_context[f"{section_name.lower()}Total"] = current_section_total
+    constants = schema_data.get("_constants", {})
+    constants_out = schema_data.get("_constants", {
+        "contingencyPercent": 3,
+        "marginPercent": 45
+    })
+    return SchemaPlan(tuple(sections), input_defaults, sku_codes, dict(constants), constants_out)
 
-    return {
-        "sections": evaluated_sections,
-        "_constants": schema_data.get("_constants", {
-            "contingencyPercent": 3, 
-            "marginPercent": 45
-        }),
-        "meta": {
-            "evaluated_at": datetime.now(timezone.utc).isoformat(),
-            "grand_total": (sum(section_totals.values()) * (1 + (schema_data.get("_constants", {}).get("contingencyPercent", 3)/100))) / (1 - (schema_data.get("_constants", {}).get("marginPercent", 45)/100)),
-        }
-    }
+
+# Process-wide plan cache; ESTIMATION_PLAN_CACHE_SIZE=0 compiles on every call
+plan_cache = CompileCache(int(os.getenv("ESTIMATION_PLAN_CACHE_SIZE", "128")))
+
+
+# Last EstimateState per estimated item (see run_incremental); ESTIMATION_STATE_CACHE_SIZE=0 disables
+item_state_cache = CompileCache(int(os.getenv("ESTIMATION_STATE_CACHE_SIZE", "1024")))
+
+
+def schema_cache_key(schema_data: Any, schema_id=None, version=None):
+    """("schema", id, version) for stored EstimatingSchemas, else a content hash of the data."""
+    if schema_id is not None:
+        return ("schema", int(schema_id), int(version or 1))
+    blob = json.dumps(schema_data, sort_keys=True, separators=(",", ":"), default=str)
+    return ("hash", hashlib.sha256(blob.encode("utf-8")).hexdigest())
+
+
+def get_schema_plan(schema_data: Any, schema_id=None, version=None) -> SchemaPlan:
+    """Cached SchemaPlan for schema data.
+
+    Pass schema_id/version for an EstimatingSchema row (edits must bump its
+    version); inline project schemas are keyed by content.
+    """
+    return plan_cache.get(
+        schema_cache_key(schema_data, schema_id, version),
+        lambda: compile_schema(schema_data),
+    )
+
+
+def evaluate_schema_structure(schema_data: Any, attributes: Dict[str, Any], skus = None) -> Dict[str, Any]:
+    """
+    Evaluates schema but returns the structure with resolved quantities and unitCosts 
+    instead of just the total price.
+    Returns: { "sections": { "SectionName": [rows...] }, "_constants": {...}, "meta": {...}, "totals": {...} }
+    """
+    if not isinstance(schema_data, dict):
+        return {"sections": {}, "_constants": {}, "meta": {}}
+    return get_schema_plan(schema_data).run(attributes, skus)
+
+
+def item_context(project_attributes: Optional[Dict[str, Any]], attributes: Optional[Dict[str, Any]] = None,
+                 calculated: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Evaluation context for one project item.
+
+    Project attributes, overlaid by the item's attributes then calculated values,
+    plus each of those dicts by name for explicit access.
+    """
+    eval_context = (project_attributes or {}).copy()
+    eval_context.update(attributes or {})
+    eval_context.update(calculated or {})
+    eval_context["project_attributes"] = project_attributes or {}
+    eval_context["attributes"] = attributes or {}
+    eval_context["calculated"] = calculated or {}
+    return eval_context
 
 
 def flatten_rows(schema_data):
@@ -1,7 +1,8 @@
 import math
 import os
 
-from integrations.workguru.wg_endpoints import add_update_lead, add_update_quote
+from endpoints.api.products.COVER.calculations import nest_partitions
+from integrations.workguru.wg_endpoints import QUOTE_MATERIAL_TEMPLATES, add_update_lead, add_update_quote
 from models import User
 
 
@@ -78,11 +79,16 @@ def cover_quote(project, data, name, description, client_id, lead_id = None):
     print (project.project_attributes)
     print (project.project_attributes.get("nest"))
 
-    total_material = ((project.project_attributes.get("nest").get("num_rolls"))-1) * project.project_attributes.get("nest").get("fabric_roll_length") + project.project_attributes.get("nest").get("last_roll_length")
+    # One nest per fabric, quoted as its own fabric line: every full roll plus the last roll's length
+    fabric_template = QUOTE_MATERIAL_TEMPLATES["DR"]["2-DR-F-225"]
+    for fabric, nest in nest_partitions(project.project_attributes.get("nest")).items():
+        if nest.get("error") or nest.get("num_rolls") is None:
+            raise ValueError(f"Cannot quote fabric {fabric}: nesting failed ({nest.get('error') or 'no roll count'}). Recalculate the project.")
 
-    material_buy = (math.ceil(total_material / 500) * 500) / 1000
+        fabric_mm = (nest["num_rolls"] - 1) * nest["fabric_roll_length"] + nest["last_roll_length"]
+        material_buy = (math.ceil(fabric_mm / 500) * 500) / 1000
 
-    materials.append({"key": "2-DR-F-225","quantity": material_buy})
+        materials.append({"key": "2-DR-F-225", "name": f"{fabric_template['Name']} ({fabric})", "quantity": material_buy})
 
     materials.append({"key": "2-DR-H-001-W","quantity": total_covers * 2})
 
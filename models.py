@@ -116,43 +116,29 @@ class Project(db.Model):
     deleted = db.Column(db.Boolean, default=False, nullable=False)
 
     def get_estimated_price(self):
-        from estimation import estimate_price_from_schema
+        from estimation import get_schema_plan, item_context
+        if not self.estimate_schema:
+            return None
+        plan = get_schema_plan(self.estimate_schema)
         # If we have items, prefer summing their estimates (compute on the fly if missing)
-        if self.products and self.estimate_schema:
+        if self.products:
+            # Use the item-specific attributes when evaluating
+            contexts = [item_context(self.project_attributes, item.attributes, item.calculated) for item in self.products]
+            # All items in one pass over the schema rows
+            batch = plan.run_batch(contexts)
             grand_total = 0.0
-            for item in self.products:
-                # Use the item-specific attributes when evaluating
-                eval_context = (self.project_attributes or {}).copy()
-                eval_context.update(item.attributes or {})
-                eval_context.update(item.calculated or {})
-                eval_context["project_attributes"] = self.project_attributes or {}
-                eval_context["attributes"] = item.attributes or {}
-                eval_context["calculated"] = item.calculated or {}
-                result = estimate_price_from_schema(self.estimate_schema, eval_context) or {}
-                totals = result.get("totals") or {}
-                item_total = (
-                    totals.get("grand_total")
-                    or totals.get("grandTotal")
-                    or totals.get("total")
-                    or 0.0
-                )
+            for item, item_grand, item_base in zip(self.products, batch["grand_total"].tolist(), batch["total"].tolist()):
+                item_total = item_grand or item_base or 0.0
                 item.estimate_total = item_total
                 grand_total += float(item_total or 0.0)
             self.estimate_total = grand_total
             return grand_total
 
         # Fallback: evaluate against project-level attributes
-        if not self.estimate_schema:
-            return None
         eval_context = (self.project_attributes or {}).copy()
         eval_context["project_attributes"] = self.project_attributes or {}
-        results = estimate_price_from_schema(self.estimate_schema, eval_context)
-        totals = results.get("totals") or {}
-        return (
-            totals.get("grand_total")
-            or totals.get("grandTotal")
-            or totals.get("total")
-        )
+        totals = plan.totals(eval_context)
+        return totals.get("grand_total") or totals.get("total")
 
     autodraw_record = db.Column(db.JSON, default=dict)
     autodraw_meta = db.Column(db.JSON, default=lambda: {"current_step": 0, "current_sub_step": 0})
@@ -215,8 +201,9 @@ class SKU(db.Model):
     name = db.Column(db.String(200), nullable=True)
     costPrice = db.Column(db.Float, nullable=True)
     sellPrice = db.Column(db.Float, nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc), nullable=False)
-    updated_at = db.Column(db.DateTime, default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc), nullable=False)
+    # Callables, so each row gets its own timestamp (the SKU price cache versions on updated_at)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc), nullable=False)
 
     def to_dict(self):
         return {
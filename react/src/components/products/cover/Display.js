@@ -295,9 +295,33 @@ function drawSplitPanels(ctx, products, layout) {
   layout.yPos = Math.ceil(offsetY + totalHeight);
 }
 
+// project_attributes.nest holds one nest per fabric ("type@width"); older
+// projects hold a single nest result.
+function nestPartitions(nest) {
+  if (!nest) return [];
+  if (nest.panels || nest.bin_height || nest.error) return [nest];
+  return Object.values(nest).filter((part) => part && typeof part === 'object');
+}
+
 function drawNestLayout(ctx, products, projectAttrs, layout) {
-  const nest = projectAttrs.nest;
-  if (!nest || !nest.bin_height) return;
+  const parts = nestPartitions(projectAttrs.nest);
+  for (const nest of parts) {
+    if (!nest.bin_height) continue;
+    if (parts.length > 1) {
+      ctx.save();
+      ctx.fillStyle = '#111827';
+      ctx.font = `bold 36px sans-serif`;
+      ctx.textAlign = 'left';
+      ctx.textBaseline = 'alphabetic';
+      ctx.fillText(`Fabric: ${nest.fabric_type || 'unspecified'} (${nest.fabric_width || nest.bin_height}mm)`, 30, layout.yPos + 40);
+      ctx.restore();
+      layout.yPos += 60;
+    }
+    drawFabricNest(ctx, products, nest, layout);
+  }
+}
+
+function drawFabricNest(ctx, products, nest, layout) {
 
   const offsetY = layout.yPos;
   const padding = 30;
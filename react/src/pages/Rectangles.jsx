@@ -50,7 +50,8 @@ export default function Rectangles() {
       });
   }, [projectData]);
 
-  const onNest = async () => {
+  // repack=false places only new/changed rectangles into the previous nest
+  const onNest = async (repack = false) => {
     // clear status while processing
     setNestStatus({ text: "", ok: null });
     const all = formRef.current?.getValues?.();
@@ -75,7 +76,12 @@ export default function Rectangles() {
       const payload = {
         product: rectanglesProduct,
         general: {},
-        project_attributes: all.project,
+        project_attributes: {
+          ...all.project,
+          nest: projectData?.project_attributes?.nest,
+          nested_panels: projectData?.project_attributes?.nested_panels,
+          repack,
+        },
         products: []
       };
 
@@ -136,9 +142,14 @@ export default function Rectangles() {
 
                          <div className="flex flex-col gap-2">
                             <div className="flex items-center gap-4">
-                                <Button onClick={onNest} className="w-full justify-center py-3">
+                                <Button onClick={() => onNest()} className="w-full justify-center py-3">
                                     Nest Rectangles
                                 </Button>
+                                {projectData?.project_attributes?.nest?.panels && (
+                                    <Button onClick={() => onNest(true)} className="w-full justify-center py-3">
+                                        Repack All
+                                    </Button>
+                                )}
                             </div>
                             {nestStatus.text && (
                                 <div className={`px-4 py-3 rounded-lg text-sm font-medium border ${nestStatus.ok ? "bg-green-50 border-green-200 text-green-800 dark:bg-green-900/20 dark:border-green-800 dark:text-green-300" : "bg-red-50 border-red-200 text-red-800 dark:bg-red-900/20 dark:border-red-800 dark:text-red-300"}`}>
@@ -70,9 +70,14 @@ def seed_products():
 
         if "schema" in p:
             schema_name = f"{p['name']} default v1"
+            existing = EstimatingSchema.query.filter_by(product_id=product.id, name=schema_name).first()
+            # Estimation caches compiled schemas by (id, version): bump it when the data changes
+            version = 1
+            if existing:
+                version = existing.version if existing.data == p["schema"] else (existing.version or 0) + 1
             schema, _ = _upsert(EstimatingSchema,
                 {"product_id": product.id, "name": schema_name},
-                {"data": p["schema"], "is_default": True, "version": 1},
+                {"data": p["schema"], "is_default": True, "version": version},
             )
             db.session.flush()
             product.default_schema_id = schema.id
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""Estimation benchmark: the seeded product schemas against realistic item contexts.
+
+Workloads use the schemas in setup/data/products.py:
+  cover       COVER price-list formula (Python-style conditional)
+  shade_sail  SHADE_SAIL cables, fittings and trace cables (fittingCounts.get,
+              `x if c else y`, len(); these take the _eval_python_expr path)
+  tarpaulin   TARPAULIN area pricing
+  extended    SHADE_SAIL plus SKU rows, skus['CODE'] unit costs, JS-style
+              ternaries and section totals read by a later section
+
+Each item context is built like estimation_service does (item_context over
+project attributes, attributes and calculated values). Cases:
+  structure   evaluate_schema_structure per item (what saves and previews store)
+  price       estimate_price_from_schema per item (totals only)
+  batch       SchemaPlan.run_batch over all items at once
+  cold        evaluate_schema_structure with the expression and plan caches
+              cleared before every item (compile cost)
+
+Reported per case: per-item and per-row time (median of --repeat runs) and a
+checksum of the grand totals, so a speed-up that changes prices is flagged.
+
+  python setup/tools/bench_estimation.py run --out estimation_baseline.json
+  python setup/tools/bench_estimation.py run --compare estimation_baseline.json
+  python setup/tools/bench_estimation.py compare old.json new.json --threshold 15
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from collections import namedtuple
+
+# Add the project root to the path
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT_DIR)
+
+import estimation
+from estimation import (
+    estimate_price_from_schema,
+    evaluate_schema_structure,
+    get_schema_plan,
+    item_context,
+)
+
+SCALES = {"small": 50, "medium": 200, "large": 1000}
+FITTINGS = ["Sailtrack Corner", "Pro-Rig", "Ezy Slide", "Pro-Rig with Small Pipe", "Shackle", "Turnbuckle"]
+
+# Stands in for models.SKU (estimation only reads costPrice and name)
+Sku = namedtuple("Sku", "sku name costPrice sellPrice")
+SKUS = {
+    "CABLE-4": Sku("CABLE-4", "4mm Cable (m)", 3.0, 6.0),
+    "CABLE-5": Sku("CABLE-5", "5mm Cable (m)", 4.5, 9.0),
+    "SHACKLE": Sku("SHACKLE", "Bow Shackle", 7.25, 14.0),
+    "TURNBUCKLE": Sku("TURNBUCKLE", "Turnbuckle", 18.4, 35.0),
+}
+
+
+def _load_products():
+    # Direct-load like setup/seed.py: setup.py shadows the setup/ package
+    spec = importlib.util.spec_from_file_location("products", os.path.join(ROOT_DIR, "setup", "data", "products.py"))
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return {p["name"]: p["schema"] for p in mod.PRODUCTS if "schema" in p}
+
+
+def extended_schema(shade_sail):
+    """SHADE_SAIL's rows plus the expression styles the seeded schemas do not use."""
+    return {
+        "Combined": list(shade_sail["Combined"]),
+        "Hardware": [
+            {"description": "Shackles", "type": "sku", "sku": "SHACKLE",
+             "quantity": "fittingCounts.get('Shackle', 0)"},
+            {"description": "Turnbuckles", "type": "sku", "sku": "TURNBUCKLE",
+             "quantity": "fittingCounts.get('Turnbuckle', 0)"},
+            {"description": "Cable allowance", "type": "row", "unitCost": "cableSize == 4 ? skus['CABLE-4'] : skus['CABLE-5']",
+             "quantity": "edgeMeter > 20 ? 2 : 1"},
+            {"description": "Corner plates", "type": "row", "unitCost": "12.5",
+             "quantity": "pointCount >= 4 && exitPoint != 'A' ? pointCount : 0"},
+        ],
+        "Labour": [
+            {"description": "Fabrication", "type": "row", "unitCost": "65",
+             "quantity": "area / 10 + (pointCount > 4 ? 1.5 : 1)"},
+            {"description": "Hardware handling", "type": "row", "unitCost": "hardwareTotal * 0.1",
+             "quantity": "1"},
+        ],
+        "_constants": {"contingencyPercent": 3, "marginPercent": 45},
+    }
+
+
+# ---------- Workloads ----------
+def cover_items(rng, count):
+    return [
+        item_context(
+            {"fabric": rng.choice(["PVC", "Canvas"])},
+            {
+                "length": rng.randint(800, 6000),
+                "width": rng.randint(600, 2400),
+                "height": rng.randint(300, 1500),
+                "stayputs": rng.choice([True, False, False]),
+            },
+            {},
+        )
+        for _ in range(count)
+    ]
+
+
+def shade_sail_items(rng, count):
+    items = []
+    for _ in range(count):
+        points = rng.choice([3, 4, 4, 4, 5, 6])
+        edges = [rng.uniform(2.5, 9.0) for _ in range(points)]
+        edge_meter = sum(edges)
+        sail_track = sorted(rng.sample(range(points), rng.randint(0, 2)))
+        trace = [{"point": p, "length": rng.randint(500, 4000)} for p in rng.sample(range(points), rng.randint(0, 2))]
+        fittings = {}
+        for _ in range(points):
+            name = rng.choice(FITTINGS)
+            fittings[name] = fittings.get(name, 0) + 1
+        attributes = {
+            "pointCount": points,
+            "cableSize": rng.choice([4, 4, 5, 6, 8]),
+            "exitPoint": rng.choice(["A", "B", "C"]),
+            "fabricType": rng.choice(["Rainbow Z16", "Monotec 370", "Extreme 32"]),
+            "traceCables": trace,
+        }
+        calculated = {
+            "edgeMeter": round(edge_meter, 2),
+            "area": round(edge_meter ** 2 / (4 * points) * 1.3, 2),
+            "fabricPrice": round(rng.uniform(180, 1400), 2),
+            "fittingCounts": fittings,
+            "totalSailLengthCeilMeters": sum(int(edges[i]) + 1 for i in sail_track),
+            "totalTraceLengthCeilMeters": sum(t["length"] // 1000 + 1 for t in trace),
+        }
+        items.append(item_context({"colour": rng.choice(["Charcoal", "Gull Grey"])}, attributes, calculated))
+    return items
+
+
+def tarpaulin_items(rng, count):
+    return [
+        item_context({}, {"length": rng.randint(1000, 8000), "width": rng.randint(1000, 6000)},
+                     {"final_length": rng.randint(1100, 8200), "final_width": rng.randint(1100, 6200)})
+        for _ in range(count)
+    ]
+
+
+def build_workloads(seed, scale):
+    count = SCALES[scale]
+    schemas = _load_products()
+    return {
+        "cover": (schemas["COVER"], cover_items(random.Random(seed), count)),
+        "shade_sail": (schemas["SHADE_SAIL"], shade_sail_items(random.Random(seed + 1), count)),
+        "tarpaulin": (schemas["TARPAULIN"], tarpaulin_items(random.Random(seed + 2), count)),
+        "extended": (extended_schema(schemas["SHADE_SAIL"]), shade_sail_items(random.Random(seed + 3), count)),
+    }
+
+
+# ---------- Cases ----------
+def _structure(schema, items):
+    return [evaluate_schema_structure(schema, ctx, SKUS)["meta"]["grand_total"] for ctx in items]
+
+
+def _price(schema, items):
+    return [estimate_price_from_schema(schema, ctx, SKUS)["totals"]["grand_total"] for ctx in items]
+
+
+def _batch(schema, items):
+    return get_schema_plan(schema).run_batch(items, SKUS)["grand_total"].tolist()
+
+
+def _cold(schema, items):
+    totals = []
+    for ctx in items:
+        estimation.expression_cache.clear()
+        estimation.plan_cache.clear()
+        totals.append(evaluate_schema_structure(schema, ctx, SKUS)["meta"]["grand_total"])
+    return totals
+
+
+CASES = {
+    "structure": _structure,
+    "price": _price,
+    "batch": _batch,
+    "cold": _cold,
+}
+
+
+def _priced_rows(schema):
+    return sum(
+        1 for rows in schema.values() if isinstance(rows, list)
+        for row in rows if isinstance(row, dict) and (row.get("type") or "row").lower() in ("row", "sku")
+    )
+
+
+def measure(case, schema, items, repeat):
+    times = []
+    for _ in range(repeat):
+        # Failing Python-style expressions print; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            totals = CASES[case](schema, items)
+            times.append((time.perf_counter() - start) * 1000.0)
+
+    rows = _priced_rows(schema)
+    wall_ms = statistics.median(times)
+    per_item_us = wall_ms * 1000.0 / len(items)
+    return {
+        "wall_ms": round(wall_ms, 3),
+        "wall_ms_min": round(min(times), 3),
+        "items": len(items),
+        "rows": rows,
+        "per_item_us": round(per_item_us, 3),
+        "per_row_us": round(per_item_us / rows, 3) if rows else 0.0,
+        "checksum": round(sum(totals), 4),
+    }
+
+
+# ---------- Commands ----------
+def cmd_run(args):
+    workloads = build_workloads(args.seed, args.scale)
+    results = {}
+    for wname, (schema, items) in workloads.items():
+        if args.workload and wname not in args.workload:
+            continue
+        for case in CASES:
+            if args.case and case not in args.case:
+                continue
+            key = f"{wname}/{case}"
+            results[key] = row = measure(case, schema, items, args.repeat)
+            print(
+                f"{key:24s} {row['wall_ms']:10.2f} ms  {row['per_item_us']:9.2f} us/item  "
+                f"{row['per_row_us']:8.2f} us/row  rows={row['rows']:<3d} checksum={row['checksum']}"
+            )
+
+    report = {
+        "meta": {
+            "seed": args.seed,
+            "scale": args.scale,
+            "repeat": args.repeat,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"Wrote {args.out}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(baseline, report, args.threshold):
+            sys.exit(1)
+
+
+def cmd_compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    if compare(baseline, current, args.threshold):
+        sys.exit(1)
+
+
+def compare(baseline, current, threshold):
+    """Print per-case deltas; return True if anything regressed past threshold (%) or changed price."""
+    if baseline.get("meta", {}).get("seed") != current.get("meta", {}).get("seed") or \
+            baseline.get("meta", {}).get("scale") != current.get("meta", {}).get("scale"):
+        print("Warning: baseline was recorded with a different seed/scale")
+
+    regressed = False
+    old_rows = baseline.get("results", {})
+    for key, new in current.get("results", {}).items():
+        old = old_rows.get(key)
+        if not old:
+            print(f"{key:24s} (no comparable baseline)")
+            continue
+        time_pct = (new["per_item_us"] - old["per_item_us"]) / old["per_item_us"] * 100.0 if old["per_item_us"] else 0.0
+        flags = []
+        if time_pct > threshold:
+            flags.append("SLOWER")
+        if abs(new["checksum"] - old["checksum"]) > 1e-6 * max(1.0, abs(old["checksum"])):
+            flags.append("PRICES CHANGED")
+        regressed = regressed or bool(flags)
+        print(
+            f"{key:24s} {old['per_item_us']:9.2f} -> {new['per_item_us']:9.2f} us/item ({time_pct:+6.1f}%)  "
+            f"checksum {old['checksum']} -> {new['checksum']}  {' '.join(flags)}"
+        )
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark estimation speed on the seeded schemas.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    # RUN
+    parser_run = subparsers.add_parser("run", help="Run the benchmark")
+    parser_run.add_argument("--seed", type=int, default=1234, help="Workload seed")
+    parser_run.add_argument("--scale", choices=sorted(SCALES), default="medium", help="Items per workload")
+    parser_run.add_argument("--repeat", type=int, default=5, help="Runs per case (median is reported)")
+    parser_run.add_argument("--workload", action="append", help="Only this workload (repeatable)")
+    parser_run.add_argument("--case", action="append", help="Only this case (repeatable)")
+    parser_run.add_argument("--out", help="Write results as a JSON baseline")
+    parser_run.add_argument("--compare", help="Compare against a JSON baseline; exit 1 on regression")
+    parser_run.add_argument("--threshold", type=float, default=10.0, help="Allowed slowdown in percent")
+    parser_run.set_defaults(func=cmd_run)
+
+    # COMPARE
+    parser_compare = subparsers.add_parser("compare", help="Compare two JSON baselines")
+    parser_compare.add_argument("baseline", help="Baseline JSON")
+    parser_compare.add_argument("current", help="Current JSON")
+    parser_compare.add_argument("--threshold", type=float, default=10.0, help="Allowed slowdown in percent")
+    parser_compare.set_defaults(func=cmd_compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""Nesting benchmark: seeded synthetic workloads against the nest.py packers.
+
+Workloads are shaped like real jobs:
+  cover        COVER main/side panels (flattened and split like COVER calculate)
+  cover_repeat one COVER ordered in bulk (pattern nesting territory)
+  rectangles   RECTANGLES batches with quantities
+  small        many small panels, nested with small-panel grouping on
+
+Each workload runs through run_rectpack_with_fixed_height (strip and legacy
+rectpack engines, and with a roll length as the calculators call it),
+pack_into_multiple_rolls (rectpack and strip) and pack_into_fixed_bin, recording wall time, packer invocations, fabric
+utilisation and roll count.
+
+  python setup/tools/bench_nest.py run --out nest_baseline.json
+  python setup/tools/bench_nest.py run --compare nest_baseline.json
+  python setup/tools/bench_nest.py compare old.json new.json --threshold 15
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from endpoints.api.products.COVER.calculations import _split_panel_if_needed
+from endpoints.api.projects.nest import (
+    pack_into_fixed_bin,
+    pack_into_multiple_rolls,
+    prepare_arbitrary_rectangles,
+    run_rectpack_with_fixed_height,
+)
+
+FABRIC_WIDTH = 1500
+SCALES = {"small": 1, "medium": 4, "large": 16}
+# The legacy binary search is slow on big jobs; skip it above this many panels
+RECTPACK_SEARCH_MAX_PANELS = 400
+
+
+# ---------- Workloads ----------
+def cover_panels(rng, products, quantity=None):
+    """Flattened COVER panels for `products` random covers (see COVER calculate)."""
+    rects = []
+    for i in range(products):
+        length = rng.randint(800, 6000)
+        width = rng.randint(600, 2400)
+        height = rng.randint(300, 1500)
+        seam, hem = 20, rng.choice([25, 40, 50])
+        qty = quantity or rng.choice([1, 1, 1, 2, 4])
+        panels = [
+            ("MAIN", 2 * hem + 2 * height + length, width + 2 * seam),
+            ("SIDE_L", height + seam + hem, length + 2 * seam),
+            ("SIDE_R", height + seam + hem, length + 2 * seam),
+        ]
+        for name, w, h in panels:
+            parts = _split_panel_if_needed(w, h, FABRIC_WIDTH, 200, seam) if h > FABRIC_WIDTH else [{"width": w, "height": h, "hasSeam": "no"}]
+            for n, part in enumerate(parts):
+                for q in range(1, qty + 1):
+                    rects.append({"width": part["width"], "height": part["height"], "label": f"P{i + 1}_{name}_{n}_Q{q}", "quantity": 1})
+    return rects
+
+
+def rectangles_batch(rng, kinds):
+    return [
+        {
+            "width": rng.randint(200, 3000),
+            "height": rng.randint(200, FABRIC_WIDTH),
+            "label": f"R{i + 1}",
+            "quantity": rng.choice([1, 1, 2, 3, 5, 10]),
+        }
+        for i in range(kinds)
+    ]
+
+
+def small_panels(rng, count):
+    return [
+        {"width": rng.randint(60, 480), "height": rng.randint(60, 480), "label": f"S{i + 1}", "quantity": 1}
+        for i in range(count)
+    ]
+
+
+def build_workloads(seed, scale):
+    factor = SCALES[scale]
+    return {
+        "cover": prepare_arbitrary_rectangles({"rectangles": cover_panels(random.Random(seed), 6 * factor)}),
+        "cover_repeat": prepare_arbitrary_rectangles({"rectangles": cover_panels(random.Random(seed + 3), 1, 50 * factor)}),
+        "rectangles": prepare_arbitrary_rectangles({"rectangles": rectangles_batch(random.Random(seed + 1), 15 * factor)}),
+        "small": prepare_arbitrary_rectangles({
+            "rectangles": small_panels(random.Random(seed + 2), 150 * factor),
+            "group_small": True,
+        }),
+    }
+
+
+# ---------- Cases ----------
+def _strip(rects, engine):
+    calls = []
+    result = run_rectpack_with_fixed_height(rects, FABRIC_WIDTH, True, engine=engine, progress=lambda n, w: calls.append(n))
+    return result, len(calls)
+
+
+def _rolls(rects, roll_length, pack_algo):
+    calls = []
+    result = pack_into_multiple_rolls(rects, FABRIC_WIDTH, roll_length, True, pack_algo=pack_algo, progress=lambda n, w: calls.append(n))
+    return result, len(calls)
+
+
+def _auto_rolls(rects, roll_length):
+    # What the calculators get: run_rectpack_with_fixed_height with a roll length
+    calls = []
+    result = run_rectpack_with_fixed_height(rects, FABRIC_WIDTH, True, roll_length, progress=lambda n, w: calls.append(n))
+    return result, len(calls)
+
+
+def _fixed_bin(rects):
+    # A bin ~10% longer than the strip nest, so every workload fits
+    strip, _ = _strip(rects, "strip")
+    return pack_into_fixed_bin(rects, int(strip["total_width"] * 1.1) + 1, FABRIC_WIDTH, True), 1
+
+
+CASES = {
+    "fixed_height/strip": lambda r: _strip(r, "strip"),
+    "fixed_height/rectpack": lambda r: _strip(r, "rectpack"),
+    "rolls_50m/MaxRectsBssf": lambda r: _rolls(r, 50000, "MaxRectsBssf"),
+    "rolls_50m/strip": lambda r: _rolls(r, 50000, "strip"),
+    "rolls_10m/MaxRectsBssf": lambda r: _rolls(r, 10000, "MaxRectsBssf"),
+    "rolls_10m/strip": lambda r: _rolls(r, 10000, "strip"),
+    "rolls_50m/auto": lambda r: _auto_rolls(r, 50000),
+    "fixed_bin": _fixed_bin,
+}
+
+
+def measure(case, rects, repeat):
+    times = []
+    for _ in range(repeat):
+        # pack_into_multiple_rolls prints its inputs; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result, invocations = CASES[case](rects)
+            times.append((time.perf_counter() - start) * 1000.0)
+
+    area = rects.total_area()
+    if "used_width" in result:
+        length = result["used_width"]
+        height = result["bin_height"]
+    else:
+        length = result["total_width"]
+        height = result["bin_height"]
+    return {
+        "wall_ms": round(statistics.median(times), 3),
+        "wall_ms_min": round(min(times), 3),
+        "invocations": invocations,
+        "panels": len(rects),
+        "placed": len(result.get("panels") or {}),
+        "length": int(length),
+        "utilisation": round(area / float(length * height), 4) if length else 0.0,
+        "rolls": int(result.get("num_rolls") or 1),
+    }
+
+
+# ---------- Commands ----------
+def cmd_run(args):
+    workloads = build_workloads(args.seed, args.scale)
+    results = {}
+    for wname, rects in workloads.items():
+        if args.workload and wname not in args.workload:
+            continue
+        for case in CASES:
+            if args.case and case not in args.case:
+                continue
+            if case == "fixed_height/rectpack" and len(rects) > RECTPACK_SEARCH_MAX_PANELS:
+                continue
+            key = f"{wname}/{case}"
+            try:
+                results[key] = measure(case, rects, args.repeat)
+            except ValueError as e:
+                results[key] = {"error": str(e)}
+            row = results[key]
+            if "error" in row:
+                print(f"{key:40s} error: {row['error']}")
+            else:
+                print(
+                    f"{key:40s} {row['wall_ms']:10.2f} ms  calls={row['invocations']:<3d} "
+                    f"util={row['utilisation']:.3f}  rolls={row['rolls']:<3d} length={row['length']}"
+                )
+
+    report = {
+        "meta": {
+            "seed": args.seed,
+            "scale": args.scale,
+            "repeat": args.repeat,
+            "fabric_width": FABRIC_WIDTH,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"Wrote {args.out}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(baseline, report, args.threshold):
+            sys.exit(1)
+
+
+def cmd_compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    if compare(baseline, current, args.threshold):
+        sys.exit(1)
+
+
+def compare(baseline, current, threshold):
+    """Print per-case deltas; return True if anything regressed past threshold (%)."""
+    if baseline.get("meta", {}).get("seed") != current.get("meta", {}).get("seed") or \
+            baseline.get("meta", {}).get("scale") != current.get("meta", {}).get("scale"):
+        print("Warning: baseline was recorded with a different seed/scale")
+
+    regressed = False
+    old_rows = baseline.get("results", {})
+    for key, new in current.get("results", {}).items():
+        old = old_rows.get(key)
+        if not old or "error" in old or "error" in new:
+            print(f"{key:40s} (no comparable baseline)")
+            continue
+        time_pct = (new["wall_ms"] - old["wall_ms"]) / old["wall_ms"] * 100.0 if old["wall_ms"] else 0.0
+        flags = []
+        if time_pct > threshold:
+            flags.append("SLOWER")
+        if new["length"] > old["length"] or new["rolls"] > old["rolls"]:
+            flags.append("MORE FABRIC")
+        regressed = regressed or bool(flags)
+        print(
+            f"{key:40s} {old['wall_ms']:9.2f} -> {new['wall_ms']:9.2f} ms ({time_pct:+6.1f}%)  "
+            f"length {old['length']} -> {new['length']}  rolls {old['rolls']} -> {new['rolls']}  {' '.join(flags)}"
+        )
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark nesting speed and fabric utilisation.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    # RUN
+    parser_run = subparsers.add_parser("run", help="Run the benchmark")
+    parser_run.add_argument("--seed", type=int, default=1234, help="Workload seed")
+    parser_run.add_argument("--scale", choices=sorted(SCALES), default="medium", help="Workload size")
+    parser_run.add_argument("--repeat", type=int, default=3, help="Runs per case (median is reported)")
+    parser_run.add_argument("--workload", action="append", help="Only this workload (repeatable)")
+    parser_run.add_argument("--case", action="append", help="Only this case (repeatable)")
+    parser_run.add_argument("--out", help="Write results as a JSON baseline")
+    parser_run.add_argument("--compare", help="Compare against a JSON baseline; exit 1 on regression")
+    parser_run.add_argument("--threshold", type=float, default=10.0, help="Allowed slowdown in percent")
+    parser_run.set_defaults(func=cmd_run)
+
+    # COMPARE
+    parser_compare = subparsers.add_parser("compare", help="Compare two JSON baselines")
+    parser_compare.add_argument("baseline", help="Baseline JSON")
+    parser_compare.add_argument("current", help="Current JSON")
+    parser_compare.add_argument("--threshold", type=float, default=10.0, help="Allowed slowdown in percent")
+    parser_compare.set_defaults(func=cmd_compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""SchemaPlan.run_incremental must give what a full run() gives."""
+import copy
+
+import pytest
+
+from estimation import compile_schema
+
+SCHEMA = {
+    "Materials": [
+        {"type": "sku", "sku": "FAB", "quantity": "length / 1000"},
+        {"type": "row", "description": "Edging", "quantity": "width * 2 / 1000", "unitCost": 4},
+        {"type": "row", "description": "Fittings", "quantity": "fittingCounts['Pro-Rig'] or 0", "unitCost": 12},
+        {"type": "row", "description": "Hem", "quantity": "attributes.get('hem', 0) / 10 if hem else 1", "unitCost": 3},
+    ],
+    "Labour": [
+        {"type": "row", "description": "Cutting", "quantity": "materialsTotal > 50 ? 2 : 1", "unitCost": 60},
+        {"type": "row", "description": "Handling", "quantity": 1, "unitCost": "labourTotal / 10"},
+    ],
+    "_constants": {"contingencyPercent": 5, "marginPercent": 30},
+}
+
+PRICES = ({"FAB": 8.5}, {"FAB": "Fabric"})
+
+
+def _context():
+    return {
+        "length": 4000,
+        "width": 2000,
+        "hem": 40,
+        "colour": "Charcoal",
+        "fittingCounts": {"Pro-Rig": 2},
+        "attributes": {"hem": 40, "colour": "Charcoal"},
+        "calculated": {},
+    }
+
+
+def _without_timestamp(result):
+    result = dict(result, meta=dict(result["meta"]))
+    result["meta"].pop("evaluated_at", None)
+    return result
+
+
+def _set(ctx, path, value):
+    target = ctx
+    for key in path[:-1]:
+        target = target[key]
+    target[path[-1]] = value
+
+
+@pytest.mark.parametrize("path, value, moves_total", [
+    (("length",), 9000, True),                     # SKU quantity, then the Labour threshold
+    (("width",), 500, True),
+    (("fittingCounts", "Pro-Rig"), 5, True),       # nested value, edited in place
+    (("attributes", "hem"), 80, True),
+    (("colour",), "Surfmist", False),              # read by no row
+    (("attributes", "colour"), "Surfmist", False),
+])
+def test_incremental_matches_full_run(path, value, moves_total):
+    plan = compile_schema(SCHEMA)
+    ctx = _context()
+    first, state = plan.run_incremental(ctx, prices=PRICES)
+
+    _set(ctx, path, value)
+    result, state = plan.run_incremental(ctx, state, prices=PRICES)
+
+    assert _without_timestamp(result) == _without_timestamp(plan.run(ctx, prices=PRICES))
+    assert (result["totals"]["total"] != first["totals"]["total"]) == moves_total
+
+
+def test_incremental_follows_price_changes_and_edit_chains():
+    plan = compile_schema(SCHEMA)
+    ctx = _context()
+    _, state = plan.run_incremental(ctx, prices=PRICES)
+
+    edits = [
+        (("length",), 1000),
+        (("colour",), "Monument"),
+        (("fittingCounts", "Pro-Rig"), 0),
+        (("hem",), 0),
+        (("length",), 12000),
+    ]
+    for path, value in edits:
+        ctx = copy.deepcopy(ctx)
+        _set(ctx, path, value)
+        result, state = plan.run_incremental(ctx, state, prices=PRICES)
+        assert _without_timestamp(result) == _without_timestamp(plan.run(ctx, prices=PRICES))
+
+    repriced = ({"FAB": 11.0}, {"FAB": "Fabric"})
+    result, state = plan.run_incremental(ctx, state, prices=repriced)
+    assert _without_timestamp(result) == _without_timestamp(plan.run(ctx, prices=repriced))
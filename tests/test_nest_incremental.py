@@ -0,0 +1,101 @@
+"""insert_into_nest: patched layouts stay valid and never drift far from a fresh pack."""
+import contextlib
+import io
+import random
+
+import pytest
+
+from endpoints.api.projects.nest import nest_rectangles_logic
+from endpoints.api.projects.shared.nest_incremental import MAX_GAP_GROWTH_PCT, insert_into_nest
+
+FABRIC_HEIGHT = 1500
+
+
+def _nest(rects, **kwargs):
+    # The packers log to stdout
+    with contextlib.redirect_stdout(io.StringIO()):
+        return nest_rectangles_logic(rectangles=rects, fabric_height=FABRIC_HEIGHT, use_cache=False, **kwargs)
+
+
+def _check(rects, result, fabric_roll_length=None):
+    sizes = {r["label"]: (r["width"], r["height"]) for r in rects}
+    panels = result["panels"]
+    assert sorted(panels) == sorted(sizes)
+
+    by_bin = {}
+    for label, p in panels.items():
+        w, h = sizes[label][::-1] if p["rotated"] else sizes[label]
+        assert p["x"] >= 0 and p["y"] >= 0 and p["y"] + h <= FABRIC_HEIGHT
+        if fabric_roll_length:
+            assert p["x"] + w <= fabric_roll_length
+        by_bin.setdefault(p.get("bin", 0), []).append((p["x"], p["y"], w, h, label))
+
+    for placed in by_bin.values():
+        placed.sort()
+        for i, (x, y, w, h, a) in enumerate(placed):
+            for x2, y2, w2, h2, b in placed[i + 1:]:
+                if x2 >= x + w:
+                    break
+                assert y2 >= y + h or y >= y2 + h2, f"{a} overlaps {b}"
+
+
+def _random_rects(rng, count, start=0):
+    return [
+        {"width": rng.randint(200, 900), "height": rng.randint(200, 900), "label": f"R{i}"}
+        for i in range(start, start + count)
+    ]
+
+
+@pytest.mark.parametrize("fabric_roll_length", [None, 8000])
+def test_added_panel_is_patched_into_the_previous_layout(fabric_roll_length):
+    rng = random.Random(7)
+    rects = _random_rects(rng, 25)
+    previous = _nest(rects, fabric_roll_length=fabric_roll_length)
+
+    rects.append({"width": 250, "height": 250, "label": "NEW"})
+    result = _nest(rects, fabric_roll_length=fabric_roll_length, previous=previous)
+
+    assert result["engine"] == "incremental"
+    assert result["incremental"]["inserted"] == 1
+    kept = {k: v for k, v in result["panels"].items() if k != "NEW"}
+    assert all(
+        (v["x"], v["y"], v["rotated"]) == (previous["panels"][k]["x"], previous["panels"][k]["y"], previous["panels"][k]["rotated"])
+        for k, v in kept.items()
+    )
+    _check(rects, result, fabric_roll_length)
+
+
+@pytest.mark.parametrize("fabric_roll_length", [None, 8000])
+def test_edit_chain_repacks_before_the_layout_degrades(fabric_roll_length):
+    rng = random.Random(3)
+    rects = _random_rects(rng, 30)
+    result = _nest(rects, fabric_roll_length=fabric_roll_length)
+    next_label = 30
+    engines = []
+
+    # Swap the largest panel for a random one, over and over
+    for _ in range(25):
+        rects.sort(key=lambda r: -r["width"] * r["height"])
+        rects.pop(0)
+        rects += _random_rects(rng, 1, next_label)
+        next_label += 1
+
+        previous = result
+        result = _nest(rects, fabric_roll_length=fabric_roll_length, previous=previous)
+        engines.append(result.get("engine"))
+        _check(rects, result, fabric_roll_length)
+        if result.get("engine") == "incremental":
+            base = result["incremental"]["base_gap_pct"]
+            assert result["bounds"]["gap_pct"] <= base + MAX_GAP_GROWTH_PCT
+
+    assert "incremental" in engines
+    assert any(engine != "incremental" for engine in engines)
+
+
+def test_previous_without_bounds_is_repacked():
+    rng = random.Random(11)
+    rects = _random_rects(rng, 10)
+    previous = _nest(rects)
+    previous.pop("bounds")
+    rects += _random_rects(rng, 1, 10)
+    assert insert_into_nest(previous, [(r["width"], r["height"], r["label"]) for r in rects], FABRIC_HEIGHT) is None
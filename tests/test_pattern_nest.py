@@ -0,0 +1,83 @@
+"""pattern_nest: every panel placed once, inside the fabric, with no overlaps, and never worse than a plain pack."""
+import contextlib
+import io
+import random
+
+import pytest
+
+from endpoints.api.projects.nest import run_rectpack_with_fixed_height
+from endpoints.api.projects.shared.pattern_nest import PATTERN_MIN_PANELS, pattern_nest
+
+FABRIC_HEIGHT = 1500
+
+
+def _covers(quantity, extras=0):
+    """Expanded COVER-style order: one MAIN and two SIDEs per cover, plus one-off panels."""
+    rects = []
+    for q in range(1, quantity + 1):
+        rects.append((3080, 1240, f"P1_MAIN_Q{q}"))
+        rects.append((690, 3040, f"P1_SIDE_L_Q{q}"))
+        rects.append((690, 3040, f"P1_SIDE_R_Q{q}"))
+    for e in range(extras):
+        rects.append((1100 + 170 * e, 830 + 45 * e, f"P{e + 2}_MAIN_Q1"))
+    return rects
+
+
+def _check(rects, placed, fabric_roll_length=None):
+    sizes = {label: (w, h) for w, h, label in rects}
+    labels = [p[5] for p in placed]
+    assert sorted(labels) == sorted(sizes)
+
+    by_bin = {}
+    for bin_idx, x, y, w, h, label in placed:
+        assert (w, h) in (sizes[label], sizes[label][::-1])
+        assert x >= 0 and y >= 0 and y + h <= FABRIC_HEIGHT
+        if fabric_roll_length:
+            assert x + w <= fabric_roll_length
+        else:
+            assert bin_idx == 0
+        by_bin.setdefault(bin_idx, []).append((x, y, w, h, label))
+
+    for panels in by_bin.values():
+        panels.sort()
+        for i, (x, y, w, h, a) in enumerate(panels):
+            for x2, y2, w2, h2, b in panels[i + 1:]:
+                if x2 >= x + w:
+                    break
+                assert y2 >= y + h or y >= y2 + h2, f"{a} overlaps {b}"
+
+
+@pytest.mark.parametrize("quantity, extras", [(100, 0), (90, 3), (73, 5)])
+@pytest.mark.parametrize("fabric_roll_length", [None, 50000, 18000])
+def test_pattern_nest_places_every_panel_without_overlaps(quantity, extras, fabric_roll_length):
+    rects = _covers(quantity, extras)
+    nested = pattern_nest(rects, FABRIC_HEIGHT, fabric_roll_length, True)
+    assert nested is not None
+    placed, info = nested
+    assert info["units"] == quantity
+    _check(rects, placed, fabric_roll_length)
+
+
+def test_pattern_nest_declines_small_or_unrepeated_jobs():
+    assert pattern_nest(_covers(5), FABRIC_HEIGHT) is None
+    one_offs = [(300 + i, 200 + i, f"R{i}") for i in range(PATTERN_MIN_PANELS + 10)]
+    assert pattern_nest(one_offs, FABRIC_HEIGHT) is None
+
+
+def _repeat_order(seed):
+    rng = random.Random(seed)
+    kinds = [(rng.randint(300, 2500), rng.randint(200, 1400)) for _ in range(rng.randint(2, 5))]
+    return [(w, h, f"K{k}_Q{q}") for q in range(rng.randint(20, 150)) for k, (w, h) in enumerate(kinds)]
+
+
+@pytest.mark.parametrize("fabric_roll_length", [None, 50000])
+def test_pattern_result_never_uses_more_fabric_than_plain_pack(fabric_roll_length):
+    engines = set()
+    for seed in range(12):
+        rects = _repeat_order(seed)
+        with contextlib.redirect_stdout(io.StringIO()):
+            plain = run_rectpack_with_fixed_height(rects, FABRIC_HEIGHT, True, fabric_roll_length, patterns=False)
+            best = run_rectpack_with_fixed_height(rects, FABRIC_HEIGHT, True, fabric_roll_length)
+        engines.add(best.get("engine"))
+        assert (best.get("num_rolls") or 1, best["total_width"]) <= (plain.get("num_rolls") or 1, plain["total_width"])
+    assert "pattern" in engines